@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Serve the event stream (``api/security/stream/``) from this application:
+under ASGI an idle stream is a suspended coroutine, while under WSGI each
+connected client would hold a whole worker.
 """
 
 import os
@@ -324,3 +324,116 @@ GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default=None)
 
 # Firebase Cloud Messaging Configuration
 FCM_SERVER_KEY = config('FCM_SERVER_KEY', default=None)
+FCM_URL = config('FCM_URL', default='https://fcm.googleapis.com/fcm/send')
+# Concurrent FCM requests per worker; keep at or below the fcm HTTP pool size
+FCM_MAX_WORKERS = config('FCM_MAX_WORKERS', default=8, cast=int)
+
+# Geofence spatial index configuration
+GEOFENCE_INDEX_CELL_SIZE = config('GEOFENCE_INDEX_CELL_SIZE', default=0.01, cast=float)
+GEOFENCE_INDEX_TTL_SECONDS = config('GEOFENCE_INDEX_TTL_SECONDS', default=300, cast=int)
+
+# Geofence enter/exit transition detection
+GEOFENCE_TRANSITION_HYSTERESIS_METERS = config('GEOFENCE_TRANSITION_HYSTERESIS_METERS', default=15, cast=float)
+GEOFENCE_TRANSITION_DWELL_SECONDS = config('GEOFENCE_TRANSITION_DWELL_SECONDS', default=30, cast=int)
+
+# Geohash precision of the geofence cell table (7 = ~150 m cells)
+GEOFENCE_CELL_PRECISION = config('GEOFENCE_CELL_PRECISION', default=7, cast=int)
+GEOFENCE_CELL_MAX_CELLS = config('GEOFENCE_CELL_MAX_CELLS', default=4096, cast=int)
+
+# Rows per bulk_create call when importing GeoJSON geofences
+GEOFENCE_IMPORT_CHUNK_SIZE = config('GEOFENCE_IMPORT_CHUNK_SIZE', default=500, cast=int)
+# Longest single feature (characters) the streaming import reads before giving up
+GEOFENCE_IMPORT_MAX_FEATURE_CHARS = config('GEOFENCE_IMPORT_MAX_FEATURE_CHARS', default=10 * 1024 * 1024, cast=int)
+
+# How far (meters) one geofence must reach into another to count as overlapping
+GEOFENCE_OVERLAP_TOLERANCE_METERS = config('GEOFENCE_OVERLAP_TOLERANCE_METERS', default=1.0, cast=float)
+
+# Officer live location store
+OFFICER_LOCATION_TTL_SECONDS = config('OFFICER_LOCATION_TTL_SECONDS', default=300, cast=int)
+OFFICER_LOCATION_PERSIST_SECONDS = config('OFFICER_LOCATION_PERSIST_SECONDS', default=60, cast=int)
+
+# Automatic SOS dispatch
+DISPATCH_AUTO_ASSIGN = config('DISPATCH_AUTO_ASSIGN', default=True, cast=bool)
+DISPATCH_MAX_DISTANCE_KM = config('DISPATCH_MAX_DISTANCE_KM', default=25.0, cast=float)
+DISPATCH_LOAD_PENALTY_KM = config('DISPATCH_LOAD_PENALTY_KM', default=2.0, cast=float)
+DISPATCH_GEOFENCE_BONUS_KM = config('DISPATCH_GEOFENCE_BONUS_KM', default=1.0, cast=float)
+DISPATCH_MAX_OPEN_CASES = config('DISPATCH_MAX_OPEN_CASES', default=3, cast=int)
+# How long a new SOS alert may wait for the escalation worker to dispatch it
+DISPATCH_POLL_SECONDS = config('DISPATCH_POLL_SECONDS', default=1.0, cast=float)
+
+# SOS escalation: seconds an alert may stay unaccepted, per priority
+ESCALATION_SLA_SECONDS = {
+    'high': config('ESCALATION_SLA_HIGH_SECONDS', default=60, cast=int),
+    'medium': config('ESCALATION_SLA_MEDIUM_SECONDS', default=180, cast=int),
+    'low': config('ESCALATION_SLA_LOW_SECONDS', default=600, cast=int),
+}
+ESCALATION_POLL_SECONDS = config('ESCALATION_POLL_SECONDS', default=5, cast=int)
+ESCALATION_MAX_LEVEL = config('ESCALATION_MAX_LEVEL', default=5, cast=int)
+ESCALATION_RADIUS_FACTOR = config('ESCALATION_RADIUS_FACTOR', default=2.0, cast=float)
+
+# Navigation route cache
+ROUTE_CACHE_GRID_METERS = config('ROUTE_CACHE_GRID_METERS', default=50, cast=float)
+ROUTE_CACHE_TTL_SECONDS = config('ROUTE_CACHE_TTL_SECONDS', default=120, cast=int)
+ROUTE_CACHE_STALE_SECONDS = config('ROUTE_CACHE_STALE_SECONDS', default=600, cast=int)
+ROUTE_CACHE_MAX_ENTRIES = config('ROUTE_CACHE_MAX_ENTRIES', default=5000, cast=int)
+
+# Offline routing over a local road graph (CSV edge list) when Google Maps is unavailable
+OFFLINE_ROUTING_GRAPH_PATH = config('OFFLINE_ROUTING_GRAPH_PATH', default='')
+OFFLINE_ROUTING_DEFAULT_SPEED_KMH = config('OFFLINE_ROUTING_DEFAULT_SPEED_KMH', default=30.0, cast=float)
+OFFLINE_ROUTING_MAX_SNAP_METERS = config('OFFLINE_ROUTING_MAX_SNAP_METERS', default=1000.0, cast=float)
+OFFLINE_ROUTING_PRELOAD = config('OFFLINE_ROUTING_PRELOAD', default=True, cast=bool)
+
+# Outbound HTTP integrations (core.http): pooled sessions, timeouts, retries, circuit breaker
+HTTP_INTEGRATIONS = {
+    'fcm': {
+        'timeout': (3.05, config('FCM_TIMEOUT_SECONDS', default=10, cast=float)),
+        'retries': config('FCM_RETRIES', default=2, cast=int),
+        # FCM documents retrying sends on 5xx/429 with backoff
+        'retry_methods': ('POST',),
+        'pool_maxsize': config('FCM_POOL_MAXSIZE', default=50, cast=int),
+    },
+    'google_maps': {
+        'timeout': (3.05, config('GOOGLE_MAPS_TIMEOUT_SECONDS', default=10, cast=float)),
+        'retries': config('GOOGLE_MAPS_RETRIES', default=1, cast=int),
+    },
+    'exotel': {
+        'timeout': (3.05, config('EXOTEL_TIMEOUT_SECONDS', default=15, cast=float)),
+        # Retrying a send could deliver the SMS twice
+        'retries': 0,
+    },
+}
+
+# Notification outbox worker (security_app.outbox)
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=100, cast=int)
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default=60, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=5, cast=int)
+OUTBOX_POLL_SECONDS = config('OUTBOX_POLL_SECONDS', default=2, cast=int)
+
+# Server-sent event streams (core.events)
+EVENTS_BACKEND = config('EVENTS_BACKEND', default='core.events.InProcessBackend')
+REDIS_URL = config('REDIS_URL', default='')
+# Events kept per channel for Last-Event-ID resume
+EVENTS_HISTORY_SIZE = config('EVENTS_HISTORY_SIZE', default=500, cast=int)
+# Events queued for a slow client before its stream is closed
+EVENTS_QUEUE_SIZE = config('EVENTS_QUEUE_SIZE', default=100, cast=int)
+EVENTS_HEARTBEAT_SECONDS = config('EVENTS_HEARTBEAT_SECONDS', default=15, cast=int)
+EVENTS_RETRY_MS = config('EVENTS_RETRY_MS', default=3000, cast=int)
+
+# Sub-admin live board (users.live_board): seconds before KPIs are recounted for a new dashboard
+LIVE_BOARD_RESYNC_SECONDS = config('LIVE_BOARD_RESYNC_SECONDS', default=300, cast=int)
+
+# Django cache. LocMem is per worker process; use django.core.cache.backends.redis.RedisCache
+# with the REDIS_URL as location to share cached views and their single-flight locks across workers
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='safetnet'),
+    }
+}
+
+# Cached dashboard views (core.cache): fresh seconds, then seconds served stale while one request refreshes
+VIEW_CACHE_TTL_SECONDS = config('VIEW_CACHE_TTL_SECONDS', default=10, cast=int)
+VIEW_CACHE_STALE_SECONDS = config('VIEW_CACHE_STALE_SECONDS', default=30, cast=int)
+# Longest a request waits for another one computing the same view
+VIEW_CACHE_LOCK_SECONDS = config('VIEW_CACHE_LOCK_SECONDS', default=5, cast=int)
@@ -0,0 +1,168 @@
+"""
+Shared cache for read-only views that many users poll, like the dashboards.
+
+``view_cache.cached(name, scope)`` keeps a view's 200 responses in the Django
+cache (``CACHES``) under ``view:<name>:<scope>``, where ``scope(request)``
+names whose data the response is (an organization, an officer) or returns
+None to bypass the cache. Entries are fresh for ``VIEW_CACHE_TTL_SECONDS``;
+for ``VIEW_CACHE_STALE_SECONDS`` after that they are still served while one
+request recomputes them (stale-while-revalidate).
+
+Computations are single-flight: only the request that takes the key's lock
+(``cache.add``) runs the view, and concurrent misses of the same key wait up
+to ``VIEW_CACHE_LOCK_SECONDS`` for its result instead of running the same
+queries again. With the default LocMem cache this holds within a worker; a
+shared backend such as Redis extends it across workers.
+
+Hit, miss, stale and refresh counters per view are available from
+``view_cache.stats()``.
+"""
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+HIT = 'HIT'
+MISS = 'MISS'
+STALE = 'STALE'
+
+STATS = ('hits', 'misses', 'stale_hits', 'coalesced', 'refreshes', 'errors')
+
+
+class ViewCache:
+    """Django cache backed view results with TTL, stale-while-revalidate and single-flight computation."""
+
+    def __init__(self, alias=None, ttl_seconds=None, stale_seconds=None, lock_seconds=None, poll_seconds=0.05):
+        self.alias = alias or getattr(settings, 'VIEW_CACHE_ALIAS', 'default')
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'VIEW_CACHE_TTL_SECONDS', 10)
+        self.stale_seconds = stale_seconds if stale_seconds is not None else getattr(
+            settings, 'VIEW_CACHE_STALE_SECONDS', 30
+        )
+        self.lock_seconds = lock_seconds or getattr(settings, 'VIEW_CACHE_LOCK_SECONDS', 5)
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        # view name -> counters
+        self._stats = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, name, scope):
+        return f'view:{name}:{scope}'
+
+    def _count(self, name, stat):
+        with self._lock:
+            stats = self._stats.setdefault(name, dict.fromkeys(STATS, 0))
+            stats[stat] += 1
+
+    def _acquire(self, key):
+        return self.cache.add(f'{key}:lock', True, self.lock_seconds)
+
+    def _compute(self, key, view, request, args, kwargs, locked=True):
+        """Run the view and cache a 200 response, releasing the key's lock."""
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                self.cache.set(
+                    key, (response.data, time.time() + self.ttl_seconds), self.ttl_seconds + self.stale_seconds
+                )
+            response['X-View-Cache'] = MISS
+            return response
+        finally:
+            if locked:
+                self.cache.delete(f'{key}:lock')
+
+    def _respond(self, data, cache_status):
+        response = Response(data)
+        response['X-View-Cache'] = cache_status
+        return response
+
+    def cached(self, name, scope):
+        """
+        Decorator caching a view's 200 responses.
+
+        Args:
+            name: view name, part of the key and of ``stats()``
+            scope: callable returning the key scope for an authenticated
+                request, or None to bypass the cache for it; it must separate
+                every request that could see different data
+
+        Responses carry an ``X-View-Cache`` header: ``HIT``, ``STALE`` or ``MISS``.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                scope_key = scope(request)
+                if scope_key is None:
+                    return view(request, *args, **kwargs)
+                key = self.make_key(name, scope_key)
+
+                entry = self.cache.get(key)
+                if entry is not None:
+                    data, fresh_until = entry
+                    if time.time() < fresh_until:
+                        self._count(name, 'hits')
+                        return self._respond(data, HIT)
+                    if not self._acquire(key):
+                        # Another request is refreshing it
+                        self._count(name, 'stale_hits')
+                        return self._respond(data, STALE)
+                    self._count(name, 'refreshes')
+                    try:
+                        return self._compute(key, view, request, args, kwargs)
+                    except Exception:
+                        self._count(name, 'errors')
+                        logger.exception(f"Refreshing cached view {name} failed")
+                        return self._respond(data, STALE)
+
+                self._count(name, 'misses')
+                deadline = time.monotonic() + self.lock_seconds
+                while not self._acquire(key):
+                    # Wait for the request computing it rather than repeating its work
+                    if time.monotonic() >= deadline:
+                        return self._compute(key, view, request, args, kwargs, locked=False)
+                    time.sleep(self.poll_seconds)
+                    entry = self.cache.get(key)
+                    if entry is not None:
+                        self._count(name, 'coalesced')
+                        return self._respond(entry[0], HIT)
+                entry = self.cache.get(key)
+                if entry is not None:
+                    # Stored between the last look and taking the lock
+                    self.cache.delete(f'{key}:lock')
+                    self._count(name, 'coalesced')
+                    return self._respond(entry[0], HIT)
+                return self._compute(key, view, request, args, kwargs)
+            return wrapper
+        return decorator
+
+    def invalidate(self, name, scope):
+        """Drop a cached response, e.g. after the user changed what it shows."""
+        self.cache.delete(self.make_key(name, scope))
+
+    def stats(self):
+        """Counters and hit ratio per view for this worker."""
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._stats.items()}
+        for counters in stats.values():
+            lookups = counters['hits'] + counters['stale_hits'] + counters['misses']
+            served = counters['hits'] + counters['stale_hits'] + counters['coalesced']
+            counters['hit_ratio'] = round(served / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Empty the cache and the counters; used by tests."""
+        self.cache.clear()
+        with self._lock:
+            self._stats = {}
+
+
+# Global view cache instance
+view_cache = ViewCache()
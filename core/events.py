@@ -0,0 +1,397 @@
+"""
+In-process pub/sub for server-sent event streams.
+
+Publishers call ``event_broker.publish_on_commit(channel, type, data)`` from
+request or signal code; every open stream subscribed to that channel gets the
+event on its own asyncio queue. An idle connection is just a queue and an
+await, with no database access, so thousands of connected clients cost
+nothing until something happens.
+
+Each event carries an increasing id and the backend keeps the last
+``EVENTS_HISTORY_SIZE`` events per channel, so a client reconnecting with
+``Last-Event-ID`` gets what it missed replayed. If the history no longer
+reaches back that far the stream starts with a ``reset`` event and the client
+should reload its state over the REST API.
+
+``EVENTS_BACKEND`` selects how events reach the broker:
+
+- ``core.events.InProcessBackend`` (default): events only reach streams served
+  by the publishing process; enough for a single ASGI worker
+- ``core.events.RedisBackend``: events go through Redis pub/sub and history is
+  kept in Redis, so every worker sees every event and ids are global; needs
+  the ``redis`` package and ``REDIS_URL``
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    """One published event."""
+
+    __slots__ = ('id', 'channel', 'type', 'data')
+
+    def __init__(self, id, channel, type, data):
+        self.id = id
+        self.channel = channel
+        self.type = type
+        self.data = data
+
+    def to_json(self):
+        return json.dumps(
+            {'id': self.id, 'channel': self.channel, 'type': self.type, 'data': self.data},
+            cls=DjangoJSONEncoder,
+        )
+
+    @classmethod
+    def from_json(cls, raw):
+        payload = json.loads(raw)
+        return cls(payload['id'], payload['channel'], payload['type'], payload['data'])
+
+    def encode(self):
+        """The event in ``text/event-stream`` format."""
+        data = json.dumps(self.data, cls=DjangoJSONEncoder)
+        prefix = f'id: {self.id}\n' if self.id is not None else ''
+        return f'{prefix}event: {self.type}\ndata: {data}\n\n'
+
+
+class InProcessBackend:
+    """Single-process backend: events only reach connections served by this process."""
+
+    def __init__(self, deliver, history_size=None):
+        self.deliver = deliver
+        self.history_size = history_size or getattr(settings, 'EVENTS_HISTORY_SIZE', 500)
+        self._lock = threading.Lock()
+        # Seeded from the clock so ids keep increasing across restarts
+        self._first_id = time.time_ns() // 1000
+        self._ids = itertools.count(self._first_id)
+        self._history = {}
+        # channel -> id of the newest event dropped from its history
+        self._dropped_through = {}
+
+    def publish(self, channel, event_type, data):
+        with self._lock:
+            event = Event(next(self._ids), channel, event_type, data)
+            history = self._history.setdefault(channel, deque())
+            history.append(event)
+            if len(history) > self.history_size:
+                self._dropped_through[channel] = history.popleft().id
+        self.deliver(event)
+        return event
+
+    def replay(self, channels, after_id):
+        """
+        Events on ``channels`` newer than ``after_id``, oldest first, and
+        whether the history still covered everything since ``after_id``.
+        """
+        with self._lock:
+            # Events from before this process started are gone
+            complete = after_id >= self._first_id - 1 and all(
+                self._dropped_through.get(channel, 0) <= after_id for channel in channels
+            )
+            events = [
+                event
+                for channel in channels
+                for event in self._history.get(channel, ())
+                if event.id > after_id
+            ]
+        return sorted(events, key=lambda event: event.id), complete
+
+    def close(self):
+        pass
+
+
+class RedisBackend:
+    """
+    Cross-worker backend: ids come from a Redis counter, history is a sorted set
+    per channel and events reach every worker over one pub/sub channel.
+    """
+
+    def __init__(self, deliver, history_size=None, url=None, prefix='safetnet:events'):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBackend requires the redis package')
+        url = url or getattr(settings, 'REDIS_URL', None)
+        if not url:
+            raise ImproperlyConfigured('RedisBackend requires REDIS_URL')
+        self.deliver = deliver
+        self.history_size = history_size or getattr(settings, 'EVENTS_HISTORY_SIZE', 500)
+        self.prefix = prefix
+        self.redis = redis.Redis.from_url(url)
+        self._closed = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name='events-redis', daemon=True)
+        self._listener.start()
+
+    def _history_key(self, channel):
+        return f'{self.prefix}:history:{channel}'
+
+    def _dropped_key(self, channel):
+        return f'{self.prefix}:dropped:{channel}'
+
+    def publish(self, channel, event_type, data):
+        event = Event(self.redis.incr(f'{self.prefix}:seq'), channel, event_type, data)
+        raw = event.to_json()
+        key = self._history_key(channel)
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {raw: event.id})
+        pipe.zcard(key)
+        _, size = pipe.execute()
+        if size > self.history_size:
+            dropped = self.redis.zpopmin(key, size - self.history_size)
+            if dropped:
+                self.redis.set(self._dropped_key(channel), int(dropped[-1][1]))
+        # Delivered to this worker's streams by the listener, like every other worker's
+        self.redis.publish(self.prefix, raw)
+        return event
+
+    def replay(self, channels, after_id):
+        pipe = self.redis.pipeline()
+        for channel in channels:
+            pipe.get(self._dropped_key(channel))
+            pipe.zrangebyscore(self._history_key(channel), f'({after_id}', '+inf')
+        results = pipe.execute()
+        complete = all(int(dropped or 0) <= after_id for dropped in results[0::2])
+        events = [Event.from_json(raw) for raws in results[1::2] for raw in raws]
+        return sorted(events, key=lambda event: event.id), complete
+
+    def _listen(self):
+        while not self._closed.is_set():
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.prefix)
+                while not self._closed.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        self.deliver(Event.from_json(message['data']))
+            except Exception:
+                logger.exception("Redis event listener failed; reconnecting")
+                time.sleep(1)
+            finally:
+                pubsub.close()
+
+    def close(self):
+        self._closed.set()
+
+
+# Queued to a subscription that fell too far behind
+OVERFLOW = object()
+
+
+class Subscription:
+    """One stream's view of the broker; must be created on the stream's event loop."""
+
+    def __init__(self, broker, channels, queue_size):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.queue_size = queue_size
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def push(self, event):
+        """Queue an event; safe to call from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The stream's loop is gone
+            self.broker.unsubscribe(self)
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.queue_size:
+            # The client stops reading; end its stream and let it resume from history
+            self.overflowed = True
+            self.queue.put_nowait(OVERFLOW)
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """Next event, ``OVERFLOW``, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Fans published events out to the subscriptions of this process."""
+
+    def __init__(self, backend=None, queue_size=None):
+        self._backend = backend
+        self.queue_size = queue_size or getattr(settings, 'EVENTS_QUEUE_SIZE', 100)
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._listeners = []
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    backend_class = import_string(
+                        getattr(settings, 'EVENTS_BACKEND', 'core.events.InProcessBackend')
+                    )
+                    self._backend = backend_class(self.deliver)
+        return self._backend
+
+    def add_listener(self, listener):
+        """Call ``listener(event)`` for every event this process receives, before streams get it."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def deliver(self, event):
+        """Hand an event to the listeners and every local subscription on its channel."""
+        with self._lock:
+            listeners = list(self._listeners)
+            subscriptions = list(self._subscriptions.get(event.channel, ()))
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception(f"Event listener failed on {event.type} event")
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def publish(self, channel, event_type, data):
+        return self.backend.publish(channel, event_type, data)
+
+    def publish_on_commit(self, channel, event_type, data):
+        """Publish once the current transaction commits, so streams never see rolled back changes."""
+        def publish():
+            try:
+                self.publish(channel, event_type, data)
+            except Exception:
+                logger.exception(f"Failed to publish {event_type} event on {channel}")
+
+        transaction.on_commit(publish)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def replay(self, channels, after_id):
+        return self.backend.replay(channels, after_id)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers})
+
+    def reset(self):
+        """Drop all subscriptions and the backend with its history; used by tests."""
+        with self._lock:
+            backend, self._backend = self._backend, None
+            self._subscriptions = {}
+        if backend is not None:
+            backend.close()
+
+    async def stream(self, channels, last_event_id=None, heartbeat_seconds=None, snapshot=None):
+        """
+        ``text/event-stream`` chunks for the given channels, resuming after
+        ``last_event_id`` from the history when given.
+
+        Alternatively ``snapshot`` returns an event holding the current state,
+        with the id of the last event it includes; the stream starts with it
+        and continues with the events after it.
+
+        Events without an id are process-local notices and always passed on.
+        """
+        heartbeat_seconds = heartbeat_seconds or getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+        # Subscribe before replaying so nothing published in between is lost
+        subscription = self.subscribe(channels)
+        try:
+            yield f'retry: {getattr(settings, "EVENTS_RETRY_MS", 3000)}\n\n'
+            last_id = 0
+            if snapshot is not None:
+                event = snapshot()
+                last_id = event.id or 0
+                yield event.encode()
+            elif last_event_id is not None:
+                replayed, complete = self.replay(subscription.channels, last_event_id)
+                if not complete:
+                    yield Event(None, None, 'reset', {'detail': 'Missed events are no longer available.'}).encode()
+                for event in replayed:
+                    yield event.encode()
+                last_id = replayed[-1].id if replayed else last_event_id
+            while True:
+                event = await subscription.get(heartbeat_seconds)
+                if event is None:
+                    yield ': keepalive\n\n'
+                elif event is OVERFLOW:
+                    return
+                elif event.id is None:
+                    yield event.encode()
+                elif event.id > last_id:
+                    # Events already replayed can also be queued live
+                    last_id = event.id
+                    yield event.encode()
+        finally:
+            subscription.close()
+
+
+def authenticate_stream(request):
+    """
+    The user authenticated by the request's JWT, or None; sets ``request.user``.
+    Streams are plain async Django views, outside DRF's authentication.
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if authenticated is None:
+        return None
+    request.user = authenticated[0]
+    return request.user
+
+
+def release_connection():
+    """
+    Close this thread's database connection once a stream has what it needs
+    from the database; a stream stays open for hours without another query.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def stream_response(chunks):
+    response = StreamingHttpResponse(chunks, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Global event broker instance
+event_broker = EventBroker()
@@ -0,0 +1,247 @@
+"""
+Shared outbound HTTP client for third-party integrations.
+
+Each integration (``fcm``, ``google_maps``, ``exotel``...) gets one
+``requests.Session`` per worker process with a keep-alive connection pool,
+so repeated calls to the same host reuse TCP/TLS connections instead of
+paying a handshake each time. Per integration, ``HTTP_INTEGRATIONS``
+configures:
+
+- ``timeout``: ``(connect, read)`` seconds; every request has one
+- ``retries``: extra attempts on connection errors, timeouts, 429 and 5xx,
+  with full-jitter exponential backoff (``Retry-After`` is honoured)
+- ``retry_methods``: methods that may be retried; POSTs are only retried
+  where the upstream tolerates duplicates
+- ``failure_threshold`` / ``reset_seconds``: circuit breaker; after that many
+  consecutive failures calls fail fast with ``CircuitOpenError`` until a
+  single trial request is let through ``reset_seconds`` later
+
+Latency, status and error counters per integration are available from
+``http_clients.metrics()``.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTEGRATION = {
+    'timeout': (3.05, 10),
+    'retries': 2,
+    'retry_methods': ('GET', 'HEAD', 'OPTIONS'),
+    'backoff_seconds': 0.25,
+    'backoff_max_seconds': 4.0,
+    'failure_threshold': 5,
+    'reset_seconds': 30,
+    'pool_maxsize': 20,
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Latency samples kept per integration for percentiles
+LATENCY_WINDOW = 512
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Whether a call may go out now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                # A failed trial re-opens the circuit for another full period
+                self._opened_at = time.monotonic()
+
+
+class IntegrationClient:
+    """Pooled session, retries, breaker and metrics for one upstream integration."""
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = dict(DEFAULT_INTEGRATION, **options)
+        self.breaker = CircuitBreaker(self.options['failure_threshold'], self.options['reset_seconds'])
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.options['pool_maxsize'], max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {'requests': 0, 'errors': 0, 'retries': 0, 'short_circuited': 0}
+        self._statuses = {}
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _record(self, elapsed, status_code):
+        with self._lock:
+            self._counters['requests'] += 1
+            self._latencies.append(elapsed)
+            if status_code is not None:
+                self._statuses[status_code] = self._statuses.get(status_code, 0) + 1
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.options['backoff_max_seconds'])
+        ceiling = min(self.options['backoff_max_seconds'], self.options['backoff_seconds'] * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the integration's pool.
+
+        Accepts the same keyword arguments as ``requests.request``; ``timeout``
+        defaults to the integration's. Raises ``CircuitOpenError`` while the
+        breaker is open and ``requests.RequestException`` once retries are
+        exhausted; responses with other error statuses are returned as-is.
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.options['timeout'])
+        retries = self.options['retries'] if method in self.options['retry_methods'] else 0
+
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                self._count('short_circuited')
+                raise CircuitOpenError(f"{self.name} circuit is open; not calling {url}")
+
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                self._record(time.perf_counter() - started, None)
+                self._count('errors')
+                self.breaker.record_failure()
+                if attempt >= retries:
+                    raise
+                logger.warning(f"{self.name} {method} failed ({e}); retrying")
+                self._count('retries')
+                time.sleep(self._backoff(attempt))
+                continue
+            except BaseException:
+                # Anything else (a bad argument, an interrupt) still ends a half-open trial
+                self.breaker.record_failure()
+                raise
+
+            self._record(time.perf_counter() - started, response.status_code)
+            if response.status_code in RETRY_STATUSES:
+                self._count('errors')
+                self.breaker.record_failure()
+                if attempt < retries:
+                    logger.warning(f"{self.name} {method} returned {response.status_code}; retrying")
+                    self._count('retries')
+                    time.sleep(self._backoff(attempt, response))
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def metrics(self):
+        """Counters, status codes, breaker state and latency percentiles in milliseconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = dict(self._counters)
+            metrics['statuses'] = dict(self._statuses)
+        metrics['circuit'] = self.breaker.state
+        if latencies:
+            metrics['latency_ms'] = {
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1),
+            }
+        return metrics
+
+    def close(self):
+        self.session.close()
+
+
+class IntegrationRegistry:
+    """One lazily created ``IntegrationClient`` per integration name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    options = getattr(settings, 'HTTP_INTEGRATIONS', {}).get(name, {})
+                    client = self._clients[name] = IntegrationClient(name, **options)
+        return client
+
+    def metrics(self):
+        with self._lock:
+            clients = dict(self._clients)
+        return {name: client.metrics() for name, client in clients.items()}
+
+    def reset(self):
+        """Close every pool and forget all clients (settings changes, tests)."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+
+
+# Global HTTP client registry instance
+http_clients = IntegrationRegistry()
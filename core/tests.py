@@ -0,0 +1,331 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from users.models import User
+from .cache import HIT, MISS, STALE, ViewCache, view_cache
+from .events import EventBroker, InProcessBackend
+from .http import CircuitBreaker, CircuitOpenError, IntegrationClient, http_clients
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler that replays the server's queued status codes."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.peers.add(self.client_address)
+            code = server.statuses.pop(0) if server.statuses else 200
+        if server.delay:
+            time.sleep(server.delay)
+        body = b'{"ok": true}'
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self._respond()
+
+
+class IntegrationClientTest(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.peers = set()
+        self.server.statuses = []
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/send'
+
+    def make_client(self, **options):
+        options.setdefault('backoff_seconds', 0.001)
+        client = IntegrationClient('test', **options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_connections_are_reused(self):
+        client = self.make_client()
+        for _ in range(20):
+            self.assertEqual(client.post(self.url, json={'to': 'officer'}).status_code, 200)
+
+        self.assertEqual(self.server.requests, 20)
+        # Every request went over the same keep-alive connection
+        self.assertEqual(len(self.server.peers), 1)
+
+    def test_retries_server_errors(self):
+        self.server.statuses = [503, 502]
+        client = self.make_client(retries=2)
+
+        response = client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(client.metrics()['retries'], 2)
+
+    def test_post_not_retried_unless_configured(self):
+        self.server.statuses = [503]
+        client = self.make_client(retries=2)
+
+        self.assertEqual(client.post(self.url).status_code, 503)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_default_timeout_applies(self):
+        self.server.delay = 0.5
+        client = self.make_client(timeout=(1, 0.1), retries=0)
+
+        with self.assertRaises(requests.Timeout):
+            client.get(self.url)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.server.statuses = [500] * 3
+        client = self.make_client(retries=0, failure_threshold=3, reset_seconds=60)
+        for _ in range(3):
+            client.get(self.url)
+
+        with self.assertRaises(CircuitOpenError):
+            client.get(self.url)
+        self.assertEqual(self.server.requests, 3)
+        metrics = client.metrics()
+        self.assertEqual(metrics['circuit'], CircuitBreaker.OPEN)
+        self.assertEqual(metrics['short_circuited'], 1)
+        self.assertEqual(metrics['statuses'], {500: 3})
+        self.assertIn('p95', metrics['latency_ms'])
+
+    def test_half_open_trial_closes_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        # Only one trial call while half-open
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unexpected_error_during_trial_releases_it(self):
+        client = self.make_client(retries=0, failure_threshold=1, reset_seconds=0.05)
+        client.breaker.record_failure()
+        time.sleep(0.06)
+
+        # Not a requests exception, so it bypasses the retry handling
+        with self.assertRaises(TypeError):
+            client.get(self.url, bogus_argument=True)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.06)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+
+class IntegrationMetricsViewTest(APITestCase):
+    def setUp(self):
+        http_clients.reset()
+        self.addCleanup(http_clients.reset)
+
+    def test_superadmin_sees_metrics(self):
+        admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345', role='SUPER_ADMIN'
+        )
+        http_clients.get('fcm')
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(reverse('integration-metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['fcm']['requests'], 0)
+
+    def test_officer_is_forbidden(self):
+        officer = User.objects.create_user(
+            username='officer', email='officer@example.com', password='pass12345', role='security'
+        )
+        self.client.force_authenticate(user=officer)
+
+        response = self.client.get(reverse('integration-metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ViewCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = ViewCache(ttl_seconds=10, stale_seconds=30, lock_seconds=2, poll_seconds=0.01)
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.calls = 0
+
+    def cached_view(self, delay=0, status_code=200):
+        from types import SimpleNamespace
+        from rest_framework.response import Response
+
+        @self.cache.cached('kpis', scope=lambda request: request.scope)
+        def view(request):
+            self.calls += 1
+            time.sleep(delay)
+            return Response({'calls': self.calls}, status=status_code)
+
+        return lambda scope='org:1': view(SimpleNamespace(scope=scope))
+
+    def test_hit_stale_and_refresh(self):
+        from unittest.mock import patch
+
+        view = self.cached_view()
+        with patch('core.cache.time.time', return_value=1000.0):
+            self.assertEqual(view()['X-View-Cache'], MISS)
+            response = view()
+        self.assertEqual((response['X-View-Cache'], response.data), (HIT, {'calls': 1}))
+
+        with patch('core.cache.time.time', return_value=1015.0):
+            # Another request holds the refresh
+            self.cache.cache.add('view:kpis:org:1:lock', True)
+            response = view()
+            self.assertEqual((response['X-View-Cache'], response.data), (STALE, {'calls': 1}))
+            self.cache.cache.delete('view:kpis:org:1:lock')
+            self.assertEqual(view().data, {'calls': 2})
+            self.assertEqual(view()['X-View-Cache'], HIT)
+
+        stats = self.cache.stats()['kpis']
+        self.assertEqual((stats['hits'], stats['misses'], stats['stale_hits'], stats['refreshes']), (2, 1, 1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.75)
+
+    def test_concurrent_misses_compute_once(self):
+        view = self.cached_view(delay=0.2)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(view().data)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'calls': 1}] * 5)
+        self.assertEqual(self.cache.stats()['kpis']['coalesced'], 4)
+
+    def test_scopes_errors_and_bypass(self):
+        view = self.cached_view()
+        view('org:1')
+        self.assertEqual(view('org:2').data, {'calls': 2})
+
+        self.cache.invalidate('kpis', 'org:1')
+        self.assertEqual(view('org:1').data, {'calls': 3})
+        # No scope, no cache
+        view(None)
+        view(None)
+        self.assertEqual(self.calls, 5)
+
+        failing = self.cached_view(status_code=404)
+        failing('org:3')
+        failing('org:3')
+        self.assertEqual(self.calls, 7)
+
+
+class CacheMetricsViewTest(APITestCase):
+    def setUp(self):
+        view_cache.clear()
+        self.addCleanup(view_cache.clear)
+
+    def test_superadmin_sees_counters(self):
+        admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345', role='SUPER_ADMIN'
+        )
+        self.client.force_authenticate(user=admin)
+        self.client.get(reverse('dashboard_kpis'))
+        self.client.get(reverse('dashboard_kpis'))
+
+        response = self.client.get(reverse('cache-metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['dashboard_kpis']['misses'], 1)
+        self.assertEqual(response.data['dashboard_kpis']['hits'], 1)
+
+
+class EventBrokerTest(SimpleTestCase):
+    def make_broker(self, history_size=50, queue_size=100):
+        broker = EventBroker(queue_size=queue_size)
+        broker._backend = InProcessBackend(broker.deliver, history_size=history_size)
+        return broker
+
+    async def test_events_reach_subscribers_of_their_channel(self):
+        broker = self.make_broker()
+        stream = broker.stream(['officer:1', 'organization:1'], heartbeat_seconds=5)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        receive = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+
+        # Published from another thread, as signals do
+        await asyncio.to_thread(broker.publish, 'officer:2', 'case', {'id': 1})
+        event = await asyncio.to_thread(broker.publish, 'organization:1', 'sos_alert', {'id': 7})
+
+        chunk = await asyncio.wait_for(receive, 1)
+        self.assertEqual(chunk, f'id: {event.id}\nevent: sos_alert\ndata: {{"id": 7}}\n\n')
+        self.assertEqual(broker.subscriber_count(), 1)
+        await stream.aclose()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_resume_replays_missed_events(self):
+        broker = self.make_broker()
+        seen = broker.publish('officer:1', 'notification', {'id': 1})
+        missed = [broker.publish('officer:1', 'notification', {'id': i}) for i in (2, 3)]
+        broker.publish('officer:2', 'notification', {'id': 4})
+
+        stream = broker.stream(['officer:1'], last_event_id=seen.id, heartbeat_seconds=5)
+        await anext(stream)
+        chunks = [await anext(stream) for _ in missed]
+
+        self.assertEqual(chunks, [event.encode() for event in missed])
+        await stream.aclose()
+
+    async def test_resume_beyond_history_starts_with_reset(self):
+        broker = self.make_broker(history_size=2)
+        first = broker.publish('officer:1', 'notification', {'id': 1})
+        for i in range(3):
+            broker.publish('officer:1', 'notification', {'id': i + 2})
+
+        stream = broker.stream(['officer:1'], last_event_id=first.id, heartbeat_seconds=5)
+        await anext(stream)
+
+        self.assertIn('event: reset', await anext(stream))
+        self.assertIn('"id": 3', await anext(stream))
+        await stream.aclose()
+
+    async def test_idle_stream_sends_heartbeats(self):
+        broker = self.make_broker()
+        stream = broker.stream(['officer:1'], heartbeat_seconds=0.01)
+        await anext(stream)
+
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        await stream.aclose()
+
+    async def test_slow_client_is_disconnected(self):
+        broker = self.make_broker(queue_size=2)
+        stream = broker.stream(['officer:1'], heartbeat_seconds=5)
+        await anext(stream)
+        for i in range(3):
+            broker.publish('officer:1', 'notification', {'id': i})
+        await asyncio.sleep(0)
+
+        chunks = [chunk async for chunk in stream]
+
+        # The queued events, then the stream ends so the client resumes from history
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(broker.subscriber_count(), 0)
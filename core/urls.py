@@ -1,5 +1,8 @@
 from django.urls import path
 
+from .views import CacheMetricsView, IntegrationMetricsView
+
 urlpatterns = [
-    # Add your URL patterns here
+    path('integrations/metrics/', IntegrationMetricsView.as_view(), name='integration-metrics'),
+    path('cache/metrics/', CacheMetricsView.as_view(), name='cache-metrics'),
 ]
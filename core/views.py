@@ -1,3 +1,24 @@
-from django.shortcuts import render
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from users.permissions import IsSuperAdmin
+
+from .cache import view_cache
+from .http import http_clients
+
+
+class IntegrationMetricsView(APIView):
+    permission_classes = [IsAuthenticated, IsSuperAdmin]
+
+    def get(self, request):
+        """Latency, error and circuit breaker metrics per outbound integration for this worker"""
+        return Response(http_clients.metrics())
+
+
+class CacheMetricsView(APIView):
+    permission_classes = [IsAuthenticated, IsSuperAdmin]
+
+    def get(self, request):
+        """Hit, miss, stale and refresh counters per cached view for this worker"""
+        return Response(view_cache.stats())
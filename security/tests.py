@@ -1,3 +1,6 @@
+import os
+
+import pytest
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
@@ -7,6 +10,9 @@ from .models import SOSAlert
 
 User = get_user_model()
 
+# Wall-clock assertions depend on the machine; run them with RUN_BENCHMARKS=1
+benchmark = pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run timing benchmarks')
+
 
 class SOSAlertModelTest(TestCase):
     def setUp(self):
@@ -214,4 +220,89 @@ class SOSAlertAPITest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['status'], 'resolved')
\ No newline at end of file
+        self.assertEqual(response.data[0]['status'], 'resolved')
+
+
+class DistanceKernelTest(TestCase):
+    def setUp(self):
+        import numpy as np
+        
+        rng = np.random.default_rng(42)
+        self.lats = rng.uniform(-60, 60, 500)
+        self.lons = rng.uniform(-180, 180, 500)
+    
+    def test_vectorized_matches_scalar(self):
+        from .distance import haversine_distance_km, haversine_one_to_many, distance_matrix_km
+        
+        one_to_many = haversine_one_to_many(18.52, 73.85, self.lats, self.lons)
+        matrix = distance_matrix_km(self.lats[:20], self.lons[:20], self.lats, self.lons)
+        self.assertEqual(matrix.shape, (20, 500))
+        for j in range(0, 500, 25):
+            expected = haversine_distance_km(18.52, 73.85, self.lats[j], self.lons[j])
+            self.assertAlmostEqual(one_to_many[j], expected, places=6)
+            for i in range(0, 20, 5):
+                expected = haversine_distance_km(self.lats[i], self.lons[i], self.lats[j], self.lons[j])
+                self.assertAlmostEqual(matrix[i, j], expected, places=6)
+    
+    def test_legacy_import_still_works(self):
+        from .utils import haversine_distance_km
+        
+        # New York to London is about 5570 km
+        self.assertAlmostEqual(haversine_distance_km(40.7128, -74.0060, 51.5074, -0.1278), 5570, delta=5)
+    
+    def test_equirectangular_error_bound(self):
+        import numpy as np
+        from .distance import equirectangular_km, haversine_km
+        
+        rng = np.random.default_rng(7)
+        lat = rng.uniform(-80, 80, 2000)
+        lon = rng.uniform(-180, 180, 2000)
+        bearing = rng.uniform(0, 2 * np.pi, 2000)
+        distance_km = rng.uniform(0.1, 100, 2000)
+        lat2 = lat + np.degrees(distance_km / 6371.0) * np.cos(bearing)
+        lon2 = lon + np.degrees(distance_km / 6371.0) * np.sin(bearing) / np.cos(np.radians(lat))
+        exact = haversine_km(lat, lon, lat2, lon2)
+        approx = equirectangular_km(lat, lon, lat2, lon2)
+        self.assertLess(np.max(np.abs(approx - exact) / exact), 0.0005)
+    
+    def test_equirectangular_wraps_antimeridian(self):
+        from .distance import equirectangular_km, haversine_distance_km
+        
+        self.assertAlmostEqual(
+            float(equirectangular_km(0.0, 179.99, 0.0, -179.99)),
+            haversine_distance_km(0.0, 179.99, 0.0, -179.99),
+            places=3
+        )
+    
+    def test_k_nearest(self):
+        import numpy as np
+        from .distance import haversine_one_to_many, k_nearest
+        
+        indices, distances = k_nearest(18.52, 73.85, self.lats, self.lons, 5)
+        expected = np.argsort(haversine_one_to_many(18.52, 73.85, self.lats, self.lons))[:5]
+        self.assertEqual(list(indices), list(expected))
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+        
+        indices, distances = k_nearest(18.52, 73.85, self.lats, self.lons, 5, max_distance_km=0.001)
+        self.assertEqual(len(indices), 0)
+    
+    @pytest.mark.performance
+    @benchmark
+    def test_benchmark_against_scalar(self):
+        import time
+        import numpy as np
+        from .distance import haversine_distance_km, haversine_one_to_many
+        
+        lats = np.resize(self.lats, 20000)
+        lons = np.resize(self.lons, 20000)
+        
+        start = time.perf_counter()
+        scalar = [haversine_distance_km(18.52, 73.85, lat, lon) for lat, lon in zip(lats.tolist(), lons.tolist())]
+        scalar_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        vectorized = haversine_one_to_many(18.52, 73.85, lats, lons)
+        vectorized_seconds = time.perf_counter() - start
+        
+        np.testing.assert_allclose(vectorized, scalar, rtol=1e-9)
+        self.assertLess(vectorized_seconds * 5, scalar_seconds)
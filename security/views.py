@@ -15,7 +15,7 @@ from .serializers import (
     CaseUpdateStatusSerializer,
 )
 from users.models import SecurityOfficer
-from .utils import haversine_distance_km
+from .distance import haversine_distance_km
 
 
 class SOSAlertViewSet(viewsets.ModelViewSet):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SOSAlert, Case, Incident, OfficerProfile, Notification
+from .models import SOSAlert, Case, Incident, OfficerProfile, Notification, OfficerDevice, NotificationOutbox
 
 
 @admin.register(SOSAlert)
@@ -25,7 +25,7 @@ class IncidentAdmin(admin.ModelAdmin):
 
 @admin.register(OfficerProfile)
 class OfficerProfileAdmin(admin.ModelAdmin):
-    list_display = ('officer', 'on_duty', 'updated_at')
+    list_display = ('officer', 'on_duty', 'last_location_at', 'updated_at')
     list_filter = ('on_duty',)
 
 
@@ -36,3 +36,18 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ('title', 'message', 'officer__name')
     readonly_fields = ('created_at', 'read_at')
 
+
+@admin.register(OfficerDevice)
+class OfficerDeviceAdmin(admin.ModelAdmin):
+    list_display = ('id', 'officer', 'platform', 'last_seen_at')
+    list_filter = ('platform',)
+    search_fields = ('officer__name', 'token')
+    readonly_fields = ('created_at', 'last_seen_at')
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('delivery_id', 'officer', 'title', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('delivery_id', 'title', 'officer__name')
+    readonly_fields = ('delivery_id', 'created_at', 'sent_at', 'claim_token', 'locked_until')
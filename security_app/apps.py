@@ -1,4 +1,7 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class SecurityAppConfig(AppConfig):
@@ -9,3 +12,7 @@ class SecurityAppConfig(AppConfig):
     def ready(self):
         import security_app.signals
 
+        # Load the offline road graph in the background so the first navigation request doesn't pay for it
+        if getattr(settings, 'OFFLINE_ROUTING_GRAPH_PATH', '') and getattr(settings, 'OFFLINE_ROUTING_PRELOAD', True):
+            from .offline_routing import offline_router
+            threading.Thread(target=offline_router.ensure_loaded, name='offline-routing-preload', daemon=True).start()
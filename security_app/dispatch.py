@@ -0,0 +1,215 @@
+"""
+Automatic SOS dispatch.
+
+Every unassigned pending ``SOSAlert`` is matched to an on-duty officer of the
+same organization. The cost of sending an officer to an alert is:
+
+    distance_km
+    + open_cases * DISPATCH_LOAD_PENALTY_KM
+    - DISPATCH_GEOFENCE_BONUS_KM   (if the officer is assigned to the alert's geofence)
+
+Officers further than ``DISPATCH_MAX_DISTANCE_KM`` or already carrying
+``DISPATCH_MAX_OPEN_CASES`` open cases are not eligible. Officers without a
+fresh position are only eligible for alerts inside their assigned geofence,
+at the maximum distance.
+
+Alerts that arrive together are solved as one assignment problem with
+``scipy.optimize.linear_sum_assignment`` so that the total cost is minimal,
+rather than greedily giving the first alert the closest officer. When there
+are more alerts than officers the solve is repeated with updated case loads.
+
+Assignment is a conditional ``UPDATE`` on the alert, so two workers racing on
+the same alert cannot both assign it; only the winner creates the ``Case``.
+"""
+import logging
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from scipy.optimize import linear_sum_assignment
+
+from security.distance import distance_matrix_km
+
+from .officer_locations import officer_location_store
+from .streams import publish_sos_alert
+
+logger = logging.getLogger(__name__)
+
+# Cost for officer/alert pairs that must never be matched
+INFEASIBLE = 1e9
+
+OPEN_CASE_STATUSES = ('open', 'accepted')
+
+
+class DispatchEngine:
+    """Scores officers against SOS alerts and assigns the best match."""
+
+    def __init__(self, location_store=None, max_distance_km=None, load_penalty_km=None,
+                 geofence_bonus_km=None, max_open_cases=None):
+        self.location_store = location_store or officer_location_store
+        self.max_distance_km = max_distance_km or getattr(settings, 'DISPATCH_MAX_DISTANCE_KM', 25.0)
+        self.load_penalty_km = load_penalty_km if load_penalty_km is not None else getattr(
+            settings, 'DISPATCH_LOAD_PENALTY_KM', 2.0
+        )
+        self.geofence_bonus_km = geofence_bonus_km if geofence_bonus_km is not None else getattr(
+            settings, 'DISPATCH_GEOFENCE_BONUS_KM', 1.0
+        )
+        self.max_open_cases = max_open_cases or getattr(settings, 'DISPATCH_MAX_OPEN_CASES', 3)
+
+    def _candidates(self, organization_id):
+        """On-duty officers of an organization with their position and open case load."""
+        from users.models import SecurityOfficer
+
+        rows = list(
+            SecurityOfficer.objects.filter(organization_id=organization_id, is_active=True)
+            .exclude(profile__on_duty=False)
+            .annotate(open_cases=Count('assigned_cases', filter=Q(assigned_cases__status__in=OPEN_CASE_STATUSES)))
+            .values_list(
+                'id', 'assigned_geofence_id', 'open_cases',
+                'profile__last_location_lat', 'profile__last_location_long', 'profile__last_location_at',
+            )
+        )
+        fixes = self.location_store.fresh_fixes((row[0], row[3], row[4], row[5]) for row in rows)
+        return [
+            {
+                'id': officer_id,
+                'geofence_id': geofence_id,
+                'open_cases': open_cases,
+                'fix': fixes.get(officer_id),
+            }
+            for officer_id, geofence_id, open_cases, *_ in rows
+        ]
+
+    def cost_matrix(self, alerts, officers, excluded=None):
+        """
+        Cost of assigning each alert (rows) to each officer (columns).
+
+        Infeasible pairs cost ``INFEASIBLE``. ``excluded`` maps alert ids to
+        officer ids that must not receive that alert.
+        """
+        if not alerts or not officers:
+            return np.zeros((len(alerts), len(officers)))
+
+        located = np.array([officer['fix'] is not None for officer in officers])
+        officer_lats = [officer['fix'][0] if officer['fix'] else 0.0 for officer in officers]
+        officer_lngs = [officer['fix'][1] if officer['fix'] else 0.0 for officer in officers]
+        distances = distance_matrix_km(
+            [alert.location_lat for alert in alerts],
+            [alert.location_long for alert in alerts],
+            officer_lats,
+            officer_lngs,
+        )
+
+        alert_geofences = np.array([alert.geofence_id or -1 for alert in alerts])[:, None]
+        officer_geofences = np.array([officer['geofence_id'] or -2 for officer in officers])[None, :]
+        same_geofence = alert_geofences == officer_geofences
+
+        # Unlocated officers only cover alerts in their own geofence, as if at the edge of range
+        distances = np.where(located[None, :], distances, np.where(same_geofence, self.max_distance_km, np.inf))
+        loads = np.array([officer['open_cases'] for officer in officers], dtype=np.float64)[None, :]
+
+        costs = distances + loads * self.load_penalty_km - same_geofence * self.geofence_bonus_km
+        infeasible = (distances > self.max_distance_km) | (loads >= self.max_open_cases)
+        if excluded:
+            columns = {officer['id']: col for col, officer in enumerate(officers)}
+            for row, alert in enumerate(alerts):
+                for officer_id in excluded.get(alert.id, ()):
+                    if officer_id in columns:
+                        infeasible[row, columns[officer_id]] = True
+        return np.where(infeasible, INFEASIBLE, costs)
+
+    def solve(self, alerts, officers, excluded=None):
+        """
+        Match alerts to officers minimizing total cost.
+
+        Returns ``[(alert, officer)]``; alerts with no feasible officer are
+        left out. Officer case loads are updated in place.
+        """
+        matches = []
+        remaining = list(alerts)
+        while remaining and officers:
+            costs = self.cost_matrix(remaining, officers, excluded)
+            rows, cols = linear_sum_assignment(costs)
+            matched = [(row, col) for row, col in zip(rows, cols) if costs[row, col] < INFEASIBLE]
+            if not matched:
+                break
+            for row, col in matched:
+                matches.append((remaining[row], officers[col]))
+                officers[col]['open_cases'] += 1
+            matched_rows = {row for row, _ in matched}
+            remaining = [alert for index, alert in enumerate(remaining) if index not in matched_rows]
+        return matches
+
+    def _assign(self, alert, officer_id):
+        """Atomically assign one alert and open its case; returns the Case or None."""
+        from .models import Case, SOSAlert
+
+        with transaction.atomic():
+            now = timezone.now()
+            claimed = SOSAlert.objects.filter(
+                id=alert.id, assigned_officer__isnull=True, status='pending', is_deleted=False
+            ).update(assigned_officer_id=officer_id, updated_at=now)
+            if not claimed:
+                return None
+            # .update() skips the SOSAlert post_save signal, so officer streams hear of the assignment here
+            alert.assigned_officer_id = officer_id
+            alert.updated_at = now
+            publish_sos_alert(alert, created=False)
+            return Case.objects.create(
+                sos_alert_id=alert.id,
+                officer_id=officer_id,
+                status='open',
+                description='Automatically dispatched'
+            )
+
+    def dispatch(self, alerts, excluded=None):
+        """
+        Assign a batch of alerts, solving each organization jointly.
+
+        ``excluded`` maps alert ids to officer ids that must not receive them.
+
+        Returns the list of created ``Case`` instances.
+        """
+        by_organization = defaultdict(list)
+        for alert in alerts:
+            organization_id = alert.user.organization_id or (
+                alert.geofence.organization_id if alert.geofence_id else None
+            )
+            if organization_id is None:
+                logger.warning(f"SOS alert {alert.id} has no organization; not dispatched")
+                continue
+            by_organization[organization_id].append(alert)
+
+        cases = []
+        for organization_id, org_alerts in by_organization.items():
+            officers = self._candidates(organization_id)
+            assigned = 0
+            for alert, officer in self.solve(org_alerts, officers, excluded):
+                case = self._assign(alert, officer['id'])
+                if case is not None:
+                    cases.append(case)
+                    assigned += 1
+                    logger.info(f"Dispatched officer {officer['id']} to SOS alert {alert.id}")
+            if assigned < len(org_alerts):
+                logger.warning(
+                    f"{len(org_alerts) - assigned} SOS alerts in organization {organization_id} were not dispatched"
+                )
+        return cases
+
+    def dispatch_pending(self, organization_id=None):
+        """Dispatch every unassigned pending alert, optionally for one organization."""
+        from .models import SOSAlert
+
+        alerts = SOSAlert.objects.filter(
+            is_deleted=False, status='pending', assigned_officer__isnull=True
+        ).select_related('user', 'geofence').order_by('created_at')
+        if organization_id is not None:
+            alerts = alerts.filter(Q(user__organization_id=organization_id) | Q(geofence__organization_id=organization_id))
+        return self.dispatch(list(alerts))
+
+
+# Global dispatch engine instance
+dispatch_engine = DispatchEngine()
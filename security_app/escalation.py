@@ -0,0 +1,257 @@
+"""
+Escalation of SOS alerts nobody has accepted.
+
+Every pending ``SOSAlert`` carries an ``escalation_deadline`` derived from its
+priority (``ESCALATION_SLA_SECONDS``). The scheduler keeps a min-heap of
+upcoming deadlines that it refills from the database with one indexed query
+per poll, so thousands of pending timers cost one heap entry each and a
+restarted worker simply rebuilds the heap on its first poll.
+
+When a deadline passes and the alert is still pending the alert escalates:
+
+- the officer who let it lapse has their case marked ``escalated``
+- priority is bumped one step (low -> medium -> high)
+- the alert is re-dispatched to officers who have not had it yet, with the
+  search radius widened by ``ESCALATION_RADIUS_FACTOR`` per level
+- a ``SOS_ESCALATION`` alert is raised for the organization's sub-admins:
+  that of the alert's geofence, or of the user who raised it when the SOS
+  came from outside every geofence
+- the next deadline is set from the new priority
+
+Escalation claims the alert with a conditional update on
+``escalation_level``, so several scheduler processes can run side by side
+without escalating the same alert twice.
+
+The same worker also makes the first dispatch of new alerts: the
+``post_save`` signal only stamps ``dispatch_requested_at`` and every poll
+(at most ``DISPATCH_POLL_SECONDS`` apart) claims the stamped alerts and
+solves each organization's pending alerts together, outside the request.
+"""
+import heapq
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLA_SECONDS = {'high': 60, 'medium': 180, 'low': 600}
+
+PRIORITY_ESCALATION = {'low': 'medium', 'medium': 'high', 'high': 'high'}
+
+
+def sla_seconds(priority):
+    """Seconds an alert of this priority may stay unaccepted."""
+    slas = getattr(settings, 'ESCALATION_SLA_SECONDS', DEFAULT_SLA_SECONDS)
+    return slas.get(priority, slas.get('medium', DEFAULT_SLA_SECONDS['medium']))
+
+
+class EscalationScheduler:
+    """DB-backed deadline queue for pending SOS alerts."""
+
+    def __init__(self, engine=None, poll_seconds=None, lookahead_seconds=None, max_level=None,
+                 radius_factor=None):
+        self.engine = engine
+        self.poll_seconds = poll_seconds or getattr(settings, 'ESCALATION_POLL_SECONDS', 5)
+        self.dispatch_poll_seconds = getattr(settings, 'DISPATCH_POLL_SECONDS', 1)
+        self.lookahead_seconds = lookahead_seconds or getattr(settings, 'ESCALATION_LOOKAHEAD_SECONDS', 60)
+        self.max_level = max_level or getattr(settings, 'ESCALATION_MAX_LEVEL', 5)
+        self.radius_factor = radius_factor or getattr(settings, 'ESCALATION_RADIUS_FACTOR', 2.0)
+        # (deadline, alert_id); stale entries are dropped when popped
+        self._heap = []
+        self._scheduled = {}
+
+    def _engine(self):
+        if self.engine is None:
+            from .dispatch import dispatch_engine
+            self.engine = dispatch_engine
+        return self.engine
+
+    def schedule(self, alert_id, deadline):
+        """Add or move the timer for one alert."""
+        if self._scheduled.get(alert_id) == deadline:
+            return
+        self._scheduled[alert_id] = deadline
+        heapq.heappush(self._heap, (deadline, alert_id))
+
+    def refill(self, now=None):
+        """Load every pending deadline inside the lookahead window from the database."""
+        from .models import SOSAlert
+
+        now = now or timezone.now()
+        self._backfill_deadlines()
+        rows = SOSAlert.objects.filter(
+            status='pending',
+            is_deleted=False,
+            escalation_level__lt=self.max_level,
+            escalation_deadline__lte=now + timedelta(seconds=self.lookahead_seconds),
+        ).values_list('id', 'escalation_deadline')
+        for alert_id, deadline in rows.iterator():
+            self.schedule(alert_id, deadline)
+        return len(self._heap)
+
+    def _backfill_deadlines(self):
+        """Give pending alerts created before escalation existed a deadline."""
+        from .models import SOSAlert
+
+        rows = SOSAlert.objects.filter(
+            status='pending', is_deleted=False, escalation_deadline__isnull=True
+        ).values_list('id', 'priority', 'created_at')
+        for alert_id, priority, created_at in rows:
+            SOSAlert.objects.filter(id=alert_id, escalation_deadline__isnull=True).update(
+                escalation_deadline=created_at + timedelta(seconds=sla_seconds(priority))
+            )
+
+    def dispatch_requested(self):
+        """
+        Dispatch alerts queued by the post_save signal; returns the organization ids solved.
+
+        Requests are claimed with a conditional update, so a request is only
+        picked up by one worker.
+        """
+        from .models import SOSAlert
+
+        rows = SOSAlert.objects.filter(dispatch_requested_at__isnull=False).values_list(
+            'id', 'user__organization_id', 'geofence__organization_id'
+        )
+        organizations = set()
+        for alert_id, user_organization_id, geofence_organization_id in rows:
+            if not SOSAlert.objects.filter(id=alert_id, dispatch_requested_at__isnull=False).update(
+                dispatch_requested_at=None
+            ):
+                continue
+            organization_id = user_organization_id or geofence_organization_id
+            if organization_id is None:
+                # dispatch_pending(None) would re-solve every organization's pending alerts
+                logger.warning(f"SOS alert {alert_id} has no organization; not dispatched")
+                continue
+            organizations.add(organization_id)
+
+        engine = self._engine()
+        for organization_id in sorted(organizations):
+            try:
+                engine.dispatch_pending(organization_id)
+            except Exception:
+                logger.exception(f"Dispatch failed for organization {organization_id}")
+        return organizations
+
+    def next_deadline(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Remove and return ids of alerts whose deadline has passed."""
+        now = now or timezone.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, alert_id = heapq.heappop(self._heap)
+            if self._scheduled.get(alert_id) != deadline:
+                continue
+            del self._scheduled[alert_id]
+            due.append(alert_id)
+        return due
+
+    def escalate(self, alert_id, now=None):
+        """
+        Escalate one alert if it is still pending past its deadline.
+
+        Returns the new ``Case`` if the alert was re-dispatched, True if it
+        escalated without finding an officer and False if nothing happened.
+        """
+        from users.models import Alert
+        from .dispatch import DispatchEngine
+        from .models import Case, SOSAlert
+
+        now = now or timezone.now()
+        try:
+            alert = SOSAlert.objects.select_related('user', 'geofence', 'assigned_officer').get(id=alert_id)
+        except SOSAlert.DoesNotExist:
+            return False
+        if alert.status != 'pending' or alert.is_deleted or not alert.escalation_deadline \
+                or alert.escalation_deadline > now or alert.escalation_level >= self.max_level:
+            return False
+
+        level = alert.escalation_level + 1
+        priority = PRIORITY_ESCALATION.get(alert.priority, 'high')
+        with transaction.atomic():
+            claimed = SOSAlert.objects.filter(
+                id=alert.id, escalation_level=alert.escalation_level, status='pending'
+            ).update(
+                escalation_level=level,
+                priority=priority,
+                assigned_officer=None,
+                escalation_deadline=now + timedelta(seconds=sla_seconds(priority)),
+                updated_at=now,
+            )
+            if not claimed:
+                return False
+            # .update() skips the Case post_save signal, which would reset the alert status
+            Case.objects.filter(sos_alert_id=alert.id, status='open').update(status='escalated', updated_at=now)
+
+            previous_officer = alert.assigned_officer
+            # Without a geofence the notice belongs to the user's organization (Alert.objects.for_organization)
+            Alert.objects.create(
+                geofence=alert.geofence,
+                user=alert.user,
+                alert_type='SOS_ESCALATION',
+                severity='CRITICAL' if priority == 'high' else 'HIGH',
+                title=f"SOS #{alert.id} escalated to level {level}",
+                description=(
+                    f"SOS from {alert.user.username} was not accepted in time"
+                    + (f" by {previous_officer.name}" if previous_officer else "")
+                    + f". Priority is now {priority}."
+                ),
+                metadata={
+                    'sos_alert_id': alert.id,
+                    'escalation_level': level,
+                    'previous_officer_id': previous_officer.id if previous_officer else None,
+                    'latitude': alert.location_lat,
+                    'longitude': alert.location_long,
+                }
+            )
+
+        engine = self._engine()
+        ring = DispatchEngine(
+            location_store=engine.location_store,
+            max_distance_km=engine.max_distance_km * self.radius_factor ** level,
+            load_penalty_km=engine.load_penalty_km,
+            geofence_bonus_km=engine.geofence_bonus_km,
+            max_open_cases=engine.max_open_cases,
+        )
+        alert.refresh_from_db()
+        tried = set(Case.objects.filter(sos_alert_id=alert.id).values_list('officer_id', flat=True))
+        cases = ring.dispatch([alert], excluded={alert.id: tried})
+        logger.warning(
+            f"SOS alert {alert.id} escalated to level {level} (priority {priority}); "
+            f"{'re-dispatched to officer ' + str(cases[0].officer_id) if cases else 'no officer available'}"
+        )
+        return cases[0] if cases else True
+
+    def run_once(self, now=None):
+        """Dispatch new alerts, refill the queue and escalate everything that is due; returns the escalated ids."""
+        now = now or timezone.now()
+        self.dispatch_requested()
+        self.refill(now)
+        escalated = []
+        for alert_id in self.pop_due(now):
+            try:
+                if self.escalate(alert_id, now):
+                    escalated.append(alert_id)
+            except Exception:
+                logger.exception(f"Failed to escalate SOS alert {alert_id}")
+        return escalated
+
+    def run_forever(self):
+        """Poll and escalate until interrupted."""
+        logger.info("SOS escalation scheduler started")
+        while True:
+            self.run_once()
+            # Sleep until the next poll, or earlier if a known deadline falls before it;
+            # new alerts wait at most DISPATCH_POLL_SECONDS for their first dispatch
+            wait = min(self.poll_seconds, self.dispatch_poll_seconds)
+            deadline = self.next_deadline()
+            if deadline is not None:
+                wait = max(0.1, min(wait, (deadline - timezone.now()).total_seconds()))
+            time.sleep(wait)
@@ -1,34 +1,44 @@
 import requests
 import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 from django.utils import timezone
 
+from core.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Most registration tokens FCM accepts in one request
+MAX_TOKENS_PER_REQUEST = 1000
+
+# Per-token errors meaning the token will never work again
+PRUNE_ERRORS = frozenset({'NotRegistered', 'InvalidRegistration', 'MismatchSenderId'})
+
 
 class FCMService:
     """Firebase Cloud Messaging service for sending push notifications"""
     
     def __init__(self):
         self.server_key = getattr(settings, 'FCM_SERVER_KEY', None)
-        self.fcm_url = 'https://fcm.googleapis.com/fcm/send'
+        self.fcm_url = getattr(settings, 'FCM_URL', 'https://fcm.googleapis.com/fcm/send')
+        self.max_workers = getattr(settings, 'FCM_MAX_WORKERS', 8)
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
-    def send_notification(self, registration_tokens, title, body, data=None):
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fcm-send')
+            return self._executor
+    
+    def _post(self, registration_tokens, title, body, data=None):
         """
-        Send push notification to FCM tokens
-        
-        Args:
-            registration_tokens (list): List of FCM registration tokens
-            title (str): Notification title
-            body (str): Notification body
-            data (dict): Additional data payload
+        One FCM request for at most MAX_TOKENS_PER_REQUEST tokens.
+        Returns {token: result}, where a result has either ``message_id`` or ``error``
+        and optionally a canonical ``registration_id``.
         """
-        if not self.server_key:
-            print("FCM_SERVER_KEY not configured. Skipping push notification.")
-            return False
-        
-        if not registration_tokens:
-            print("No registration tokens provided.")
-            return False
-        
         headers = {
             'Authorization': f'key={self.server_key}',
             'Content-Type': 'application/json'
@@ -47,45 +57,140 @@ class FCMService:
         }
         
         try:
-            response = requests.post(
+            response = http_clients.get('fcm').post(
                 self.fcm_url,
                 headers=headers,
-                data=json.dumps(payload),
-                timeout=10
+                data=json.dumps(payload)
             )
             response.raise_for_status()
-            
-            result = response.json()
-            if result.get('success', 0) > 0:
-                print(f"FCM notification sent successfully to {result.get('success')} devices")
-                return True
-            else:
-                print(f"FCM notification failed: {result}")
-                return False
-                
+            results = response.json().get('results', [])
         except requests.RequestException as e:
-            print(f"FCM request failed: {str(e)}")
+            logger.warning(f"FCM request failed: {str(e)}")
+            return {token: {'error': 'Unavailable'} for token in registration_tokens}
+        except ValueError as e:
+            logger.warning(f"FCM returned an unreadable response: {str(e)}")
+            return {token: {'error': 'InvalidResponse'} for token in registration_tokens}
+        
+        # Results come back in the order of registration_ids
+        results = list(results) + [{'error': 'MissingResult'}] * (len(registration_tokens) - len(results))
+        return dict(zip(registration_tokens, results))
+    
+    def send_multicast(self, jobs):
+        """
+        Send several notifications, each to many tokens.
+        
+        Token lists are split into requests of MAX_TOKENS_PER_REQUEST and all
+        requests run concurrently on a bounded thread pool over the pooled FCM
+        connection. Tokens FCM reports as invalid are pruned and canonical
+        tokens replace the ones FCM says are outdated.
+        
+        Args:
+            jobs (list): (registration_tokens, title, body, data) tuples
+        
+        Returns:
+            list: per job, {token: error or None}
+        """
+        requests_to_send = []
+        for index, (registration_tokens, title, body, data) in enumerate(jobs):
+            unique_tokens = list(dict.fromkeys(registration_tokens))
+            for start in range(0, len(unique_tokens), MAX_TOKENS_PER_REQUEST):
+                requests_to_send.append((index, unique_tokens[start:start + MAX_TOKENS_PER_REQUEST], title, body, data))
+        
+        if len(requests_to_send) == 1:
+            responses = [self._post(*requests_to_send[0][1:])]
+        else:
+            executor = self._get_executor()
+            futures = [executor.submit(self._post, *request[1:]) for request in requests_to_send]
+            responses = [future.result() for future in futures]
+        
+        outcomes = [{} for _ in jobs]
+        invalid, canonical = [], {}
+        for (index, *_), response in zip(requests_to_send, responses):
+            for token, result in response.items():
+                error = result.get('error')
+                outcomes[index][token] = error
+                if error in PRUNE_ERRORS:
+                    invalid.append(token)
+                elif result.get('registration_id') and result['registration_id'] != token:
+                    canonical[token] = result['registration_id']
+        
+        self.prune_tokens(invalid)
+        self.replace_tokens(canonical)
+        return outcomes
+    
+    def send_notification(self, registration_tokens, title, body, data=None):
+        """
+        Send push notification to FCM tokens
+        
+        Args:
+            registration_tokens (list): List of FCM registration tokens
+            title (str): Notification title
+            body (str): Notification body
+            data (dict): Additional data payload
+        """
+        if not self.server_key:
+            print("FCM_SERVER_KEY not configured. Skipping push notification.")
+            return False
+        
+        if not registration_tokens:
+            print("No registration tokens provided.")
             return False
+        
+        try:
+            outcome = self.send_multicast([(registration_tokens, title, body, data)])[0]
         except Exception as e:
             print(f"FCM error: {str(e)}")
             return False
+        
+        success = sum(1 for error in outcome.values() if error is None)
+        if success > 0:
+            print(f"FCM notification sent successfully to {success} devices")
+            return True
+        print(f"FCM notification failed: {outcome}")
+        return False
+    
+    def prune_tokens(self, registration_tokens):
+        """Forget tokens FCM reported as invalid or unregistered"""
+        from .models import OfficerDevice
+        
+        if not registration_tokens:
+            return 0
+        deleted, _ = OfficerDevice.objects.filter(token__in=registration_tokens).delete()
+        logger.info(f"Pruned {deleted} invalid FCM tokens")
+        return deleted
+    
+    def replace_tokens(self, canonical):
+        """Swap outdated tokens for the canonical ones FCM returned"""
+        from .models import OfficerDevice
+        
+        for old_token, new_token in canonical.items():
+            if OfficerDevice.objects.filter(token=new_token).exists():
+                OfficerDevice.objects.filter(token=old_token).delete()
+            else:
+                OfficerDevice.objects.filter(token=old_token).update(token=new_token, last_seen_at=timezone.now())
+    
+    def get_officer_tokens(self, officer):
+        """
+        FCM registration tokens of an officer's devices
+        """
+        return self.get_tokens_for_officers([officer.id]).get(officer.id, [])
+    
+    def get_tokens_for_officers(self, officer_ids):
+        """
+        Registration tokens per officer id, loaded with one query
+        """
+        from .models import OfficerDevice
+        
+        tokens = {}
+        for officer_id, token in OfficerDevice.objects.filter(officer_id__in=officer_ids).values_list('officer_id', 'token'):
+            tokens.setdefault(officer_id, []).append(token)
+        return tokens
     
     def send_to_officer(self, officer, title, body, data=None):
         """
         Send notification to a specific officer
         """
-        # In a real implementation, you'd get FCM tokens from officer's device
-        # For now, we'll use a placeholder
-        registration_tokens = getattr(officer, 'fcm_tokens', [])
-        if not registration_tokens:
-            # Fallback: try to get from a related model or user profile
-            try:
-                if hasattr(officer, 'user') and hasattr(officer.user, 'fcm_tokens'):
-                    registration_tokens = officer.user.fcm_tokens
-            except:
-                pass
-        
-        return self.send_notification(registration_tokens, title, body, data)
+        return self.send_notification(self.get_officer_tokens(officer), title, body, data)
 
 
 # Global FCM service instance
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from security_app.notification_counters import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount unread notifications per officer and repair drifted badge counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--officer',
+            type=int,
+            action='append',
+            dest='officers',
+            help='Only reconcile this officer ID (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        repaired = reconcile_unread_counts(options['officers'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Repaired {repaired} unread notification counters')
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from security_app.escalation import EscalationScheduler
+
+
+class Command(BaseCommand):
+    help = 'Escalate SOS alerts that were not accepted within their SLA window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process due escalations once and exit instead of polling forever'
+        )
+        parser.add_argument(
+            '--poll-seconds',
+            type=int,
+            default=None,
+            help='Seconds between database polls'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = EscalationScheduler(poll_seconds=options['poll_seconds'])
+        if options['once']:
+            escalated = scheduler.run_once()
+            self.stdout.write(
+                self.style.SUCCESS(f'Escalated {len(escalated)} SOS alerts')
+            )
+            return
+
+        self.stdout.write(self.style.SUCCESS('Escalation scheduler running; press Ctrl+C to stop'))
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Escalation scheduler stopped'))
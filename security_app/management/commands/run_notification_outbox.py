@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from security_app.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued officer push notifications from the notification outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver one batch and exit instead of polling forever'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Messages claimed per batch'
+        )
+        parser.add_argument(
+            '--poll-seconds',
+            type=int,
+            default=None,
+            help='Seconds to wait when the outbox is empty'
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options['batch_size'], poll_seconds=options['poll_seconds'])
+        if options['once']:
+            counts = dispatcher.run_once()
+            summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(counts.items())) or 'nothing due'
+            self.stdout.write(self.style.SUCCESS(f'Outbox batch processed: {summary}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Notification outbox worker running; press Ctrl+C to stop'))
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Notification outbox worker stopped'))
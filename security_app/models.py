@@ -1,6 +1,11 @@
+import uuid
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from users.models import Geofence, SecurityOfficer
+from .escalation import sla_seconds
 
 
 User = get_user_model()
@@ -43,6 +48,11 @@ class SOSAlert(models.Model):
         related_name='assigned_security_app_alerts'
     )
     is_deleted = models.BooleanField(default=False)
+    # When the alert escalates if still pending; see security_app.escalation
+    escalation_deadline = models.DateTimeField(blank=True, null=True, db_index=True)
+    escalation_level = models.PositiveSmallIntegerField(default=0)
+    # Set while the alert waits for the escalation worker to dispatch it
+    dispatch_requested_at = models.DateTimeField(blank=True, null=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -54,12 +64,23 @@ class SOSAlert(models.Model):
     def __str__(self):
         return f"SOSAlert #{self.id} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        if self.escalation_deadline is None and self.status == 'pending':
+            self.escalation_deadline = (self.created_at or timezone.now()) + timedelta(
+                seconds=sla_seconds(self.priority)
+            )
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'escalation_deadline'}
+        super().save(*args, **kwargs)
+
 
 class Case(models.Model):
     STATUS_CHOICES = [
         ('open', 'Open'),
         ('accepted', 'Accepted'),
         ('resolved', 'Resolved'),
+        ('escalated', 'Escalated'),
     ]
 
     sos_alert = models.ForeignKey(
@@ -95,6 +116,12 @@ class OfficerProfile(models.Model):
         related_name='profile'
     )
     on_duty = models.BooleanField(default=True)
+    # Last known position, persisted periodically from the live location store
+    last_location_lat = models.FloatField(blank=True, null=True)
+    last_location_long = models.FloatField(blank=True, null=True)
+    last_location_at = models.DateTimeField(blank=True, null=True)
+    # Denormalized unread Notification count; see security_app.notification_counters
+    unread_notifications = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -186,7 +213,92 @@ class Notification(models.Model):
         return f"Notification for {self.officer.name}: {self.title}"
 
     def mark_as_read(self):
+        """Mark read and decrement the officer's unread counter; returns False if it was already read."""
         from django.utils import timezone
-        self.is_read = True
+        from .notification_counters import decrement_unread
         self.read_at = timezone.now()
-        self.save(update_fields=['is_read', 'read_at'])
+        # Conditional update, so concurrent acknowledgements only decrement once
+        updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=self.read_at)
+        self.is_read = True
+        if updated:
+            decrement_unread({self.officer_id: 1})
+        return bool(updated)
+
+
+class OfficerDevice(models.Model):
+    PLATFORM_CHOICES = [
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+        ('web', 'Web'),
+    ]
+
+    officer = models.ForeignKey(
+        SecurityOfficer,
+        on_delete=models.CASCADE,
+        related_name='devices'
+    )
+    # FCM registration token; removed when FCM reports it invalid or unregistered
+    token = models.CharField(max_length=512, unique=True)
+    platform = models.CharField(max_length=10, choices=PLATFORM_CHOICES, default='android')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-last_seen_at']
+        verbose_name = 'Officer Device'
+        verbose_name_plural = 'Officer Devices'
+
+    def __str__(self):
+        return f"{self.get_platform_display()} device of {self.officer.name}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Push notification waiting to be delivered by the outbox worker.
+    Rows are written in the same transaction as the event that caused them;
+    see security_app.outbox.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('in_flight', 'In Flight'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+
+    # Sent with the push so devices can drop duplicates of a redelivered message;
+    # shared by every recipient of a fan-out so they can go out as one multicast
+    delivery_id = models.UUIDField(default=uuid.uuid4, db_index=True, editable=False)
+    officer = models.ForeignKey(
+        SecurityOfficer,
+        on_delete=models.CASCADE,
+        related_name='outbox_messages'
+    )
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='outbox_messages'
+    )
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set while a worker holds the message; an expired lease makes it claimable again
+    claim_token = models.UUIDField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+        verbose_name = 'Notification Outbox Message'
+        verbose_name_plural = 'Notification Outbox'
+
+    def __str__(self):
+        return f"Outbox {self.delivery_id} for {self.officer_id} ({self.status})"
@@ -0,0 +1,128 @@
+"""
+Unread notification counters per officer.
+
+``OfficerProfile.unread_notifications`` is kept in step with the
+``Notification`` table so the officer app's badge and the dashboard never
+count rows:
+
+- creating an unread notification increments it (the ``post_save`` signal,
+  or one ``UPDATE`` for a bulk SOS fan-out)
+- ``Notification.mark_as_read`` and ``mark_read`` decrement it by the rows
+  their conditional update actually flipped
+- deleting an unread notification decrements it
+
+All changes are single ``F()`` updates, so concurrent requests cannot lose
+increments. Paths that bypass these (raw ``.update()`` calls, admin edits of
+``is_read``) can still drift, which ``reconcile_unread_counts`` repairs; run
+it periodically with ``manage.py reconcile_notification_counters``.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _ensure_profiles(officer_ids):
+    """Create missing profiles so counter updates have a row to hit."""
+    from .models import OfficerProfile
+
+    existing = set(OfficerProfile.objects.filter(officer_id__in=officer_ids).values_list('officer_id', flat=True))
+    missing = [OfficerProfile(officer_id=officer_id) for officer_id in officer_ids if officer_id not in existing]
+    if missing:
+        OfficerProfile.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def increment_unread(officer_ids):
+    """
+    Add one unread notification per occurrence of an officer id.
+
+    A fan-out where every officer gets one notification is a single UPDATE.
+    """
+    from .models import OfficerProfile
+
+    counts = Counter(officer_ids)
+    if not counts:
+        return
+    _ensure_profiles(list(counts))
+    by_amount = {}
+    for officer_id, amount in counts.items():
+        by_amount.setdefault(amount, []).append(officer_id)
+    for amount, ids in by_amount.items():
+        OfficerProfile.objects.filter(officer_id__in=ids).update(
+            unread_notifications=F('unread_notifications') + amount
+        )
+
+
+def decrement_unread(counts):
+    """Subtract ``{officer_id: n}`` read or deleted notifications, never going below zero."""
+    from .models import OfficerProfile
+
+    by_amount = {}
+    for officer_id, amount in counts.items():
+        if amount:
+            by_amount.setdefault(amount, []).append(officer_id)
+    for amount, ids in by_amount.items():
+        OfficerProfile.objects.filter(officer_id__in=ids).update(
+            unread_notifications=Greatest(F('unread_notifications') - amount, 0)
+        )
+
+
+def unread_count(officer_id):
+    """The officer's unread count from the counter, initializing it on first use."""
+    from .models import OfficerProfile
+
+    count = OfficerProfile.objects.filter(officer_id=officer_id).values_list('unread_notifications', flat=True).first()
+    if count is None:
+        reconcile_unread_counts([officer_id])
+        count = OfficerProfile.objects.filter(officer_id=officer_id).values_list('unread_notifications', flat=True).first()
+    return count or 0
+
+
+def reconcile_unread_counts(officer_ids=None):
+    """
+    Recount unread notifications and repair counters that drifted.
+
+    Each repair is conditional on the counter still holding the value that
+    was compared, so an increment racing with the reconciler is not lost;
+    that officer is simply checked again on the next run.
+
+    Returns the number of counters repaired.
+    """
+    from .models import Notification, OfficerProfile
+
+    actual = Notification.objects.filter(is_read=False)
+    profiles = OfficerProfile.objects.all()
+    if officer_ids is not None:
+        actual = actual.filter(officer_id__in=officer_ids)
+        profiles = profiles.filter(officer_id__in=officer_ids)
+    actual = dict(actual.values('officer_id').annotate(unread=Count('id')).values_list('officer_id', 'unread'))
+    _ensure_profiles(list(actual))
+
+    repaired = 0
+    for officer_id, stored in profiles.values_list('officer_id', 'unread_notifications').iterator():
+        expected = actual.get(officer_id, 0)
+        if stored != expected:
+            repaired += OfficerProfile.objects.filter(
+                officer_id=officer_id, unread_notifications=stored
+            ).update(unread_notifications=expected)
+    if repaired:
+        logger.warning(f"Repaired {repaired} drifted unread notification counters")
+    return repaired
+
+
+def mark_read(officer_id, notifications):
+    """
+    Mark an officer's notifications read with one UPDATE and decrement the counter
+    by the number of rows that statement actually flipped.
+    """
+    with transaction.atomic():
+        updated = notifications.filter(officer_id=officer_id, is_read=False).update(
+            is_read=True, read_at=timezone.now()
+        )
+        decrement_unread({officer_id: updated})
+    return updated
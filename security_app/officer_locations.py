@@ -0,0 +1,202 @@
+"""
+Live officer position store.
+
+The latest fix per officer is kept in process memory and written through to
+the Django cache, so other worker processes can see it until it goes stale
+after ``OFFICER_LOCATION_TTL_SECONDS``. Fixes are persisted to
+``OfficerProfile`` in one batch at most every
+``OFFICER_LOCATION_PERSIST_SECONDS``; the persisted position is the last
+fallback when neither memory nor cache has the officer.
+
+Nearest-officer queries load the on-duty officers of an organization with a
+single query and rank them with the vectorized haversine kernel, which for
+the hundreds of officers an organization has is faster than building and
+maintaining a KD-tree.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from security.distance import k_nearest
+
+logger = logging.getLogger(__name__)
+
+
+class OfficerLocationStore:
+    """Latest position per officer with TTL staleness and batched persistence."""
+
+    CACHE_KEY = 'officer_location:{}'
+
+    def __init__(self, ttl_seconds=None, persist_interval_seconds=None):
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'OFFICER_LOCATION_TTL_SECONDS', 300)
+        self.persist_interval_seconds = persist_interval_seconds if persist_interval_seconds is not None else getattr(
+            settings, 'OFFICER_LOCATION_PERSIST_SECONDS', 60
+        )
+        self._lock = threading.Lock()
+        # officer_id -> (lat, lng, epoch seconds)
+        self._fixes = {}
+        self._dirty = set()
+        self._last_persist = time.monotonic()
+
+    def _is_fresh(self, fix, now=None):
+        now = now if now is not None else time.time()
+        return fix is not None and now - fix[2] <= self.ttl_seconds
+
+    def update(self, officer_id, lat, lng, timestamp=None):
+        """Record a new fix for an officer; returns False if a newer fix was already stored."""
+        timestamp = timestamp or timezone.now()
+        fix = (float(lat), float(lng), timestamp.timestamp())
+        with self._lock:
+            current = self._fixes.get(officer_id)
+            if current is not None and current[2] > fix[2]:
+                # Out-of-order fix; keep the newer one
+                return False
+            self._fixes[officer_id] = fix
+            self._dirty.add(officer_id)
+            persist_due = time.monotonic() - self._last_persist >= self.persist_interval_seconds
+
+        cache.set(self.CACHE_KEY.format(officer_id), fix, timeout=self.ttl_seconds)
+        if persist_due:
+            self.persist()
+        return True
+
+    def get(self, officer_id):
+        """Return the fresh ``(lat, lng, epoch)`` fix for an officer, or None."""
+        fix = self._fixes.get(officer_id)
+        if not self._is_fresh(fix):
+            fix = cache.get(self.CACHE_KEY.format(officer_id))
+        return fix if self._is_fresh(fix) else None
+
+    def forget(self, officer_id=None):
+        """Drop in-memory state for one officer, or for everyone."""
+        with self._lock:
+            if officer_id is None:
+                self._fixes.clear()
+                self._dirty.clear()
+            else:
+                self._fixes.pop(officer_id, None)
+                self._dirty.discard(officer_id)
+
+    def persist(self):
+        """Write every fix received since the last persist to ``OfficerProfile``."""
+        from .models import OfficerProfile
+
+        with self._lock:
+            pending = {officer_id: self._fixes[officer_id] for officer_id in self._dirty}
+            self._dirty.clear()
+            self._last_persist = time.monotonic()
+        if not pending:
+            return 0
+
+        profiles = {profile.officer_id: profile for profile in OfficerProfile.objects.filter(officer_id__in=pending)}
+        missing = [OfficerProfile(officer_id=officer_id) for officer_id in pending if officer_id not in profiles]
+        if missing:
+            OfficerProfile.objects.bulk_create(missing, ignore_conflicts=True)
+            profiles.update(
+                (profile.officer_id, profile)
+                for profile in OfficerProfile.objects.filter(officer_id__in=[p.officer_id for p in missing])
+            )
+
+        for officer_id, (lat, lng, epoch) in pending.items():
+            profile = profiles[officer_id]
+            profile.last_location_lat = lat
+            profile.last_location_long = lng
+            profile.last_location_at = datetime.fromtimestamp(epoch, tz=dt_timezone.utc)
+        OfficerProfile.objects.bulk_update(
+            [profiles[officer_id] for officer_id in pending],
+            ['last_location_lat', 'last_location_long', 'last_location_at'],
+            batch_size=500
+        )
+        logger.info(f"Persisted {len(pending)} officer locations")
+        return len(pending)
+
+    def fresh_fixes(self, rows):
+        """
+        Resolve fresh fixes for many officers at once.
+
+        Memory is checked first, then the shared cache with one ``get_many``,
+        then the persisted position.
+
+        Args:
+            rows: iterable of ``(officer_id, stored_lat, stored_lng, stored_at)``
+
+        Returns:
+            dict of ``officer_id -> (lat, lng, epoch)`` for officers with a fresh fix
+        """
+        rows = list(rows)
+        now = time.time()
+        fixes = {officer_id: self._fixes.get(officer_id) for officer_id, *_ in rows}
+        missing = [officer_id for officer_id, fix in fixes.items() if not self._is_fresh(fix, now)]
+        if missing:
+            cached = cache.get_many([self.CACHE_KEY.format(officer_id) for officer_id in missing])
+            for officer_id in missing:
+                fixes[officer_id] = cached.get(self.CACHE_KEY.format(officer_id))
+
+        fresh = {}
+        for officer_id, stored_lat, stored_lng, stored_at in rows:
+            fix = fixes.get(officer_id)
+            if not self._is_fresh(fix, now) and stored_at is not None:
+                fix = (stored_lat, stored_lng, stored_at.timestamp())
+            if self._is_fresh(fix, now):
+                fresh[officer_id] = fix
+        return fresh
+
+    def nearest(self, lat, lng, k=5, organization_id=None, max_distance_km=None):
+        """
+        Return the ``k`` on-duty officers closest to a point, nearest first.
+
+        Officers without a fresh position are skipped. Each result is a dict
+        with ``officer_id``, ``name``, ``organization_id``, ``lat``, ``lng``,
+        ``distance_km`` and ``updated_at``.
+        """
+        from users.models import SecurityOfficer
+
+        officers = SecurityOfficer.objects.filter(is_active=True).exclude(profile__on_duty=False)
+        if organization_id is not None:
+            officers = officers.filter(organization_id=organization_id)
+        rows = list(officers.values_list(
+            'id', 'name', 'organization_id',
+            'profile__last_location_lat', 'profile__last_location_long', 'profile__last_location_at',
+        ))
+
+        fixes = self.fresh_fixes(
+            (officer_id, stored_lat, stored_lng, stored_at)
+            for officer_id, _, _, stored_lat, stored_lng, stored_at in rows
+        )
+        candidates = [
+            (officer_id, name, org_id, fixes[officer_id])
+            for officer_id, name, org_id, *_ in rows
+            if officer_id in fixes
+        ]
+        if not candidates:
+            return []
+
+        indices, distances = k_nearest(
+            lat, lng,
+            [candidate[3][0] for candidate in candidates],
+            [candidate[3][1] for candidate in candidates],
+            k,
+            max_distance_km=max_distance_km
+        )
+        results = []
+        for index, distance_km in zip(indices.tolist(), distances.tolist()):
+            officer_id, name, org_id, (officer_lat, officer_lng, epoch) = candidates[index]
+            results.append({
+                'officer_id': officer_id,
+                'name': name,
+                'organization_id': org_id,
+                'lat': officer_lat,
+                'lng': officer_lng,
+                'distance_km': round(distance_km, 3),
+                'updated_at': datetime.fromtimestamp(epoch, tz=dt_timezone.utc),
+            })
+        return results
+
+
+# Global officer location store instance
+officer_location_store = OfficerLocationStore()
@@ -0,0 +1,267 @@
+"""
+Offline road-graph routing used when Google Maps is unavailable.
+
+The graph is read from ``OFFLINE_ROUTING_GRAPH_PATH``, a CSV edge list such
+as one exported from OpenStreetMap::
+
+    from_id,from_lat,from_lng,to_id,to_lat,to_lng,length_m,speed_kmh,oneway,name
+
+``length_m``, ``speed_kmh``, ``oneway`` and ``name`` may be left empty; the
+length then defaults to the haversine distance, the speed to
+``OFFLINE_ROUTING_DEFAULT_SPEED_KMH`` and the edge is two-way.
+
+The graph is loaded into a networkx ``DiGraph`` once per worker (in the
+background from ``SecurityAppConfig.ready``, or lazily on first use) and
+compiled into compressed adjacency arrays. Route endpoints are snapped to
+the nearest node with a KD-tree and the fastest path is found with A*,
+which stops as soon as the target is settled. Its heuristic is the
+straight-line distance to the target at the fastest straight-line speed of
+any edge in the graph, so it never overestimates and the route is still the
+fastest one, while a query only explores the nodes between the endpoints
+instead of the whole city.
+"""
+import csv
+import heapq
+import logging
+import math
+import threading
+
+import networkx as nx
+import numpy as np
+from django.conf import settings
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+from security.distance import EARTH_RADIUS_KM, haversine_distance_km
+
+logger = logging.getLogger(__name__)
+
+
+def encode_polyline(points):
+    """Encode ``[(lat, lng)]`` with Google's polyline algorithm (5 decimal places)."""
+    result = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_e5 = int(round(lat * 1e5))
+        lng_e5 = int(round(lng * 1e5))
+        for delta in (lat_e5 - prev_lat, lng_e5 - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lng = lat_e5, lng_e5
+    return ''.join(result)
+
+
+def _format_distance(meters):
+    return f"{meters / 1000:.1f} km" if meters >= 1000 else f"{int(round(meters))} m"
+
+
+def _format_duration(seconds):
+    minutes = max(1, int(round(seconds / 60)))
+    return f"{minutes} min" if minutes < 60 else f"{minutes // 60} h {minutes % 60} min"
+
+
+class OfflineRouter:
+    """Shortest-path routing over a preloaded road graph."""
+
+    def __init__(self, graph_path=None, default_speed_kmh=None, max_snap_meters=None):
+        self.graph_path = graph_path
+        self.default_speed_kmh = default_speed_kmh or getattr(settings, 'OFFLINE_ROUTING_DEFAULT_SPEED_KMH', 30.0)
+        self.max_snap_meters = max_snap_meters or getattr(settings, 'OFFLINE_ROUTING_MAX_SNAP_METERS', 1000.0)
+        self._lock = threading.Lock()
+        self._load_failed = False
+        self.graph = None
+        self._tree = None
+        self._node_ids = None
+        self._matrix = None
+        self._adjacency = None
+        self._points = None
+        self._max_speed_mps = 0.0
+        self._origin_lat = 0.0
+
+    def get_graph_path(self):
+        return self.graph_path or getattr(settings, 'OFFLINE_ROUTING_GRAPH_PATH', None)
+
+    @property
+    def is_configured(self):
+        return bool(self.get_graph_path())
+
+    def _project(self, lats, lngs):
+        """Equirectangular projection to meters around the graph's mean latitude."""
+        scale = math.radians(1) * EARTH_RADIUS_KM * 1000
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        return np.column_stack((lngs * scale * math.cos(math.radians(self._origin_lat)), lats * scale))
+
+    def load(self, path=None):
+        """Read the edge list and build the graph and snapping index."""
+        path = path or self.get_graph_path()
+        graph = nx.DiGraph()
+        with open(path, newline='') as handle:
+            for row in csv.DictReader(handle):
+                u, v = row['from_id'], row['to_id']
+                u_lat, u_lng = float(row['from_lat']), float(row['from_lng'])
+                v_lat, v_lng = float(row['to_lat']), float(row['to_lng'])
+                graph.add_node(u, lat=u_lat, lng=u_lng)
+                graph.add_node(v, lat=v_lat, lng=v_lng)
+                length_m = float(row.get('length_m') or 0) or haversine_distance_km(u_lat, u_lng, v_lat, v_lng) * 1000
+                speed_kmh = float(row.get('speed_kmh') or 0) or self.default_speed_kmh
+                attrs = {
+                    'length_m': length_m,
+                    'travel_time_s': length_m / (speed_kmh / 3.6),
+                    'name': (row.get('name') or '').strip(),
+                }
+                graph.add_edge(u, v, **attrs)
+                if str(row.get('oneway') or '').strip().lower() not in ('1', 'true', 'yes'):
+                    graph.add_edge(v, u, **attrs)
+
+        node_ids = list(graph.nodes)
+        lats = [graph.nodes[node]['lat'] for node in node_ids]
+        lngs = [graph.nodes[node]['lng'] for node in node_ids]
+        self._origin_lat = sum(lats) / len(lats) if lats else 0.0
+        index = {node: position for position, node in enumerate(node_ids)}
+        rows, cols, weights = [], [], []
+        for u, v, travel_time_s in graph.edges(data='travel_time_s'):
+            rows.append(index[u])
+            cols.append(index[v])
+            # csgraph treats zero weights as missing edges
+            weights.append(max(travel_time_s, 1e-3))
+        self._matrix = csr_matrix((weights, (rows, cols)), shape=(len(node_ids), len(node_ids)))
+        # Plain lists are much faster than numpy scalars in the search loop
+        self._adjacency = (
+            self._matrix.indptr.tolist(), self._matrix.indices.tolist(), self._matrix.data.tolist()
+        )
+        self._points = self._project(lats, lngs)
+        # Fastest straight-line progress any edge makes; bounds the A* heuristic
+        if rows:
+            straight_m = np.hypot(*(self._points[cols] - self._points[rows]).T)
+            self._max_speed_mps = float(np.max(straight_m / np.asarray(weights)))
+        else:
+            self._max_speed_mps = 0.0
+        self._tree = cKDTree(self._points) if node_ids else None
+        self._node_ids = node_ids
+        self.graph = graph
+        logger.info(f"Offline routing graph loaded: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+        return graph
+
+    def ensure_loaded(self):
+        """Load the configured graph once; returns False if none is configured or it failed."""
+        if self.graph is not None:
+            return True
+        if not self.is_configured or self._load_failed:
+            return False
+        with self._lock:
+            if self.graph is None and not self._load_failed:
+                try:
+                    self.load()
+                except (OSError, KeyError, ValueError) as e:
+                    self._load_failed = True
+                    logger.error(f"Failed to load offline routing graph: {str(e)}")
+        return self.graph is not None
+
+    def nearest_node(self, lat, lng):
+        """Return ``(node_index, distance_m)`` of the closest graph node."""
+        distance, index = self._tree.query(self._project([lat], [lng])[0])
+        return int(index), float(distance)
+
+    def shortest_path(self, source, target):
+        """
+        A* search between two node indexes.
+
+        Returns ``(positions, settled)``: the node indexes from source to
+        target, or None if the target is unreachable, and the number of nodes
+        settled on the way.
+        """
+        if self._max_speed_mps > 0:
+            offsets = self._points - self._points[target]
+            estimates = (np.hypot(offsets[:, 0], offsets[:, 1]) / self._max_speed_mps).tolist()
+        else:
+            estimates = [0.0] * len(self._node_ids)
+        indptr, neighbours, weights = self._adjacency
+
+        best = {source: 0.0}
+        predecessors = {source: -1}
+        settled = set()
+        queue = [(estimates[source], source)]
+        while queue:
+            _, node = heapq.heappop(queue)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node == target:
+                positions = [target]
+                while positions[-1] != source:
+                    positions.append(predecessors[positions[-1]])
+                return positions[::-1], len(settled)
+            cost = best[node]
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = neighbours[edge]
+                candidate = cost + weights[edge]
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    predecessors[neighbour] = node
+                    heapq.heappush(queue, (candidate + estimates[neighbour], neighbour))
+        return None, len(settled)
+
+    def route(self, from_lat, from_lng, to_lat, to_lng):
+        """
+        Route between two points over the road graph.
+
+        Returns a dict shaped like the Google Maps route (``distance_km``,
+        ``duration_minutes``, ``polyline``, ``steps``, ``summary``) or None if
+        no graph is loaded, an endpoint is too far from any road or the
+        endpoints are not connected.
+        """
+        if not self.ensure_loaded() or self._tree is None:
+            return None
+        source, source_snap = self.nearest_node(from_lat, from_lng)
+        target, target_snap = self.nearest_node(to_lat, to_lng)
+        if max(source_snap, target_snap) > self.max_snap_meters:
+            return None
+
+        positions, _ = self.shortest_path(source, target)
+        if positions is None:
+            return None
+        graph = self.graph
+        path = [self._node_ids[position] for position in positions]
+
+        # The stretches to and from the snapped nodes are counted at the default road speed
+        length_m = source_snap + target_snap
+        travel_time_s = (source_snap + target_snap) / (self.default_speed_kmh / 3.6)
+        steps = []
+        for u, v in zip(path, path[1:]):
+            edge = graph.edges[u, v]
+            length_m += edge['length_m']
+            travel_time_s += edge['travel_time_s']
+            if steps and steps[-1]['name'] == edge['name']:
+                steps[-1]['length_m'] += edge['length_m']
+                steps[-1]['travel_time_s'] += edge['travel_time_s']
+            else:
+                steps.append({'name': edge['name'], 'length_m': edge['length_m'], 'travel_time_s': edge['travel_time_s']})
+
+        points = [(from_lat, from_lng)]
+        points.extend((graph.nodes[node]['lat'], graph.nodes[node]['lng']) for node in path)
+        points.append((to_lat, to_lng))
+        distance_km = length_m / 1000
+        duration_minutes = travel_time_s / 60
+        return {
+            'distance_km': round(distance_km, 2),
+            'duration_minutes': round(duration_minutes, 1),
+            'polyline': encode_polyline(points),
+            'steps': [
+                {
+                    'instruction': f"Continue on {step['name']}" if step['name'] else 'Continue on unnamed road',
+                    'distance': _format_distance(step['length_m']),
+                    'duration': _format_duration(step['travel_time_s']),
+                }
+                for step in steps
+            ],
+            'summary': f"{_format_distance(length_m)} - {_format_duration(travel_time_s)}",
+            'source': 'offline',
+        }
+
+
+# Global offline router instance
+offline_router = OfflineRouter()
@@ -0,0 +1,219 @@
+"""
+Transactional outbox for officer push notifications.
+
+Signals never call FCM. They add ``NotificationOutbox`` rows next to the
+``Notification`` rows, in the same transaction as the SOS alert or case that
+caused them, so a request only pays for the inserts and no push is sent for
+an alert that rolled back.
+
+The ``run_notification_outbox`` worker drains the table:
+
+- a batch is claimed with a conditional ``UPDATE`` stamping a claim token and
+  a lease (``OUTBOX_LEASE_SECONDS``), so several workers never take the same row
+- a message is marked ``sent`` only after FCM accepted it; a worker that dies
+  mid-batch leaves its rows ``in_flight`` and they are claimed again when the
+  lease expires (at-least-once)
+- every push carries the message's ``delivery_id`` so devices can drop the
+  duplicate a redelivery may cause; messages with the same ``delivery_id``
+  and identical payload go out as one multi-recipient FCM request, and all
+  requests of a claimed batch are sent concurrently
+- failures are retried with jittered exponential backoff until
+  ``OUTBOX_MAX_ATTEMPTS``, then the message is ``failed`` with its last error;
+  messages that can never be delivered (FCM not configured, officer without
+  devices) are ``skipped``
+"""
+import json
+import logging
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .fcm_service import PRUNE_ERRORS, fcm_service
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(officer, title, body, data=None, notification=None, delivery_id=None):
+    """
+    Unsaved outbox row for one push; save with ``enqueue``.
+    Pass the same ``delivery_id`` to every recipient of one fan-out.
+    """
+    from .models import NotificationOutbox
+
+    message = NotificationOutbox(
+        officer=officer,
+        notification=notification,
+        title=title,
+        body=body,
+        data={key: str(value) for key, value in (data or {}).items() if value is not None},
+    )
+    if delivery_id is not None:
+        message.delivery_id = delivery_id
+    return message
+
+
+def enqueue(messages):
+    """Insert outbox rows in one statement; call inside the producing transaction."""
+    from .models import NotificationOutbox
+
+    return NotificationOutbox.objects.bulk_create(messages)
+
+
+class OutboxDispatcher:
+    """Claims pending outbox rows and delivers them through FCM."""
+
+    def __init__(self, sender=None, batch_size=None, lease_seconds=None, max_attempts=None,
+                 retry_base_seconds=None, poll_seconds=None):
+        self.sender = sender or fcm_service
+        self.batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+        self.lease_seconds = lease_seconds or getattr(settings, 'OUTBOX_LEASE_SECONDS', 60)
+        self.max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+        self.retry_base_seconds = retry_base_seconds or getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 5)
+        self.poll_seconds = poll_seconds or getattr(settings, 'OUTBOX_POLL_SECONDS', 2)
+
+    def claim(self, now=None):
+        """Lease up to ``batch_size`` due messages to this worker."""
+        from .models import NotificationOutbox
+
+        now = now or timezone.now()
+        claimable = Q(status='pending', next_attempt_at__lte=now) | Q(status='in_flight', locked_until__lt=now)
+        ids = list(
+            NotificationOutbox.objects.filter(claimable)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        token = uuid.uuid4()
+        NotificationOutbox.objects.filter(claimable, id__in=ids).update(
+            status='in_flight',
+            claim_token=token,
+            locked_until=now + timedelta(seconds=self.lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+        return list(NotificationOutbox.objects.filter(claim_token=token).select_related('officer'))
+
+    def _finish(self, messages, **fields):
+        """Record one outcome for several messages, skipping any whose lease was lost."""
+        from .models import NotificationOutbox
+
+        ids_by_claim = {}
+        for message in messages:
+            ids_by_claim.setdefault(message.claim_token, []).append(message.id)
+        return sum(
+            NotificationOutbox.objects.filter(id__in=ids, claim_token=claim_token, status='in_flight')
+            .update(claim_token=None, locked_until=None, **fields)
+            for claim_token, ids in ids_by_claim.items()
+        )
+
+    def retry_delay(self, attempts):
+        ceiling = self.retry_base_seconds * 2 ** (attempts - 1)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def _retry_or_fail(self, messages, error, now):
+        """Schedule another attempt, or give up on messages out of attempts; returns the status."""
+        attempts = messages[0].attempts
+        if attempts >= self.max_attempts:
+            self._finish(messages, status='failed', last_error=error)
+            logger.error(f"{len(messages)} outbox messages failed after {attempts} attempts: {error}")
+            return 'failed'
+        self._finish(
+            messages,
+            status='pending',
+            last_error=error,
+            next_attempt_at=now + timedelta(seconds=self.retry_delay(attempts)),
+        )
+        return 'pending'
+
+    def deliver(self, messages, now=None):
+        """
+        Send claimed messages and record each one's status.
+
+        Messages with the same delivery id and payload are sent as one
+        multicast to all their officers' devices. A message is sent once any
+        of its officer's devices accepted the push. Statuses are written with
+        one UPDATE per outcome rather than per message.
+
+        Returns the new status per message id.
+        """
+        now = now or timezone.now()
+        if not self.sender.server_key:
+            self._finish(messages, status='skipped', last_error='FCM_SERVER_KEY not configured')
+            return {message.id: 'skipped' for message in messages}
+
+        outcomes = {}
+        tokens_by_officer = self.sender.get_tokens_for_officers({message.officer_id for message in messages})
+        groups = {}
+        no_devices = []
+        for message in messages:
+            if not tokens_by_officer.get(message.officer_id):
+                no_devices.append(message)
+                continue
+            key = (message.delivery_id, message.title, message.body, json.dumps(message.data, sort_keys=True))
+            groups.setdefault(key, []).append(message)
+        self._finish(no_devices, status='skipped', last_error='Officer has no registered devices')
+        outcomes.update((message.id, 'skipped') for message in no_devices)
+
+        jobs = [
+            (
+                [token for message in group for token in tokens_by_officer[message.officer_id]],
+                group[0].title,
+                group[0].body,
+                dict(group[0].data, delivery_id=str(group[0].delivery_id)),
+            )
+            for group in groups.values()
+        ]
+        try:
+            results = self.sender.send_multicast(jobs) if jobs else []
+        except Exception as e:
+            logger.exception("FCM multicast failed")
+            results = [{token: str(e) for token in job[0]} for job in jobs]
+
+        sent, unregistered, retry = [], [], {}
+        for group, result in zip(groups.values(), results):
+            for message in group:
+                errors = [result.get(token, 'MissingResult') for token in tokens_by_officer[message.officer_id]]
+                if any(error is None for error in errors):
+                    sent.append(message)
+                elif all(error in PRUNE_ERRORS for error in errors):
+                    unregistered.append(message)
+                else:
+                    retry.setdefault((message.attempts, errors[0]), []).append(message)
+
+        self._finish(sent, status='sent', sent_at=timezone.now(), last_error='')
+        outcomes.update((message.id, 'sent') for message in sent)
+        self._finish(unregistered, status='skipped', last_error='All devices unregistered')
+        outcomes.update((message.id, 'skipped') for message in unregistered)
+        for (_, error), failed in retry.items():
+            outcome = self._retry_or_fail(failed, error, now)
+            outcomes.update((message.id, outcome) for message in failed)
+        return outcomes
+
+    def run_once(self, now=None):
+        """Claim and deliver one batch; returns counts per resulting status."""
+        messages = self.claim(now)
+        if not messages:
+            return {}
+        try:
+            outcomes = self.deliver(messages, now)
+        except Exception:
+            # Leave the leases to expire so the messages are retried
+            logger.exception(f"Failed to deliver {len(messages)} outbox messages")
+            outcomes = {}
+        counts = {}
+        for message in messages:
+            outcome = outcomes.get(message.id, 'in_flight')
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return counts
+
+    def run_forever(self):
+        """Drain the outbox until interrupted, sleeping only when it is empty."""
+        logger.info("Notification outbox worker started")
+        while True:
+            if not self.run_once():
+                time.sleep(self.poll_seconds)
@@ -0,0 +1,156 @@
+"""
+In-process cache for navigation routes.
+
+Origin and destination are snapped to a grid of ``ROUTE_CACHE_GRID_METERS``
+so that an officer polling navigation while moving a few meters reuses the
+same entry. Entries are fresh for ``ROUTE_CACHE_TTL_SECONDS``; after that
+they are still served for up to ``ROUTE_CACHE_STALE_SECONDS`` while a
+background refresh fetches a new route (stale-while-revalidate), so a slow
+upstream never blocks a request that has anything cached. Only one refresh
+per key runs at a time. The cache holds at most ``ROUTE_CACHE_MAX_ENTRIES``
+routes and evicts the least recently used.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE_LAT = 111320.0
+
+HIT = 'HIT'
+MISS = 'MISS'
+STALE = 'STALE'
+
+
+class RouteCache:
+    """LRU route cache with TTL, stale-while-revalidate and hit/miss counters."""
+
+    def __init__(self, grid_meters=None, ttl_seconds=None, stale_seconds=None, max_entries=None,
+                 refresh_in_background=True):
+        self.grid_meters = grid_meters or getattr(settings, 'ROUTE_CACHE_GRID_METERS', 50)
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'ROUTE_CACHE_TTL_SECONDS', 120)
+        self.stale_seconds = stale_seconds if stale_seconds is not None else getattr(
+            settings, 'ROUTE_CACHE_STALE_SECONDS', 600
+        )
+        self.max_entries = max_entries or getattr(settings, 'ROUTE_CACHE_MAX_ENTRIES', 5000)
+        self.refresh_in_background = refresh_in_background
+        self._lock = threading.Lock()
+        # key -> (route, fetched_at monotonic)
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._executor = None
+        self._stats = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'refreshes': 0, 'errors': 0, 'evictions': 0}
+
+    def _snap(self, lat, lng):
+        lat_step = self.grid_meters / METERS_PER_DEGREE_LAT
+        lat_cell = round(lat / lat_step)
+        # Longitude cells shrink with latitude; size them at the snapped latitude
+        lng_step = lat_step / max(math.cos(math.radians(lat_cell * lat_step)), 0.01)
+        return lat_cell, round(lng / lng_step)
+
+    def make_key(self, from_lat, from_lng, to_lat, to_lng, mode='driving'):
+        """Grid-snapped cache key for a route request."""
+        return (mode,) + self._snap(from_lat, from_lng) + self._snap(to_lat, to_lng)
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _store(self, key, route):
+        with self._lock:
+            self._entries[key] = (route, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _fetch(self, key, fetch):
+        """Call the upstream and cache the result unless it is an error."""
+        route = fetch()
+        if isinstance(route, dict) and route.get('error'):
+            self._count('errors')
+        else:
+            self._store(key, route)
+        return route
+
+    def _refresh(self, key, fetch):
+        try:
+            self._fetch(key, fetch)
+            self._count('refreshes')
+        except Exception:
+            self._count('errors')
+            logger.exception("Background route refresh failed")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self.refresh_in_background and self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ROUTE_CACHE_REFRESH_WORKERS', 4),
+                    thread_name_prefix='route-refresh'
+                )
+        if self.refresh_in_background:
+            self._executor.submit(self._refresh, key, fetch)
+        else:
+            self._refresh(key, fetch)
+
+    def get_or_fetch(self, from_lat, from_lng, to_lat, to_lng, fetch, mode='driving'):
+        """
+        Return ``(route, cache_status)`` for a route request.
+
+        Args:
+            fetch: zero-argument callable returning the route dict; a dict with
+                an ``error`` key is returned to the caller but never cached
+            mode: travel mode, part of the cache key
+
+        ``cache_status`` is ``HIT``, ``STALE`` (served while refreshing) or ``MISS``.
+        """
+        key = self.make_key(from_lat, from_lng, to_lat, to_lng, mode)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None:
+            route, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age <= self.ttl_seconds:
+                self._count('hits')
+                return route, HIT
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self._count('stale_hits')
+                self._schedule_refresh(key, fetch)
+                return route, STALE
+
+        self._count('misses')
+        return self._fetch(key, fetch), MISS
+
+    def stats(self):
+        """Counters plus current size and hit ratio."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for stat in self._stats:
+                self._stats[stat] = 0
+
+
+# Global route cache instance
+route_cache = RouteCache()
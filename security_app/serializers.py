@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from security.models import Case as LegacyCase  # legacy Case remains
-from .models import SOSAlert, Case, Incident, OfficerProfile, Notification  # new models for security_app
+from .models import SOSAlert, Case, Incident, OfficerProfile, Notification, OfficerDevice  # new models for security_app
 
 
 class SOSAlertSerializer(serializers.ModelSerializer):
@@ -65,7 +65,8 @@ class CaseUpdateStatusSerializer(serializers.ModelSerializer):
         fields = ('status', 'description')
 
     def validate_status(self, value):
-        if value not in dict(Case.STATUS_CHOICES):
+        # 'escalated' is set by the escalation scheduler only
+        if value not in dict(Case.STATUS_CHOICES) or value == 'escalated':
             raise serializers.ValidationError('Invalid status value.')
         return value
 
@@ -112,6 +113,58 @@ class NotificationSerializer(serializers.ModelSerializer):
 class NotificationAcknowledgeSerializer(serializers.Serializer):
     notification_ids = serializers.ListField(
         child=serializers.IntegerField(),
+        required=False,
         help_text="List of notification IDs to mark as read"
     )
+    up_to_id = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text="Watermark: mark every notification with this ID or lower as read"
+    )
+    up_to = serializers.DateTimeField(
+        required=False,
+        help_text="Watermark: mark every notification created at or before this time as read"
+    )
+
+    def validate(self, attrs):
+        has_ids = 'notification_ids' in attrs
+        has_watermark = 'up_to_id' in attrs or 'up_to' in attrs
+        if has_ids == has_watermark:
+            raise serializers.ValidationError(
+                "Provide either notification_ids or a watermark (up_to_id and/or up_to)."
+            )
+        return attrs
+
 
+class OfficerLocationUpdateSerializer(serializers.Serializer):
+    location_lat = serializers.FloatField(min_value=-90, max_value=90)
+    location_long = serializers.FloatField(min_value=-180, max_value=180)
+    timestamp = serializers.DateTimeField(required=False, help_text="When the fix was taken; defaults to now")
+
+
+class OfficerDeviceSerializer(serializers.ModelSerializer):
+    # Uniqueness is handled in the view: a token re-registered by another officer moves to them
+    token = serializers.CharField(max_length=512)
+
+    class Meta:
+        model = OfficerDevice
+        fields = ['id', 'token', 'platform', 'created_at', 'last_seen_at']
+        read_only_fields = ['id', 'created_at', 'last_seen_at']
+
+
+class NearestOfficersQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    max_distance_km = serializers.FloatField(min_value=0, required=False)
+    organization = serializers.IntegerField(required=False, help_text="Organization ID (SUPER_ADMIN only)")
+
+
+class NearestOfficerSerializer(serializers.Serializer):
+    officer_id = serializers.IntegerField()
+    name = serializers.CharField()
+    organization_id = serializers.IntegerField()
+    lat = serializers.FloatField()
+    lng = serializers.FloatField()
+    distance_km = serializers.FloatField()
+    updated_at = serializers.DateTimeField()
@@ -1,7 +1,14 @@
+import uuid
+
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from .models import Case, SOSAlert, Notification
-from .fcm_service import fcm_service
+from .outbox import build_message, enqueue
+from .notification_counters import decrement_unread, increment_unread
+from .streams import publish_case, publish_notification, publish_sos_alert
 
 
 @receiver(post_save, sender=Case)
@@ -39,71 +46,162 @@ def update_sos_alert_status_on_case_delete(sender, instance, **kwargs):
 @receiver(post_save, sender=SOSAlert)
 def send_sos_alert_notification(sender, instance, created, **kwargs):
     """
-    Send FCM notification when a new SOS alert is created
+    Notify officers of a new SOS alert. Push notifications go through the
+    outbox in the same transaction and are delivered by run_notification_outbox.
+    Notification and outbox rows are bulk inserted, so the number of queries
+    does not grow with the number of officers.
     """
     if created:  # Only for new SOS alerts
         from users.models import SecurityOfficer
         
         # Get all active officers in the same organization
-        if instance.user.organization:
+        if instance.user.organization_id:
             officers = SecurityOfficer.objects.filter(
-                organization=instance.user.organization,
+                organization_id=instance.user.organization_id,
                 is_active=True
             )
         else:
             # If no organization, notify all active officers
             officers = SecurityOfficer.objects.filter(is_active=True)
         
-        # Create notifications and send FCM
-        for officer in officers:
+        officers = list(officers.only('id'))
+        if not officers:
+            return
+        
+        # Rendered once for the whole fan-out
+        username = instance.user.username
+        title = "New SOS Alert"
+        message = f"SOS alert from {username} at {instance.location_lat}, {instance.location_long}"
+        push_title = "🚨 New SOS Alert"
+        push_body = f"Emergency alert from {username}"
+        location = f"{instance.location_lat},{instance.location_long}"
+        # One delivery id for the whole fan-out
+        delivery_id = uuid.uuid4()
+        
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    officer=officer,
+                    title=title,
+                    message=message,
+                    notification_type='sos_alert',
+                    sos_alert=instance
+                )
+                for officer in officers
+            ])
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # Backends without RETURNING need the ids read back for the outbox rows
+                notifications = list(
+                    Notification.objects.filter(sos_alert=instance, notification_type='sos_alert').select_related('officer')
+                )
+            
+            increment_unread([notification.officer_id for notification in notifications])
+            
+            # Queue FCM push notifications
+            enqueue([
+                build_message(
+                    officer=notification.officer,
+                    title=push_title,
+                    body=push_body,
+                    # Each officer's push names their own notification
+                    data={
+                        'type': 'sos_alert',
+                        'sos_alert_id': instance.id,
+                        'notification_id': notification.id,
+                        'location': location
+                    },
+                    notification=notification,
+                    delivery_id=delivery_id
+                )
+                for notification in notifications
+            ])
+
+
+@receiver(post_save, sender=Case)
+def send_case_assignment_notification(sender, instance, created, **kwargs):
+    """
+    Send notification when a case is assigned to an officer
+    """
+    if created and instance.officer:  # Only for new cases with assigned officer
+        with transaction.atomic():
             # Create database notification
             notification = Notification.objects.create(
-                officer=officer,
-                title="New SOS Alert",
-                message=f"SOS alert from {instance.user.username} at {instance.location_lat}, {instance.location_long}",
-                notification_type='sos_alert',
-                sos_alert=instance
+                officer=instance.officer,
+                title="New Case Assigned",
+                message=f"Case #{instance.id} assigned for SOS Alert #{instance.sos_alert.id}",
+                notification_type='case_assigned',
+                case=instance,
+                sos_alert=instance.sos_alert
             )
             
-            # Send FCM push notification
-            fcm_service.send_to_officer(
-                officer=officer,
-                title="🚨 New SOS Alert",
-                body=f"Emergency alert from {instance.user.username}",
+            # Queue FCM push notification
+            enqueue([build_message(
+                officer=instance.officer,
+                title="📋 New Case Assigned",
+                body=f"Case #{instance.id} - {instance.sos_alert.user.username if instance.sos_alert else 'Unknown user'}",
                 data={
-                    'type': 'sos_alert',
-                    'sos_alert_id': str(instance.id),
-                    'notification_id': str(notification.id),
-                    'location': f"{instance.location_lat},{instance.location_long}"
-                }
-            )
+                    'type': 'case_assigned',
+                    'case_id': instance.id,
+                    'sos_alert_id': instance.sos_alert.id if instance.sos_alert else None,
+                    'notification_id': notification.id
+                },
+                notification=notification
+            )])
+
+
+@receiver(post_save, sender=SOSAlert)
+def dispatch_new_sos_alert(sender, instance, created, **kwargs):
+    """
+    Queue a new SOS alert for dispatch. The escalation worker
+    (run_escalation_scheduler) picks it up and solves all pending alerts of
+    the organization together, so the request never runs the solver.
+    """
+    if not created or instance.assigned_officer_id or not getattr(settings, 'DISPATCH_AUTO_ASSIGN', True):
+        return
+    instance.dispatch_requested_at = timezone.now()
+    SOSAlert.objects.filter(id=instance.id).update(dispatch_requested_at=instance.dispatch_requested_at)
+
+
+@receiver(post_save, sender=Notification)
+def count_new_unread_notification(sender, instance, created, **kwargs):
+    """
+    Keep the officer's unread counter in step with notifications created one at a time
+    (bulk fan-outs increment it themselves)
+    """
+    if created and not instance.is_read:
+        increment_unread([instance.officer_id])
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_unread_notification(sender, instance, **kwargs):
+    """
+    Deleting an unread notification removes it from the officer's unread counter
+    """
+    if not instance.is_read:
+        decrement_unread({instance.officer_id: 1})
+
+
+@receiver(post_save, sender=SOSAlert)
+def stream_sos_alert(sender, instance, created, **kwargs):
+    """
+    Push new and updated SOS alerts to the organization's officer streams;
+    a fan-out is one event, not one per officer
+    """
+    publish_sos_alert(instance, created)
 
 
 @receiver(post_save, sender=Case)
-def send_case_assignment_notification(sender, instance, created, **kwargs):
+def stream_case(sender, instance, created, **kwargs):
     """
-    Send notification when a case is assigned to an officer
+    Push case changes to the assigned officer's stream
     """
-    if created and instance.officer:  # Only for new cases with assigned officer
-        # Create database notification
-        notification = Notification.objects.create(
-            officer=instance.officer,
-            title="New Case Assigned",
-            message=f"Case #{instance.id} assigned for SOS Alert #{instance.sos_alert.id}",
-            notification_type='case_assigned',
-            case=instance,
-            sos_alert=instance.sos_alert
-        )
-        
-        # Send FCM push notification
-        fcm_service.send_to_officer(
-            officer=instance.officer,
-            title="📋 New Case Assigned",
-            body=f"Case #{instance.id} - {instance.sos_alert.user.username if instance.sos_alert else 'Unknown user'}",
-            data={
-                'type': 'case_assigned',
-                'case_id': str(instance.id),
-                'sos_alert_id': str(instance.sos_alert.id) if instance.sos_alert else None,
-                'notification_id': str(notification.id)
-            }
-        )
+    publish_case(instance, created)
+
+
+@receiver(post_save, sender=Notification)
+def stream_notification(sender, instance, created, **kwargs):
+    """
+    Push notifications created one at a time to the officer's stream
+    """
+    if created:
+        publish_notification(instance)
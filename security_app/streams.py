@@ -0,0 +1,61 @@
+"""
+Officer event stream channels.
+
+An officer's stream (``api/security/stream/``) listens on:
+
+- ``organization:<id>``: SOS alerts of the officer's organization, created or
+  changing status
+- ``officers``: SOS alerts from users without an organization, which every
+  officer is notified about
+- ``officer:<id>``: the officer's own notifications and cases
+
+Events carry ids and status only; the app fetches details over the REST API
+when it needs them. Everything is published on commit from the signals.
+"""
+from core.events import event_broker
+
+BROADCAST_CHANNEL = 'officers'
+
+
+def officer_channel(officer_id):
+    return f'officer:{officer_id}'
+
+
+def organization_channel(organization_id):
+    return f'organization:{organization_id}' if organization_id else BROADCAST_CHANNEL
+
+
+def officer_channels(officer):
+    return [officer_channel(officer.id), organization_channel(officer.organization_id), BROADCAST_CHANNEL]
+
+
+def publish_sos_alert(alert, created):
+    event_broker.publish_on_commit(organization_channel(alert.user.organization_id), 'sos_alert', {
+        'id': alert.id,
+        'created': created,
+        'status': alert.status,
+        'priority': alert.priority,
+        'assigned_officer_id': alert.assigned_officer_id,
+        'location_lat': alert.location_lat,
+        'location_long': alert.location_long,
+    })
+
+
+def publish_case(case, created):
+    if case.officer_id:
+        event_broker.publish_on_commit(officer_channel(case.officer_id), 'case', {
+            'id': case.id,
+            'created': created,
+            'status': case.status,
+            'sos_alert_id': case.sos_alert_id,
+        })
+
+
+def publish_notification(notification):
+    event_broker.publish_on_commit(officer_channel(notification.officer_id), 'notification', {
+        'id': notification.id,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'sos_alert_id': notification.sos_alert_id,
+        'case_id': notification.case_id,
+    })
@@ -0,0 +1,1384 @@
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from users.models import Organization, SecurityOfficer, User
+from .models import OfficerProfile
+from .officer_locations import OfficerLocationStore
+
+# Wall-clock assertions depend on the machine; run them with RUN_BENCHMARKS=1
+benchmark = pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run timing benchmarks')
+
+
+def create_officer(organization, name, on_duty=True):
+    officer = SecurityOfficer.objects.create(
+        name=name,
+        contact='9999999999',
+        email=f'{name.lower()}@example.com',
+        organization=organization
+    )
+    OfficerProfile.objects.create(officer=officer, on_duty=on_duty)
+    return officer
+
+
+class OfficerLocationStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.other_organization = Organization.objects.create(name='South Campus')
+        self.near = create_officer(self.organization, 'Near')
+        self.far = create_officer(self.organization, 'Far')
+        self.off_duty = create_officer(self.organization, 'Resting', on_duty=False)
+        self.foreign = create_officer(self.other_organization, 'Foreign')
+        self.store = OfficerLocationStore(ttl_seconds=300, persist_interval_seconds=3600)
+        self.store.update(self.near.id, 18.5205, 73.8568)
+        self.store.update(self.far.id, 18.60, 73.95)
+        self.store.update(self.off_duty.id, 18.5204, 73.8567)
+        self.store.update(self.foreign.id, 18.5204, 73.8567)
+    
+    def test_nearest_orders_by_distance_and_filters(self):
+        results = self.store.nearest(18.5204, 73.8567, k=5, organization_id=self.organization.id)
+        self.assertEqual([r['officer_id'] for r in results], [self.near.id, self.far.id])
+        self.assertLess(results[0]['distance_km'], 0.1)
+        
+        results = self.store.nearest(18.5204, 73.8567, k=1, organization_id=self.organization.id)
+        self.assertEqual([r['officer_id'] for r in results], [self.near.id])
+        
+        results = self.store.nearest(18.5204, 73.8567, organization_id=self.organization.id, max_distance_km=1)
+        self.assertEqual([r['officer_id'] for r in results], [self.near.id])
+    
+    def test_stale_fixes_are_ignored(self):
+        self.store.update(self.far.id, 18.5204, 73.8567, timezone.now() + timedelta(seconds=1))
+        self.store.update(self.near.id, 18.5204, 73.8567, timezone.now() - timedelta(minutes=10))
+        results = self.store.nearest(18.5204, 73.8567, organization_id=self.organization.id)
+        # The old fix arrived out of order and must not replace the newer one
+        self.assertEqual(len(results), 2)
+        
+        stale_store = OfficerLocationStore(ttl_seconds=300)
+        stale_store.update(self.near.id, 18.5204, 73.8567, timezone.now() - timedelta(minutes=10))
+        cache.clear()
+        self.assertIsNone(stale_store.get(self.near.id))
+    
+    def test_other_processes_read_through_cache(self):
+        other_process = OfficerLocationStore(ttl_seconds=300)
+        results = other_process.nearest(18.5204, 73.8567, organization_id=self.organization.id)
+        self.assertEqual([r['officer_id'] for r in results], [self.near.id, self.far.id])
+    
+    def test_persist_writes_profiles_and_serves_as_fallback(self):
+        officer_without_profile = SecurityOfficer.objects.create(
+            name='New', contact='1', email='new@example.com', organization=self.organization
+        )
+        self.store.update(officer_without_profile.id, 18.53, 73.86)
+        self.assertEqual(self.store.persist(), 5)
+        profile = OfficerProfile.objects.get(officer=self.near)
+        self.assertAlmostEqual(profile.last_location_lat, 18.5205)
+        self.assertTrue(OfficerProfile.objects.filter(officer=officer_without_profile).exists())
+        
+        cache.clear()
+        restarted = OfficerLocationStore(ttl_seconds=300)
+        results = restarted.nearest(18.5204, 73.8567, organization_id=self.organization.id)
+        self.assertEqual(results[0]['officer_id'], self.near.id)
+    
+    def test_nearest_is_single_query(self):
+        with self.assertNumQueries(1):
+            self.store.nearest(18.5204, 73.8567, organization_id=self.organization.id)
+
+
+class NearestOfficersViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.sub_admin = User.objects.create_user(
+            username='subadmin', email='subadmin@example.com', password='pass12345',
+            role='SUB_ADMIN', organization=self.organization
+        )
+        self.officer_user = User.objects.create_user(
+            username='officer', email='officer@example.com', password='pass12345', role='security'
+        )
+        self.officer = SecurityOfficer.objects.create(
+            name='Officer', contact='1', email='officer@example.com', organization=self.organization
+        )
+        self.foreign = create_officer(Organization.objects.create(name='South Campus'), 'Foreign')
+        from .officer_locations import officer_location_store
+        officer_location_store.forget()
+        officer_location_store.update(self.foreign.id, 18.5204, 73.8567)
+    
+    def test_officer_reports_location_and_sub_admin_finds_them(self):
+        self.client.force_authenticate(user=self.officer_user)
+        response = self.client.post(
+            reverse('security-location'),
+            {'location_lat': 18.5210, 'location_long': 73.8570},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.client.force_authenticate(user=self.sub_admin)
+        response = self.client.get(reverse('security-officers-nearest'), {'lat': 18.5204, 'lng': 73.8567})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['officer_id'] for r in response.data['results']], [self.officer.id])
+    
+    def test_invalid_query_rejected(self):
+        self.client.force_authenticate(user=self.sub_admin)
+        response = self.client.get(reverse('security-officers-nearest'), {'lat': 123, 'lng': 73.8567})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OfficerLocationTransitionTest(APITestCase):
+    def setUp(self):
+        from users.geofence_transitions import geofence_transition_detector
+        from users.models import Geofence
+        from .officer_locations import officer_location_store
+        
+        cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.officer_user = User.objects.create_user(
+            username='patrol', email='patrol@example.com', password='pass12345',
+            role='security', organization=self.organization
+        )
+        SecurityOfficer.objects.create(
+            name='Patrol', contact='1', email='patrol@example.com', organization=self.organization
+        )
+        ring = [[73.85, 18.52], [73.86, 18.52], [73.86, 18.53], [73.85, 18.53], [73.85, 18.52]]
+        self.geofence = Geofence.objects.create(
+            name='Gate', polygon_json={'type': 'Polygon', 'coordinates': [ring]}, organization=self.organization
+        )
+        geofence_transition_detector.reset()
+        self.addCleanup(geofence_transition_detector.reset)
+        # Fixes here are dated ahead of now; keep them out of other tests' store
+        officer_location_store.forget()
+        self.addCleanup(officer_location_store.forget)
+        self.client.force_authenticate(user=self.officer_user)
+        self.start = timezone.now()
+    
+    def report(self, lat, lng, seconds):
+        response = self.client.post(reverse('security-location'), {
+            'location_lat': lat, 'location_long': lng,
+            'timestamp': (self.start + timedelta(seconds=seconds)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_location_updates_raise_enter_and_exit_alerts(self):
+        from users.models import Alert
+        
+        self.report(18.50, 73.855, 0)
+        self.report(18.525, 73.855, 10)
+        self.report(18.525, 73.855, 60)
+        self.report(18.50, 73.855, 70)
+        self.report(18.50, 73.855, 120)
+        
+        alerts = Alert.objects.filter(user=self.officer_user, geofence=self.geofence).order_by('id')
+        self.assertEqual(
+            list(alerts.values_list('alert_type', flat=True)), ['GEOFENCE_ENTER', 'GEOFENCE_EXIT']
+        )
+    
+    def test_out_of_order_fix_is_not_fed_to_the_detector(self):
+        from users.models import Alert
+        
+        self.report(18.50, 73.855, 100)
+        # Older than the stored fix, so the store drops them and the detector never sees them
+        self.report(18.525, 73.855, 10)
+        self.report(18.525, 73.855, 50)
+        self.assertFalse(Alert.objects.filter(user=self.officer_user).exists())
+
+
+class DispatchEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.user = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+        self.store = OfficerLocationStore(ttl_seconds=300, persist_interval_seconds=3600)
+        from .dispatch import DispatchEngine
+        self.engine = DispatchEngine(location_store=self.store, max_distance_km=25, load_penalty_km=2,
+                                     geofence_bonus_km=1, max_open_cases=2)
+    
+    def create_alert(self, lng, **kwargs):
+        from .models import SOSAlert
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            return SOSAlert.objects.create(user=self.user, location_lat=0.0, location_long=lng, **kwargs)
+    
+    def test_batch_is_solved_optimally_not_greedily(self):
+        x = create_officer(self.organization, 'X')
+        y = create_officer(self.organization, 'Y')
+        # 0.01 degrees of longitude at the equator is ~1.1 km
+        self.store.update(x.id, 0.0, 0.006)
+        self.store.update(y.id, 0.0, -0.005)
+        first = self.create_alert(0.0)
+        second = self.create_alert(0.01)
+        
+        cases = self.engine.dispatch([first, second])
+        assigned = {case.sos_alert_id: case.officer_id for case in cases}
+        # Greedy would send X (closest to the first alert) and leave Y far from the second
+        self.assertEqual(assigned, {first.id: y.id, second.id: x.id})
+        first.refresh_from_db()
+        self.assertEqual(first.assigned_officer_id, y.id)
+    
+    def test_assignment_is_not_repeated(self):
+        officer = create_officer(self.organization, 'Solo')
+        self.store.update(officer.id, 0.0, 0.001)
+        alert = self.create_alert(0.0)
+        self.assertEqual(len(self.engine.dispatch([alert])), 1)
+        self.assertEqual(self.engine.dispatch([alert]), [])
+        self.assertEqual(alert.cases.count(), 1)
+    
+    def test_load_distance_and_duty_limits(self):
+        from .models import Case
+        
+        busy = create_officer(self.organization, 'Busy')
+        far = create_officer(self.organization, 'Far')
+        resting = create_officer(self.organization, 'Resting', on_duty=False)
+        self.store.update(busy.id, 0.0, 0.0)
+        self.store.update(far.id, 0.0, 1.0)
+        self.store.update(resting.id, 0.0, 0.0)
+        for _ in range(2):
+            Case.objects.create(sos_alert=self.create_alert(5.0), officer=busy, status='open')
+        
+        self.assertEqual(self.engine.dispatch([self.create_alert(0.0)]), [])
+    
+    def test_unlocated_officer_covers_own_geofence(self):
+        from users.models import Geofence
+        
+        geofence = Geofence.objects.create(
+            name='Gate',
+            polygon_json={'type': 'Polygon', 'coordinates': [[[0, 0], [0.01, 0], [0.01, 0.01], [0, 0.01], [0, 0]]]},
+            organization=self.organization
+        )
+        guard = create_officer(self.organization, 'Guard')
+        guard.assigned_geofence = geofence
+        guard.save()
+        create_officer(self.organization, 'Nowhere')
+        
+        cases = self.engine.dispatch([self.create_alert(0.005, geofence=geofence)])
+        self.assertEqual([case.officer_id for case in cases], [guard.id])
+    
+    def test_new_alert_is_dispatched_by_the_worker(self):
+        from .escalation import EscalationScheduler
+        from .models import SOSAlert
+        from .officer_locations import officer_location_store
+        
+        officer = create_officer(self.organization, 'OnCall')
+        officer_location_store.update(officer.id, 0.0, 0.001)
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = SOSAlert.objects.create(user=self.user, location_lat=0.0, location_long=0.0)
+        alert.refresh_from_db()
+        # The request only queues the alert; the solve runs in the worker
+        self.assertIsNone(alert.assigned_officer_id)
+        self.assertIsNotNone(alert.dispatch_requested_at)
+        
+        self.assertEqual(EscalationScheduler().dispatch_requested(), {self.organization.id})
+        alert.refresh_from_db()
+        self.assertEqual(alert.assigned_officer_id, officer.id)
+        self.assertIsNone(alert.dispatch_requested_at)
+        self.assertEqual(alert.cases.get().status, 'open')
+        self.assertEqual(EscalationScheduler().dispatch_requested(), set())
+        officer_location_store.forget()
+    
+    def test_alert_without_organization_dispatches_nothing(self):
+        from unittest.mock import patch
+        from .escalation import EscalationScheduler
+        from .models import SOSAlert
+        
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='pass12345', role='USER'
+        )
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            pending = SOSAlert.objects.create(user=self.user, location_lat=0.0, location_long=0.0)
+        self.assertIsNone(pending.dispatch_requested_at)
+        orphan = SOSAlert.objects.create(user=stranger, location_lat=0.0, location_long=0.0)
+        with patch('security_app.dispatch.DispatchEngine.dispatch_pending') as dispatch_pending:
+            EscalationScheduler().dispatch_requested()
+        self.assertFalse(dispatch_pending.called)
+        orphan.refresh_from_db()
+        self.assertIsNone(orphan.dispatch_requested_at)
+        pending.refresh_from_db()
+        self.assertIsNone(pending.assigned_officer_id)
+    
+    def test_assignment_is_published_to_streams(self):
+        from core.events import event_broker
+        from .streams import organization_channel
+        
+        officer = create_officer(self.organization, 'Solo')
+        self.store.update(officer.id, 0.0, 0.001)
+        alert = self.create_alert(0.0)
+        event_broker.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engine.dispatch([alert])
+        
+        events, _ = event_broker.replay([organization_channel(self.organization.id)], 0)
+        assigned = [event.data for event in events if event.type == 'sos_alert']
+        self.assertEqual(assigned[0]['id'], alert.id)
+        self.assertEqual(assigned[0]['assigned_officer_id'], officer.id)
+        self.assertFalse(assigned[0]['created'])
+
+
+class EscalationSchedulerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.user = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+        self.store = OfficerLocationStore(ttl_seconds=300, persist_interval_seconds=3600)
+        from .dispatch import DispatchEngine
+        from .escalation import EscalationScheduler
+        self.engine = DispatchEngine(location_store=self.store, max_distance_km=5)
+        self.scheduler = EscalationScheduler(engine=self.engine)
+        self.first = create_officer(self.organization, 'First')
+        self.second = create_officer(self.organization, 'Second')
+        self.store.update(self.first.id, 0.0, 0.001)
+        # Outside the initial 5 km radius, inside the widened ring
+        self.store.update(self.second.id, 0.0, 0.08)
+    
+    def create_alert(self, priority='medium'):
+        from .models import SOSAlert
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            alert = SOSAlert.objects.create(user=self.user, location_lat=0.0, location_long=0.0, priority=priority)
+        self.engine.dispatch([alert])
+        alert.refresh_from_db()
+        return alert
+    
+    def test_deadline_follows_priority(self):
+        from .escalation import sla_seconds
+        
+        alert = self.create_alert(priority='high')
+        self.assertAlmostEqual(
+            (alert.escalation_deadline - alert.created_at).total_seconds(),
+            sla_seconds('high'),
+            delta=1
+        )
+        self.assertEqual(alert.assigned_officer_id, self.first.id)
+    
+    def test_lapsed_alert_escalates_to_next_ring(self):
+        from users.models import Alert
+        from .models import Case
+        
+        alert = self.create_alert(priority='low')
+        later = alert.escalation_deadline + timedelta(seconds=1)
+        self.assertEqual(self.scheduler.run_once(later), [alert.id])
+        
+        alert.refresh_from_db()
+        self.assertEqual(alert.escalation_level, 1)
+        self.assertEqual(alert.priority, 'medium')
+        self.assertEqual(alert.status, 'pending')
+        self.assertEqual(alert.assigned_officer_id, self.second.id)
+        self.assertGreater(alert.escalation_deadline, later)
+        self.assertEqual(
+            dict(Case.objects.filter(sos_alert=alert).values_list('officer_id', 'status')),
+            {self.first.id: 'escalated', self.second.id: 'open'}
+        )
+        notice = Alert.objects.get(alert_type='SOS_ESCALATION')
+        self.assertEqual(notice.metadata['previous_officer_id'], self.first.id)
+    
+    def test_escalation_outside_geofences_reaches_user_organization(self):
+        from rest_framework.test import APIClient
+        from users.models import Alert
+        from users.org_counters import read_counters
+        
+        sub_admin = User.objects.create_user(
+            username='subadmin', email='subadmin@example.com', password='pass12345',
+            role='SUB_ADMIN', organization=self.organization
+        )
+        alert = self.create_alert(priority='low')
+        self.assertIsNone(alert.geofence_id)
+        self.scheduler.run_once(alert.escalation_deadline + timedelta(seconds=1))
+        
+        notice = Alert.objects.get(alert_type='SOS_ESCALATION')
+        self.assertIsNone(notice.geofence_id)
+        client = APIClient()
+        client.force_authenticate(user=sub_admin)
+        response = client.get(reverse('alert-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['results']], [notice.id])
+        self.assertEqual(read_counters(self.organization.id).critical_alerts, 0)
+        self.assertEqual(read_counters(self.organization.id).unresolved_alerts, 1)
+    
+    def test_accepted_or_early_alerts_do_not_escalate(self):
+        alert = self.create_alert()
+        self.assertEqual(self.scheduler.run_once(alert.escalation_deadline - timedelta(seconds=1)), [])
+        
+        case = alert.cases.get()
+        case.status = 'accepted'
+        case.save()
+        self.assertEqual(self.scheduler.run_once(alert.escalation_deadline + timedelta(seconds=1)), [])
+    
+    def test_concurrent_schedulers_escalate_once(self):
+        from .escalation import EscalationScheduler
+        
+        alert = self.create_alert()
+        later = alert.escalation_deadline + timedelta(seconds=1)
+        other = EscalationScheduler(engine=self.engine)
+        self.assertTrue(self.scheduler.escalate(alert.id, later))
+        self.assertFalse(other.escalate(alert.id, later))
+    
+    def test_restart_rebuilds_queue_from_database(self):
+        from .escalation import EscalationScheduler
+        from .models import SOSAlert
+        
+        alerts = [self.create_alert() for _ in range(3)]
+        # A row created before deadlines existed
+        SOSAlert.objects.filter(id=alerts[0].id).update(escalation_deadline=None)
+        restarted = EscalationScheduler(engine=self.engine)
+        later = timezone.now() + timedelta(hours=1)
+        restarted.refill(later)
+        self.assertEqual(sorted(restarted.pop_due(later)), sorted(alert.id for alert in alerts))
+
+
+class RouteCacheTest(TestCase):
+    def setUp(self):
+        from .route_cache import RouteCache
+        self.cache = RouteCache(grid_meters=50, ttl_seconds=60, stale_seconds=300, max_entries=3,
+                                refresh_in_background=False)
+        self.calls = 0
+    
+    def fetch(self):
+        self.calls += 1
+        return {'distance_km': 1.0, 'version': self.calls}
+    
+    def test_nearby_requests_share_key(self):
+        key = self.cache.make_key(18.52040, 73.85670, 18.5310, 73.8440)
+        # ~10 m away snaps to the same cell, ~200 m away does not
+        self.assertEqual(key, self.cache.make_key(18.52045, 73.85675, 18.5310, 73.8440))
+        self.assertNotEqual(key, self.cache.make_key(18.52220, 73.85670, 18.5310, 73.8440))
+        self.assertNotEqual(key, self.cache.make_key(18.52040, 73.85670, 18.5310, 73.8440, mode='walking'))
+    
+    def test_hit_stale_and_expiry(self):
+        from unittest.mock import patch
+        from .route_cache import HIT, MISS, STALE
+        
+        with patch('security_app.route_cache.time.monotonic', return_value=1000.0):
+            self.assertEqual(self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)[1], MISS)
+            self.assertEqual(self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)[1], HIT)
+        with patch('security_app.route_cache.time.monotonic', return_value=1100.0):
+            route, cache_status = self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)
+            self.assertEqual((route['version'], cache_status), (1, STALE))
+            # The refresh replaced the entry
+            route, cache_status = self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)
+            self.assertEqual((route['version'], cache_status), (2, HIT))
+        with patch('security_app.route_cache.time.monotonic', return_value=2000.0):
+            self.assertEqual(self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)[1], MISS)
+        
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses'], stats['refreshes']), (2, 1, 2, 1))
+    
+    def test_errors_are_not_cached_and_lru_evicts(self):
+        from .route_cache import MISS
+        
+        error = lambda: {'error': 'upstream down'}
+        self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, error)
+        self.assertEqual(self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)[1], MISS)
+        
+        for offset in range(1, 4):
+            self.cache.get_or_fetch(18.52 + offset, 73.85, 18.53, 73.84, self.fetch)
+        self.assertEqual(self.cache.stats()['size'], 3)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(self.cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)[1], MISS)
+    
+    def test_stale_is_served_without_waiting_for_upstream(self):
+        import threading
+        from unittest.mock import patch
+        from .route_cache import RouteCache, STALE
+        
+        cache = RouteCache(ttl_seconds=60, stale_seconds=300)
+        release = threading.Event()
+        fetched = threading.Event()
+        
+        def slow_fetch():
+            release.wait(5)
+            fetched.set()
+            return {'distance_km': 2.0}
+        
+        with patch('security_app.route_cache.time.monotonic', return_value=1000.0):
+            cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, self.fetch)
+        with patch('security_app.route_cache.time.monotonic', return_value=1100.0):
+            route, cache_status = cache.get_or_fetch(18.52, 73.85, 18.53, 73.84, slow_fetch)
+        # Answered while the refresh is still blocked upstream
+        self.assertFalse(fetched.is_set())
+        self.assertEqual(cache_status, STALE)
+        self.assertEqual(route['distance_km'], 1.0)
+        release.set()
+        cache._executor.shutdown(wait=True)
+
+
+class NavigationViewCacheTest(APITestCase):
+    def setUp(self):
+        from .route_cache import route_cache
+        route_cache.clear()
+        self.officer_user = User.objects.create_user(
+            username='officer', email='officer@example.com', password='pass12345', role='security'
+        )
+        self.client.force_authenticate(user=self.officer_user)
+    
+    def test_repeated_navigation_uses_cache(self):
+        from unittest.mock import patch
+        from .views import NavigationView
+        
+        payload = {'from_lat': 18.5204, 'from_lng': 73.8567, 'to_lat': 18.5310, 'to_lng': 73.8440}
+        with patch.object(NavigationView, '_get_route_from_google_maps',
+                          return_value={'distance_km': 1.9, 'duration_minutes': 6}) as upstream:
+            first = self.client.post(reverse('security-navigation'), payload, format='json')
+            payload['from_lat'] = 18.52042
+            second = self.client.post(reverse('security-navigation'), payload, format='json')
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['X-Route-Cache'], 'MISS')
+        self.assertEqual(second['X-Route-Cache'], 'HIT')
+        self.assertEqual(second.data['route']['distance_km'], 1.9)
+        self.assertEqual(upstream.call_count, 1)
+    
+    def test_invalid_mode_rejected(self):
+        payload = {'from_lat': 18.5, 'from_lng': 73.8, 'to_lat': 18.6, 'to_lng': 73.9, 'mode': 'teleport'}
+        response = self.client.post(reverse('security-navigation'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def write_grid_graph(path, size, spacing=0.001, origin=(18.5, 73.8)):
+    """Write a ``size`` x ``size`` street grid edge list; rows are faster than columns."""
+    import csv
+    
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['from_id', 'from_lat', 'from_lng', 'to_id', 'to_lat', 'to_lng',
+                         'length_m', 'speed_kmh', 'oneway', 'name'])
+        for i in range(size):
+            for j in range(size):
+                lat, lng = origin[0] + i * spacing, origin[1] + j * spacing
+                if j + 1 < size:
+                    writer.writerow([f'{i}-{j}', lat, lng, f'{i}-{j + 1}', lat, lng + spacing,
+                                     '', 50, '', f'Row {i}'])
+                if i + 1 < size:
+                    writer.writerow([f'{i}-{j}', lat, lng, f'{i + 1}-{j}', lat + spacing, lng,
+                                     '', 20, '', f'Column {j}'])
+
+
+class OfflineRouterTest(TestCase):
+    def setUp(self):
+        import os
+        import tempfile
+        
+        handle, self.graph_path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        self.addCleanup(os.remove, self.graph_path)
+        write_grid_graph(self.graph_path, 10)
+    
+    def test_encode_polyline_matches_reference(self):
+        from .offline_routing import encode_polyline
+        
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(points), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+    
+    def test_route_follows_fastest_path(self):
+        import networkx as nx
+        from .offline_routing import OfflineRouter
+        
+        router = OfflineRouter(graph_path=self.graph_path)
+        route = router.route(18.5, 73.8, 18.509, 73.809)
+        
+        self.assertEqual(route['source'], 'offline')
+        expected_s = nx.shortest_path_length(router.graph, '0-0', '9-9', weight='travel_time_s')
+        self.assertAlmostEqual(route['duration_minutes'], expected_s / 60, places=1)
+        self.assertGreater(route['distance_km'], 1.9)
+        self.assertTrue(route['polyline'])
+        # Consecutive edges on the same street collapse into one step
+        self.assertLessEqual(len(route['steps']), 4)
+        self.assertTrue(route['steps'][0]['instruction'].startswith('Continue on'))
+    
+    def test_search_stops_at_target(self):
+        import networkx as nx
+        from .offline_routing import OfflineRouter
+        
+        write_grid_graph(self.graph_path, 30)
+        router = OfflineRouter(graph_path=self.graph_path)
+        router.ensure_loaded()
+        source = router._node_ids.index('10-10')
+        target = router._node_ids.index('14-16')
+        
+        positions, settled = router.shortest_path(source, target)
+        
+        path = [router._node_ids[position] for position in positions]
+        travel_time_s = sum(router.graph.edges[u, v]['travel_time_s'] for u, v in zip(path, path[1:]))
+        expected_s = nx.shortest_path_length(router.graph, '10-10', '14-16', weight='travel_time_s')
+        self.assertAlmostEqual(travel_time_s, expected_s, places=3)
+        # Only the neighbourhood between the endpoints is explored, not all 900 nodes
+        self.assertLess(settled, 300)
+    
+    def test_endpoint_far_from_graph_has_no_route(self):
+        from .offline_routing import OfflineRouter
+        
+        router = OfflineRouter(graph_path=self.graph_path, max_snap_meters=200)
+        self.assertIsNone(router.route(18.5, 73.8, 19.5, 73.8))
+    
+    def test_oneway_edges_are_not_reversed(self):
+        import csv
+        from .offline_routing import OfflineRouter
+        
+        with open(self.graph_path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['from_id', 'from_lat', 'from_lng', 'to_id', 'to_lat', 'to_lng',
+                             'length_m', 'speed_kmh', 'oneway', 'name'])
+            writer.writerow(['a', 18.5, 73.8, 'b', 18.5, 73.801, '', '', '1', 'One Way'])
+        router = OfflineRouter(graph_path=self.graph_path)
+        
+        self.assertIsNotNone(router.route(18.5, 73.8, 18.5, 73.801))
+        self.assertIsNone(router.route(18.5, 73.801, 18.5, 73.8))
+    
+    def test_unconfigured_router_returns_none(self):
+        from .offline_routing import OfflineRouter
+        
+        router = OfflineRouter(graph_path='')
+        with self.settings(OFFLINE_ROUTING_GRAPH_PATH=''):
+            self.assertIsNone(router.route(18.5, 73.8, 18.509, 73.809))
+    
+    @pytest.mark.performance
+    @benchmark
+    def test_city_scale_query_latency(self):
+        from .offline_routing import OfflineRouter
+        
+        write_grid_graph(self.graph_path, 100)
+        router = OfflineRouter(graph_path=self.graph_path)
+        router.ensure_loaded()
+        
+        started = time.perf_counter()
+        for offset in range(10):
+            route = router.route(18.5 + offset * 0.001, 73.8, 18.599, 73.899 - offset * 0.001)
+            self.assertIsNotNone(route)
+        per_query = (time.perf_counter() - started) / 10
+        # 10,000 nodes; the request budget is tens of milliseconds per query
+        self.assertLess(per_query, 0.05)
+
+
+class NavigationViewOfflineTest(APITestCase):
+    def setUp(self):
+        import os
+        import tempfile
+        from .offline_routing import offline_router
+        from .route_cache import route_cache
+        
+        route_cache.clear()
+        handle, graph_path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        self.addCleanup(os.remove, graph_path)
+        write_grid_graph(graph_path, 10)
+        offline_router.graph_path = graph_path
+        offline_router.load()
+        self.addCleanup(setattr, offline_router, 'graph', None)
+        self.addCleanup(setattr, offline_router, 'graph_path', None)
+        
+        self.officer_user = User.objects.create_user(
+            username='officer', email='officer@example.com', password='pass12345', role='security'
+        )
+        self.client.force_authenticate(user=self.officer_user)
+        self.payload = {'from_lat': 18.5, 'from_lng': 73.8, 'to_lat': 18.509, 'to_lng': 73.809}
+    
+    def test_routes_offline_without_api_key(self):
+        with self.settings(GOOGLE_MAPS_API_KEY=''):
+            response = self.client.post(reverse('security-navigation'), self.payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['route']['source'], 'offline')
+        self.assertTrue(response.data['route']['polyline'])
+    
+    def test_routes_offline_during_upstream_outage(self):
+        from unittest.mock import patch
+        import requests
+        
+        with self.settings(GOOGLE_MAPS_API_KEY='test-key'), \
+                patch('core.http.IntegrationClient.request', side_effect=requests.ConnectionError('upstream down')):
+            response = self.client.post(reverse('security-navigation'), self.payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['route']['source'], 'offline')
+    
+    def test_walking_falls_back_to_straight_line(self):
+        with self.settings(GOOGLE_MAPS_API_KEY=''):
+            response = self.client.post(
+                reverse('security-navigation'), dict(self.payload, mode='walking'), format='json'
+            )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['route']['polyline'])
+
+
+class FakePushSender:
+    """Stands in for FCMService; records multicasts and fails every token while ``fail`` is set."""
+    
+    def __init__(self, server_key='test-key', fail=False):
+        self.server_key = server_key
+        self.fail = fail
+        self.sent = []
+    
+    def get_tokens_for_officers(self, officer_ids):
+        return {officer_id: [f'token-{officer_id}'] for officer_id in officer_ids}
+    
+    def send_multicast(self, jobs):
+        if self.fail:
+            return [{token: 'Unavailable' for token in tokens} for tokens, *_ in jobs]
+        self.sent.extend(jobs)
+        return [{token: None for token in tokens} for tokens, *_ in jobs]
+
+
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='North Campus')
+        self.user = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+        self.officers = [create_officer(self.organization, f'Officer{i}') for i in range(3)]
+        self.sender = FakePushSender()
+    
+    def create_alert(self):
+        from .models import SOSAlert
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            return SOSAlert.objects.create(user=self.user, location_lat=18.5, location_long=73.8)
+    
+    def dispatcher(self, **kwargs):
+        from .outbox import OutboxDispatcher
+        kwargs.setdefault('max_attempts', 3)
+        return OutboxDispatcher(sender=self.sender, retry_base_seconds=10, **kwargs)
+    
+    def test_sos_creation_queues_instead_of_sending(self):
+        from unittest.mock import patch
+        from .fcm_service import FCMService
+        from .models import Notification, NotificationOutbox
+        
+        with patch.object(FCMService, 'send_notification') as send:
+            alert = self.create_alert()
+        
+        send.assert_not_called()
+        self.assertEqual(Notification.objects.filter(sos_alert=alert).count(), 3)
+        messages = NotificationOutbox.objects.filter(notification__sos_alert=alert)
+        self.assertEqual(messages.count(), 3)
+        self.assertTrue(all(message.status == 'pending' for message in messages))
+        self.assertEqual(messages[0].data['sos_alert_id'], str(alert.id))
+    
+    def test_worker_delivers_with_delivery_id(self):
+        from .models import NotificationOutbox
+        
+        self.create_alert()
+        counts = self.dispatcher().run_once()
+        
+        self.assertEqual(counts, {'sent': 3})
+        # The fan-out shares one delivery id; each officer's push names their notification
+        self.assertEqual(len(self.sender.sent), 3)
+        by_token = {tokens[0]: data for tokens, title, body, data in self.sender.sent}
+        self.assertEqual(set(by_token), {f'token-{officer.id}' for officer in self.officers})
+        for message in NotificationOutbox.objects.all():
+            data = by_token[f'token-{message.officer_id}']
+            self.assertEqual(data['notification_id'], str(message.notification_id))
+            self.assertEqual(data['delivery_id'], str(message.delivery_id))
+        self.assertFalse(NotificationOutbox.objects.exclude(status='sent').exists())
+        self.assertEqual(self.dispatcher().run_once(), {})
+    
+    def test_identical_payloads_share_one_multicast(self):
+        import uuid
+        from .outbox import build_message, enqueue
+        
+        delivery_id = uuid.uuid4()
+        enqueue([
+            build_message(officer, 'Drill', 'Evacuate the east wing', {'type': 'drill'}, delivery_id=delivery_id)
+            for officer in self.officers
+        ])
+        
+        self.assertEqual(self.dispatcher().run_once(), {'sent': 3})
+        self.assertEqual(len(self.sender.sent), 1)
+        self.assertEqual(sorted(self.sender.sent[0][0]), sorted(f'token-{officer.id}' for officer in self.officers))
+    
+    def test_failures_back_off_then_fail(self):
+        from .models import NotificationOutbox
+        
+        self.create_alert()
+        self.sender.fail = True
+        now = timezone.now()
+        dispatcher = self.dispatcher()
+        
+        self.assertEqual(dispatcher.run_once(now), {'pending': 3})
+        message = NotificationOutbox.objects.first()
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, now + timedelta(seconds=4))
+        self.assertEqual(message.last_error, 'Unavailable')
+        # Not due yet
+        self.assertEqual(dispatcher.run_once(now), {})
+        
+        later = now + timedelta(hours=1)
+        dispatcher.run_once(later)
+        self.assertEqual(dispatcher.run_once(later + timedelta(hours=1)), {'failed': 3})
+        self.assertEqual(NotificationOutbox.objects.filter(status='failed', attempts=3).count(), 3)
+    
+    def test_expired_lease_is_redelivered(self):
+        from .models import NotificationOutbox
+        
+        self.create_alert()
+        now = timezone.now()
+        crashed = self.dispatcher(lease_seconds=30)
+        claimed = crashed.claim(now)
+        self.assertEqual(len(claimed), 3)
+        
+        # Another worker cannot take leased messages
+        self.assertEqual(self.dispatcher().claim(now + timedelta(seconds=10)), [])
+        counts = self.dispatcher().run_once(now + timedelta(seconds=31))
+        self.assertEqual(counts, {'sent': 3})
+        
+        # The crashed worker's late result no longer applies
+        self.assertEqual(crashed._finish(claimed[:1], status='pending'), 0)
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent', attempts=2).count(), 3)
+    
+    def test_unconfigured_fcm_is_skipped(self):
+        from .models import NotificationOutbox
+        
+        self.create_alert()
+        self.sender.server_key = None
+        
+        self.assertEqual(self.dispatcher().run_once(), {'skipped': 3})
+        self.assertEqual(NotificationOutbox.objects.filter(status='skipped').count(), 3)
+    
+    def test_rolled_back_alert_leaves_no_messages(self):
+        from django.db import transaction
+        from .models import NotificationOutbox
+        
+        try:
+            with transaction.atomic():
+                self.create_alert()
+                raise RuntimeError('request failed')
+        except RuntimeError:
+            pass
+        
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+class FCMStandInHandler(BaseHTTPRequestHandler):
+    """Minimal legacy FCM endpoint: ``stale-`` tokens are unregistered, ``old-`` tokens get a canonical id."""
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        tokens = payload['registration_ids']
+        server = self.server
+        with server.lock:
+            server.batches.append(len(tokens))
+            server.payloads.append(payload['data'])
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        if server.delay:
+            time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        results = []
+        for token in tokens:
+            if token.startswith('stale-'):
+                results.append({'error': 'NotRegistered'})
+            elif token.startswith('old-'):
+                results.append({'message_id': '1', 'registration_id': 'new-' + token[4:]})
+            else:
+                results.append({'message_id': '1'})
+        body = json.dumps({
+            'success': sum(1 for result in results if 'message_id' in result),
+            'failure': sum(1 for result in results if 'error' in result),
+            'results': results,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FCMBatchSenderTest(TestCase):
+    def setUp(self):
+        from .fcm_service import FCMService
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FCMStandInHandler)
+        self.server.lock = threading.Lock()
+        self.server.batches = []
+        self.server.payloads = []
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        
+        self.service = FCMService()
+        self.service.server_key = 'test-key'
+        self.service.fcm_url = f'http://127.0.0.1:{self.server.server_address[1]}/fcm/send'
+        self.organization = Organization.objects.create(name='North Campus')
+    
+    def test_tokens_are_split_at_request_limit(self):
+        tokens = [f'token-{i}' for i in range(2500)]
+        
+        outcome = self.service.send_multicast([(tokens, 'Title', 'Body', {'type': 'test'})])[0]
+        
+        self.assertEqual(sorted(self.server.batches), [500, 1000, 1000])
+        self.assertEqual(len(outcome), 2500)
+        self.assertTrue(all(error is None for error in outcome.values()))
+    
+    def test_invalid_tokens_pruned_and_canonical_tokens_replaced(self):
+        from .models import OfficerDevice
+        
+        officer = create_officer(self.organization, 'Asha')
+        for token in ('good-1', 'stale-1', 'old-1'):
+            OfficerDevice.objects.create(officer=officer, token=token)
+        
+        self.assertTrue(self.service.send_to_officer(officer, 'Title', 'Body'))
+        
+        self.assertEqual(
+            sorted(OfficerDevice.objects.filter(officer=officer).values_list('token', flat=True)),
+            ['good-1', 'new-1']
+        )
+    
+    def test_sos_fan_out_to_300_officers(self):
+        from .models import Notification, OfficerDevice, NotificationOutbox, SOSAlert
+        from .outbox import OutboxDispatcher
+        
+        officers = SecurityOfficer.objects.bulk_create([
+            SecurityOfficer(name=f'Officer{i}', contact='9999999999', email=f'officer{i}@example.com',
+                            organization=self.organization)
+            for i in range(300)
+        ])
+        OfficerDevice.objects.bulk_create(
+            [OfficerDevice(officer=officer, token=f'{device}-{officer.id}')
+             for officer in officers for device in ('phone', 'tablet')]
+        )
+        user = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            alert = SOSAlert.objects.create(user=user, location_lat=18.5, location_long=73.8)
+        self.server.delay = 0.01
+        
+        counts = OutboxDispatcher(sender=self.service, batch_size=2000).run_once()
+        
+        self.assertEqual(counts, {'sent': 300})
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 300)
+        # Each officer's push carries their own notification id, so it is one
+        # request per officer covering all of their devices
+        self.assertEqual(self.server.batches, [2] * 300)
+        self.assertEqual(
+            sorted(int(data['notification_id']) for data in self.server.payloads),
+            sorted(Notification.objects.filter(sos_alert=alert).values_list('id', flat=True))
+        )
+        self.assertEqual({data['delivery_id'] for data in self.server.payloads},
+                         {str(NotificationOutbox.objects.first().delivery_id)})
+        # The requests overlap on the thread pool instead of running one after another
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, self.service.max_workers)
+    
+    def test_distinct_payloads_are_sent_concurrently(self):
+        self.server.delay = 0.01
+        jobs = [([f'token-{i}'], 'Case assigned', f'Case #{i}', {'case_id': str(i)}) for i in range(200)]
+        
+        outcomes = self.service.send_multicast(jobs)
+        
+        self.assertTrue(all(outcome == {f'token-{i}': None} for i, outcome in enumerate(outcomes)))
+        self.assertEqual(len(self.server.batches), 200)
+        self.assertEqual(sorted(int(data['case_id']) for data in self.server.payloads), list(range(200)))
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, self.service.max_workers)
+
+
+class OfficerDeviceViewTest(APITestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='North Campus')
+        self.officer = create_officer(self.organization, 'Asha')
+        self.user = User.objects.create_user(
+            username='asha', email=self.officer.email, password='pass12345', role='security'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_register_refresh_and_remove_device(self):
+        from .models import OfficerDevice
+        
+        payload = {'token': 'device-token', 'platform': 'ios'}
+        created = self.client.post(reverse('security-devices'), payload, format='json')
+        refreshed = self.client.post(reverse('security-devices'), payload, format='json')
+        
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(refreshed.status_code, status.HTTP_200_OK)
+        self.assertEqual(OfficerDevice.objects.filter(officer=self.officer).count(), 1)
+        
+        removed = self.client.delete(reverse('security-devices'), {'token': 'device-token'}, format='json')
+        self.assertEqual(removed.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(OfficerDevice.objects.exists())
+    
+    def test_token_moves_to_new_officer(self):
+        from .models import OfficerDevice
+        
+        other = create_officer(self.organization, 'Ravi')
+        OfficerDevice.objects.create(officer=other, token='shared-phone')
+        
+        self.client.post(reverse('security-devices'), {'token': 'shared-phone'}, format='json')
+        
+        self.assertEqual(OfficerDevice.objects.get(token='shared-phone').officer, self.officer)
+
+
+class SOSFanOutQueryCountTest(TestCase):
+    def create_alert_with_officers(self, officer_count):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import SOSAlert
+        
+        organization = Organization.objects.create(name=f'Org with {officer_count}')
+        SecurityOfficer.objects.bulk_create([
+            SecurityOfficer(name=f'Officer{i}', contact='9999999999',
+                            email=f'officer{i}-{officer_count}@example.com', organization=organization)
+            for i in range(officer_count)
+        ])
+        user = User.objects.create_user(
+            username=f'caller{officer_count}', email=f'caller{officer_count}@example.com',
+            password='pass12345', role='USER', organization=organization
+        )
+        with self.settings(DISPATCH_AUTO_ASSIGN=False), CaptureQueriesContext(connection) as queries:
+            alert = SOSAlert.objects.create(user=user, location_lat=18.5, location_long=73.8)
+        return alert, len(queries)
+    
+    def test_query_count_does_not_grow_with_officers(self):
+        from .models import NotificationOutbox
+        
+        small_alert, small_queries = self.create_alert_with_officers(3)
+        large_alert, large_queries = self.create_alert_with_officers(60)
+        
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(large_alert.notifications.count(), 60)
+        outbox = NotificationOutbox.objects.filter(notification__sos_alert=large_alert)
+        self.assertEqual(outbox.count(), 60)
+        self.assertEqual(outbox.values('delivery_id').distinct().count(), 1)
+        self.assertEqual(
+            set(outbox.values_list('officer_id', flat=True)),
+            set(large_alert.notifications.values_list('officer_id', flat=True))
+        )
+
+
+class UnreadNotificationCounterTest(APITestCase):
+    def setUp(self):
+        from core.cache import view_cache
+        view_cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.officer = create_officer(self.organization, 'Asha')
+        self.other = create_officer(self.organization, 'Ravi')
+        self.officer_user = User.objects.create_user(
+            username='asha', email=self.officer.email, password='pass12345', role='security'
+        )
+        self.caller = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+    
+    def create_alert(self):
+        from .models import SOSAlert
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            return SOSAlert.objects.create(user=self.caller, location_lat=18.5, location_long=73.8)
+    
+    def counter(self, officer):
+        return OfficerProfile.objects.get(officer=officer).unread_notifications
+    
+    def test_fan_out_and_single_notifications_increment(self):
+        from .models import Case
+        
+        alert = self.create_alert()
+        self.create_alert()
+        Case.objects.create(sos_alert=alert, officer=self.officer, status='open')
+        
+        self.assertEqual(self.counter(self.officer), 3)
+        self.assertEqual(self.counter(self.other), 2)
+    
+    def test_read_and_delete_decrement_once(self):
+        self.create_alert()
+        self.create_alert()
+        first, second = self.officer.notifications.all()
+        
+        self.assertTrue(first.mark_as_read())
+        self.assertFalse(first.mark_as_read())
+        self.assertEqual(self.counter(self.officer), 1)
+        
+        # Deleting a read notification leaves the counter alone; an unread one decrements it
+        first.delete()
+        self.assertEqual(self.counter(self.officer), 1)
+        second.delete()
+        self.assertEqual(self.counter(self.officer), 0)
+    
+    def test_badge_endpoint_does_not_scan_notifications(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.create_alert()
+        self.client.force_authenticate(user=self.officer_user)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('security-notifications-unread-count'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'unread_count': 1})
+        self.assertFalse(any('security_app_notification' in query['sql'] for query in queries.captured_queries))
+    
+    def test_acknowledge_updates_dashboard_count(self):
+        self.create_alert()
+        notification = self.officer.notifications.get()
+        self.client.force_authenticate(user=self.officer_user)
+        response = self.client.get(reverse('security-dashboard'))
+        self.assertEqual(response.data['metrics']['unread_notifications'], 1)
+        
+        # Acknowledging drops the officer's cached dashboard
+        self.client.post(
+            reverse('security-notifications-acknowledge'), {'notification_ids': [notification.id]}, format='json'
+        )
+        response = self.client.get(reverse('security-dashboard'))
+        
+        self.assertEqual(response.data['metrics']['unread_notifications'], 0)
+    
+    def test_reconciler_repairs_drift(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import Notification
+        
+        self.create_alert()
+        self.create_alert()
+        # Bypasses the counter
+        Notification.objects.filter(officer=self.officer).update(is_read=True)
+        OfficerProfile.objects.filter(officer=self.other).update(unread_notifications=7)
+        
+        out = StringIO()
+        call_command('reconcile_notification_counters', stdout=out)
+        
+        self.assertIn('Repaired 2', out.getvalue())
+        self.assertEqual(self.counter(self.officer), 0)
+        self.assertEqual(self.counter(self.other), 2)
+    
+    def test_officer_without_profile_is_initialized(self):
+        from .notification_counters import unread_count
+        
+        self.create_alert()
+        OfficerProfile.objects.filter(officer=self.other).delete()
+        
+        self.assertEqual(unread_count(self.other.id), 1)
+        self.assertEqual(self.counter(self.other), 1)
+
+
+class NotificationAcknowledgeTest(APITestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='North Campus')
+        self.officer = create_officer(self.organization, 'Asha')
+        self.other = create_officer(self.organization, 'Ravi')
+        self.officer_user = User.objects.create_user(
+            username='asha', email=self.officer.email, password='pass12345', role='security'
+        )
+        self.client.force_authenticate(user=self.officer_user)
+        self.url = reverse('security-notifications-acknowledge')
+    
+    def notify(self, officer=None, count=1):
+        from .models import Notification
+        return [
+            Notification.objects.create(officer=officer or self.officer, title='Alert', message='Help needed')
+            for _ in range(count)
+        ]
+    
+    def unread(self, officer=None):
+        return (officer or self.officer).notifications.filter(is_read=False).count()
+    
+    def counter(self, officer=None):
+        return OfficerProfile.objects.get(officer=officer or self.officer).unread_notifications
+    
+    def test_ids_marked_read_in_one_update(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        notifications = self.notify(count=30)
+        foreign = self.notify(officer=self.other)[0]
+        ids = [notification.id for notification in notifications] + [foreign.id]
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'notification_ids': ids}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated_count'], 30)
+        self.assertEqual(response.data['unread_count'], 0)
+        updates = [query for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "security_app_notification"')]
+        self.assertEqual(len(updates), 1)
+        # Another officer's notification is untouched
+        self.assertEqual(self.unread(self.other), 1)
+        self.assertEqual(self.counter(self.other), 1)
+    
+    def test_watermark_by_id(self):
+        notifications = self.notify(count=5)
+        
+        response = self.client.post(self.url, {'up_to_id': notifications[2].id}, format='json')
+        
+        self.assertEqual(response.data['updated_count'], 3)
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.counter(), 2)
+    
+    def test_watermark_by_time(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import Notification
+        
+        old, recent = self.notify(count=2)
+        Notification.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(hours=2))
+        
+        response = self.client.post(
+            self.url, {'up_to': (timezone.now() - timedelta(hours=1)).isoformat()}, format='json'
+        )
+        
+        self.assertEqual(response.data['updated_count'], 1)
+        self.assertFalse(self.officer.notifications.get(id=recent.id).is_read)
+    
+    def test_ids_and_watermark_are_exclusive(self):
+        notification = self.notify()[0]
+        
+        response = self.client.post(
+            self.url, {'notification_ids': [notification.id], 'up_to_id': notification.id}, format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_stale_if_match_is_rejected(self):
+        self.notify(count=2)
+        etag = self.client.get(reverse('security-notifications'))['ETag']
+        self.notify()
+        
+        response = self.client.post(self.url, {'up_to_id': 10 ** 9}, format='json', HTTP_IF_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertNotEqual(response.data['etag'], etag)
+        self.assertEqual(self.unread(), 3)
+        
+        response = self.client.post(self.url, {'up_to_id': 10 ** 9}, format='json', HTTP_IF_MATCH=response['ETag'])
+        
+        self.assertEqual(response.data['updated_count'], 3)
+        self.assertEqual(self.counter(), 0)
+    
+    def test_if_match_bounds_watermark_to_seen_notifications(self):
+        from unittest.mock import patch
+        from . import views
+        
+        seen = self.notify(count=2)
+        etag = self.client.get(reverse('security-notifications'))['ETag']
+        original_mark_read = views.mark_read
+        
+        def arrive_then_mark(officer_id, notifications):
+            # A notification lands between the If-Match check and the UPDATE
+            self.notify()
+            return original_mark_read(officer_id, notifications)
+        
+        with patch.object(views, 'mark_read', arrive_then_mark):
+            response = self.client.post(self.url, {'up_to_id': 10 ** 9}, format='json', HTTP_IF_MATCH=etag)
+        
+        self.assertEqual(response.data['updated_count'], len(seen))
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(self.counter(), 1)
+
+
+class OfficerEventStreamTest(TestCase):
+    def setUp(self):
+        from core.events import event_broker
+        from rest_framework_simplejwt.tokens import AccessToken
+        
+        self.broker = event_broker
+        self.broker.reset()
+        self.addCleanup(self.broker.reset)
+        self.organization = Organization.objects.create(name='North Campus')
+        self.other_organization = Organization.objects.create(name='South Campus')
+        self.officer = create_officer(self.organization, 'Asha')
+        self.officer_user = User.objects.create_user(
+            username='asha', email=self.officer.email, password='pass12345', role='security'
+        )
+        self.caller = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.officer_user)}'}
+        self.url = reverse('security-stream')
+    
+    async def open_stream(self, **headers):
+        response = await self.async_client.get(self.url, headers={**self.auth, **headers})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        return stream
+    
+    async def test_streams_organization_and_own_events(self):
+        import asyncio
+        from unittest.mock import patch
+        from django.db.backends.utils import CursorWrapper
+        
+        stream = await self.open_stream()
+        receive = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        
+        # Counts queries on every connection and thread
+        with patch.object(CursorWrapper, 'execute', autospec=True, side_effect=CursorWrapper.execute) as queries:
+            self.broker.publish('organization:999', 'sos_alert', {'id': 1})
+            self.broker.publish(f'officer:{self.officer.id + 1}', 'case', {'id': 2})
+            event = self.broker.publish(f'organization:{self.organization.id}', 'sos_alert', {'id': 3})
+            chunk = await asyncio.wait_for(receive, 1)
+            self.broker.publish(f'officer:{self.officer.id}', 'case', {'id': 4})
+            own = await asyncio.wait_for(anext(stream), 1)
+        
+        self.assertEqual(chunk.decode(), event.encode())
+        self.assertIn(b'event: case', own)
+        # A connected officer costs no queries
+        self.assertEqual(queries.call_count, 0)
+        await stream.aclose()
+    
+    async def test_last_event_id_resumes(self):
+        channel = f'officer:{self.officer.id}'
+        seen = self.broker.publish(channel, 'notification', {'id': 1})
+        missed = self.broker.publish(channel, 'notification', {'id': 2})
+        
+        stream = await self.open_stream(**{'Last-Event-ID': str(seen.id)})
+        
+        self.assertEqual((await anext(stream)).decode(), missed.encode())
+        await stream.aclose()
+    
+    async def test_requires_officer_token(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = await self.async_client.get(self.url, headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = await self.async_client.get(self.url, headers={'Last-Event-ID': 'abc', **self.auth})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_signals_publish_on_commit(self):
+        from .models import Case, SOSAlert
+        
+        channels = [f'organization:{self.organization.id}', f'officer:{self.officer.id}']
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                alert = SOSAlert.objects.create(user=self.caller, location_lat=18.5, location_long=73.8)
+            with self.captureOnCommitCallbacks(execute=True):
+                Case.objects.create(sos_alert=alert, officer=self.officer, status='open')
+        
+        events, _ = self.broker.replay(channels, 0)
+        
+        # The SOS fan-out is one organization event, not one per officer
+        self.assertEqual(
+            [(event.channel, event.type) for event in events],
+            [
+                (channels[0], 'sos_alert'),
+                (channels[1], 'notification'),
+                (channels[1], 'case'),
+            ]
+        )
+        self.assertEqual(events[0].data['id'], alert.id)
+        self.assertTrue(events[0].data['created'])
@@ -9,11 +9,17 @@ router.register(r'case', views.CaseViewSet, basename='security-case')
 urlpatterns = [
     path('', include(router.urls)),
     path('navigation/', views.NavigationView.as_view(), name='security-navigation'),
+    path('navigation/cache-stats/', views.NavigationCacheStatsView.as_view(), name='security-navigation-cache-stats'),
     path('incidents/', views.IncidentsView.as_view(), name='security-incidents'),
     path('login/', views.OfficerLoginView.as_view(), name='security-login'),
     path('profile/', views.OfficerProfileView.as_view(), name='security-profile'),
     path('notifications/', views.NotificationView.as_view(), name='security-notifications'),
+    path('notifications/unread-count/', views.NotificationUnreadCountView.as_view(), name='security-notifications-unread-count'),
     path('notifications/acknowledge/', views.NotificationAcknowledgeView.as_view(), name='security-notifications-acknowledge'),
     path('dashboard/', views.DashboardView.as_view(), name='security-dashboard'),
+    path('location/', views.OfficerLocationView.as_view(), name='security-location'),
+    path('devices/', views.OfficerDeviceView.as_view(), name='security-devices'),
+    path('stream/', views.OfficerEventStreamView.as_view(), name='security-stream'),
+    path('officers/nearest/', views.NearestOfficersView.as_view(), name='security-officers-nearest'),
 ]
 
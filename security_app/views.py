@@ -1,3 +1,5 @@
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import action
@@ -6,11 +8,17 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from asgiref.sync import sync_to_async
 
 from users.permissions import IsSuperAdminOrSubAdmin
 from security.models import Case as LegacyCase
-from .models import SOSAlert, Case, Incident, OfficerProfile, Notification
-from security.utils import haversine_distance_km
+from .models import SOSAlert, Case, Incident, OfficerProfile, Notification, OfficerDevice
+from security.distance import haversine_distance_km
+from users.geofence_transitions import geofence_transition_detector
 from users.models import SecurityOfficer
 
 from .permissions import IsSecurityOfficer
@@ -23,7 +31,20 @@ from .serializers import (
     IncidentSerializer,
     NotificationSerializer,
     NotificationAcknowledgeSerializer,
+    OfficerLocationUpdateSerializer,
+    OfficerDeviceSerializer,
+    NearestOfficersQuerySerializer,
+    NearestOfficerSerializer,
 )
+from .officer_locations import officer_location_store
+from .route_cache import route_cache
+from .notification_counters import mark_read, unread_count
+from .offline_routing import offline_router
+from .streams import officer_channels
+from core.cache import view_cache
+from core.events import authenticate_stream, event_broker, release_connection, stream_response
+
+logger = logging.getLogger(__name__)
 
 
 class OfficerOnlyMixin:
@@ -55,7 +76,9 @@ class SOSAlertViewSet(OfficerOnlyMixin, viewsets.ModelViewSet):
             return SOSAlert.objects.none()
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # The alert, its notifications and their outbox messages commit together
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
 
     @action(detail=True, methods=['patch'])
     def resolve(self, request, pk=None):
@@ -152,10 +175,13 @@ class CaseViewSet(OfficerOnlyMixin, viewsets.ModelViewSet):
 
 
 class NavigationView(OfficerOnlyMixin, APIView):
+    TRAVEL_MODES = ('driving', 'walking', 'bicycling', 'transit')
+
     def post(self, request):
         """
         Calculate route from officer location to target coordinates
         Expected input: {"from_lat": 18.5204, "from_lng": 73.8567, "to_lat": 18.5310, "to_lng": 73.8440}
+        Optional: "mode" (driving, walking, bicycling, transit; default driving)
         """
         try:
             from_lat = float(request.data.get('from_lat'))
@@ -167,46 +193,61 @@ class NavigationView(OfficerOnlyMixin, APIView):
                 'error': 'Invalid or missing coordinates. Expected: from_lat, from_lng, to_lat, to_lng'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get route information from Google Maps API
-        route_data = self._get_route_from_google_maps(from_lat, from_lng, to_lat, to_lng)
+        mode = request.data.get('mode') or 'driving'
+        if mode not in self.TRAVEL_MODES:
+            return Response({
+                'error': f"Invalid mode. Expected one of: {', '.join(self.TRAVEL_MODES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Nearby requests share a cached route; stale routes are served while refreshing
+        route_data, cache_status = route_cache.get_or_fetch(
+            from_lat, from_lng, to_lat, to_lng,
+            fetch=lambda: self._get_route_from_google_maps(from_lat, from_lng, to_lat, to_lng, mode),
+            mode=mode
+        )
         
         if route_data.get('error'):
             return Response(route_data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({
+        response = Response({
             'from_location': {'lat': from_lat, 'lng': from_lng},
             'to_location': {'lat': to_lat, 'lng': to_lng},
             'route': route_data
         })
+        response['X-Route-Cache'] = cache_status
+        return response
 
-    def _get_route_from_google_maps(self, from_lat, from_lng, to_lat, to_lng):
+    def _get_route_from_google_maps(self, from_lat, from_lng, to_lat, to_lng, mode='driving'):
         """
         Get route information from Google Maps Directions API
         """
         import requests
         from django.conf import settings
+        from core.http import http_clients
         
         api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', None)
         if not api_key:
-            # Fallback to haversine calculation if no API key
-            return self._get_fallback_route(from_lat, from_lng, to_lat, to_lng)
+            # Route over the local road graph, or straight-line, if no API key
+            return self._get_offline_route(from_lat, from_lng, to_lat, to_lng, mode) or \
+                self._get_fallback_route(from_lat, from_lng, to_lat, to_lng)
 
         url = "https://maps.googleapis.com/maps/api/directions/json"
         params = {
             'origin': f"{from_lat},{from_lng}",
             'destination': f"{to_lat},{to_lng}",
             'key': api_key,
-            'mode': 'driving',  # Can be changed to 'walking', 'bicycling', 'transit'
+            'mode': mode,
             'units': 'metric'
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = http_clients.get('google_maps').get(url, params=params)
             response.raise_for_status()
             data = response.json()
 
             if data.get('status') != 'OK':
-                return {'error': f"Google Maps API error: {data.get('status', 'Unknown error')}"}
+                return self._get_offline_route(from_lat, from_lng, to_lat, to_lng, mode) or \
+                    {'error': f"Google Maps API error: {data.get('status', 'Unknown error')}"}
 
             route = data['routes'][0]
             leg = route['legs'][0]
@@ -236,10 +277,20 @@ class NavigationView(OfficerOnlyMixin, APIView):
             }
 
         except requests.RequestException as e:
-            return {'error': f"Failed to connect to Google Maps API: {str(e)}"}
+            return self._get_offline_route(from_lat, from_lng, to_lat, to_lng, mode) or \
+                {'error': f"Failed to connect to Google Maps API: {str(e)}"}
         except (KeyError, IndexError) as e:
             return {'error': f"Unexpected response format from Google Maps API: {str(e)}"}
 
+    def _get_offline_route(self, from_lat, from_lng, to_lat, to_lng, mode='driving'):
+        """
+        Route over the preloaded road graph during Google Maps outages.
+        Returns None if no graph is configured, the mode is not driving or no path exists.
+        """
+        if mode != 'driving':
+            return None
+        return offline_router.route(from_lat, from_lng, to_lat, to_lng)
+
     def _get_fallback_route(self, from_lat, from_lng, to_lat, to_lng):
         """
         Fallback route calculation using haversine distance when Google Maps API is not available
@@ -363,6 +414,13 @@ class OfficerLoginView(APIView):
         })
 
 
+def notifications_etag(officer_id):
+    """ETag of an officer's notification list: changes whenever a notification arrives."""
+    from django.db.models import Max
+    latest_id = Notification.objects.filter(officer_id=officer_id).aggregate(latest=Max('id'))['latest'] or 0
+    return f'"{officer_id}-{latest_id}"', latest_id
+
+
 class NotificationView(OfficerOnlyMixin, APIView, PageNumberPagination):
     page_size_query_param = 'page_size'
 
@@ -378,12 +436,35 @@ class NotificationView(OfficerOnlyMixin, APIView, PageNumberPagination):
         
         page = self.paginate_queryset(notifications, request, view=self)
         serializer = NotificationSerializer(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        response = self.get_paginated_response(serializer.data)
+        # Send back as If-Match when acknowledging to detect notifications that arrived since
+        response['ETag'] = notifications_etag(officer.id)[0]
+        return response
+
+
+class NotificationUnreadCountView(OfficerOnlyMixin, APIView):
+    def get(self, request):
+        """Unread notification badge count for the logged-in officer"""
+        officer_id = SecurityOfficer.objects.filter(email=request.user.email).values_list('id', flat=True).first()
+        if officer_id is None:
+            return Response({'detail': 'Officer not found for user.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'unread_count': unread_count(officer_id)})
+
+
+def _officer_dashboard_scope(request):
+    """Cache scope of the officer dashboard: the officer's user"""
+    return f'user:{request.user.pk}'
 
 
 class NotificationAcknowledgeView(OfficerOnlyMixin, APIView):
     def post(self, request):
-        """Mark notifications as read"""
+        """
+        Mark notifications as read with a single UPDATE
+        Either {"notification_ids": [...]} or a watermark {"up_to_id": 123} and/or
+        {"up_to": "2024-01-01T00:00:00Z"} marking everything up to that point read.
+        An If-Match header with the ETag from the notification list makes the request
+        fail with 412 if notifications arrived since, and bounds a watermark to that list.
+        """
         try:
             officer = SecurityOfficer.objects.get(email=request.user.email)
         except SecurityOfficer.DoesNotExist:
@@ -391,26 +472,46 @@ class NotificationAcknowledgeView(OfficerOnlyMixin, APIView):
 
         serializer = NotificationAcknowledgeSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
         
-        notification_ids = serializer.validated_data['notification_ids']
-        notifications = Notification.objects.filter(
-            id__in=notification_ids,
-            officer=officer,
-            is_read=False
-        )
+        notifications = Notification.objects.all()
+        if_match = request.headers.get('If-Match')
+        if if_match and if_match != '*':
+            etag, latest_id = notifications_etag(officer.id)
+            if if_match != etag:
+                response = Response({
+                    'detail': 'Notifications changed since they were loaded.',
+                    'etag': etag
+                }, status=status.HTTP_412_PRECONDITION_FAILED)
+                response['ETag'] = etag
+                return response
+            # Anything newer than the ETag arrived after the check and stays unread
+            notifications = notifications.filter(id__lte=latest_id)
         
-        updated_count = 0
-        for notification in notifications:
-            notification.mark_as_read()
-            updated_count += 1
+        if 'notification_ids' in data:
+            notifications = notifications.filter(id__in=data['notification_ids'])
+        else:
+            if 'up_to_id' in data:
+                notifications = notifications.filter(id__lte=data['up_to_id'])
+            if 'up_to' in data:
+                notifications = notifications.filter(created_at__lte=data['up_to'])
         
-        return Response({
+        updated_count = mark_read(officer.id, notifications)
+        if updated_count:
+            # The officer sees their unread count drop right away
+            view_cache.invalidate('security_dashboard', _officer_dashboard_scope(request))
+        
+        response = Response({
             'message': f'Marked {updated_count} notifications as read',
-            'updated_count': updated_count
+            'updated_count': updated_count,
+            'unread_count': unread_count(officer.id)
         })
+        response['ETag'] = notifications_etag(officer.id)[0]
+        return response
 
 
 class DashboardView(OfficerOnlyMixin, APIView):
+    @method_decorator(view_cache.cached('security_dashboard', scope=_officer_dashboard_scope))
     def get(self, request):
         """Get officer dashboard metrics"""
         try:
@@ -452,8 +553,8 @@ class DashboardView(OfficerOnlyMixin, APIView):
         
         avg_response_time = sum(response_times) / len(response_times) if response_times else 0
         
-        # Unread notifications count
-        unread_notifications = Notification.objects.filter(officer=officer, is_read=False).count()
+        # Unread notifications count, from the officer's counter
+        unread_notifications = unread_count(officer.id)
         
         return Response({
             'officer_name': officer.name,
@@ -467,3 +568,143 @@ class DashboardView(OfficerOnlyMixin, APIView):
             'last_updated': now.isoformat()
         })
 
+
+class OfficerLocationView(OfficerOnlyMixin, APIView):
+    def post(self, request):
+        """Report the logged-in officer's current position"""
+        try:
+            officer = SecurityOfficer.objects.get(email=request.user.email)
+        except SecurityOfficer.DoesNotExist:
+            return Response({'detail': 'Officer not found for user.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = OfficerLocationUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        stored = officer_location_store.update(
+            officer.id,
+            data['location_lat'],
+            data['location_long'],
+            data.get('timestamp')
+        )
+        # Only fixes that were stored reach the geofence enter/exit detector
+        if stored:
+            try:
+                geofence_transition_detector.process_fix(
+                    request.user, data['location_lat'], data['location_long'], data.get('timestamp')
+                )
+            except Exception as e:
+                logger.error(f"Geofence transition check failed for officer {officer.id}: {str(e)}")
+        return Response({'detail': 'Location updated.'})
+
+
+class OfficerDeviceView(OfficerOnlyMixin, APIView):
+    def post(self, request):
+        """Register (or refresh) an FCM token for the logged-in officer's device"""
+        try:
+            officer = SecurityOfficer.objects.get(email=request.user.email)
+        except SecurityOfficer.DoesNotExist:
+            return Response({'detail': 'Officer not found for user.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = OfficerDeviceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        device, created = OfficerDevice.objects.update_or_create(
+            token=serializer.validated_data['token'],
+            defaults={'officer': officer, 'platform': serializer.validated_data.get('platform', 'android')}
+        )
+        return Response(
+            OfficerDeviceSerializer(device).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def delete(self, request):
+        """Unregister a device token, e.g. on logout"""
+        token = request.data.get('token')
+        if not token:
+            return Response({'detail': 'token is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        deleted, _ = OfficerDevice.objects.filter(token=token, officer__email=request.user.email).delete()
+        if not deleted:
+            return Response({'detail': 'Device not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def _authenticate_stream_officer(request):
+    """(status, officer) for an event stream request authenticated with a JWT"""
+    try:
+        if authenticate_stream(request) is None:
+            return status.HTTP_401_UNAUTHORIZED, None
+        if not IsSecurityOfficer().has_permission(request, None):
+            return status.HTTP_403_FORBIDDEN, None
+        officer = SecurityOfficer.objects.filter(email=request.user.email).only('id', 'organization_id').first()
+        if officer is None:
+            return status.HTTP_404_NOT_FOUND, None
+        return status.HTTP_200_OK, officer
+    finally:
+        release_connection()
+
+
+class OfficerEventStreamView(View):
+    """
+    Server-sent events for the officer app: SOS alerts of the officer's
+    organization and the officer's own notifications and cases, instead of
+    polling the notification and SOS endpoints. Served by the ASGI app.
+    """
+    STATUS_DETAILS = {
+        status.HTTP_401_UNAUTHORIZED: 'Authentication credentials were not provided or are invalid.',
+        status.HTTP_403_FORBIDDEN: IsSecurityOfficer.message,
+        status.HTTP_404_NOT_FOUND: 'Officer not found for user.',
+    }
+
+    async def get(self, request):
+        """
+        Stream events; reconnect with the Last-Event-ID header (or ?last_event_id=)
+        to get the events missed in between
+        """
+        status_code, officer = await sync_to_async(_authenticate_stream_officer)(request)
+        if officer is None:
+            return JsonResponse({'detail': self.STATUS_DETAILS[status_code]}, status=status_code)
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return JsonResponse({'detail': 'Invalid Last-Event-ID.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return stream_response(event_broker.stream(officer_channels(officer), last_event_id))
+
+
+class NearestOfficersView(APIView):
+    permission_classes = [IsAuthenticated, IsSuperAdminOrSubAdmin]
+
+    def get(self, request):
+        """Nearest on-duty officers with a fresh position, closest first"""
+        serializer = NearestOfficersQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        # SUB_ADMIN only ever sees officers of their own organization
+        if request.user.role == 'SUB_ADMIN':
+            if not request.user.organization_id:
+                return Response({'detail': 'No organization assigned.'}, status=status.HTTP_403_FORBIDDEN)
+            organization_id = request.user.organization_id
+        else:
+            organization_id = data.get('organization')
+
+        officers = officer_location_store.nearest(
+            data['lat'],
+            data['lng'],
+            k=data['k'],
+            organization_id=organization_id,
+            max_distance_km=data.get('max_distance_km')
+        )
+        return Response({
+            'count': len(officers),
+            'results': NearestOfficerSerializer(officers, many=True).data
+        })
+
+
+class NavigationCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsSuperAdminOrSubAdmin]
+
+    def get(self, request):
+        """Hit/miss counters of this worker's route cache"""
+        return Response(route_cache.stats())
@@ -30,7 +30,7 @@ class GeofenceAdmin(admin.ModelAdmin):
     list_display = ('name', 'organization', 'active', 'created_by', 'created_at')
     list_filter = ('organization', 'active', 'created_at')
     search_fields = ('name', 'description', 'organization__name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at') + Geofence.GEOMETRY_FIELDS
     ordering = ('-created_at',)
     
     fieldsets = (
@@ -41,6 +41,10 @@ class GeofenceAdmin(admin.ModelAdmin):
             'fields': ('polygon_json',),
             'classes': ('wide',)
         }),
+        ('Computed Geometry', {
+            'fields': Geofence.GEOMETRY_FIELDS,
+            'classes': ('collapse',)
+        }),
         ('Audit Information', {
             'fields': ('created_by', 'created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -0,0 +1,130 @@
+"""
+Vectorized batch point-in-polygon engine.
+
+All polygon edges are packed into flat NumPy arrays so that N points can be
+tested against M geofences with a handful of array operations instead of an
+N x M Python loop. Ray-casting parity is evaluated per ring and combined so
+that holes are excluded, matching ``users.geometry.point_in_polygon``.
+"""
+import numpy as np
+
+# Upper bound on the size of the (points x edges) working arrays per chunk
+MAX_CHUNK_ELEMENTS = 4_000_000
+
+
+class PackedPolygons:
+    """Flat edge arrays for a list of polygons in GeoJSON ``[lng, lat]`` order."""
+
+    def __init__(self, polygons):
+        x1, y1, x2, y2 = [], [], [], []
+        ring_starts = []
+        ring_polygon = []
+        ring_is_hole = []
+        bboxes = np.full((len(polygons), 4), np.nan)
+
+        edge_count = 0
+        for polygon_index, coordinates in enumerate(polygons):
+            if not coordinates or not coordinates[0] or len(coordinates[0]) < 3:
+                continue
+            outer = np.asarray(coordinates[0], dtype=float)[:, :2]
+            bboxes[polygon_index] = (
+                outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max()
+            )
+            for ring_index, ring in enumerate(coordinates):
+                ring = np.asarray(ring, dtype=float)
+                if len(ring) < 3:
+                    continue
+                ring = ring[:, :2]
+                previous = np.roll(ring, 1, axis=0)
+                x1.append(previous[:, 0])
+                y1.append(previous[:, 1])
+                x2.append(ring[:, 0])
+                y2.append(ring[:, 1])
+                ring_starts.append(edge_count)
+                ring_polygon.append(polygon_index)
+                ring_is_hole.append(ring_index > 0)
+                edge_count += len(ring)
+
+        self.polygon_count = len(polygons)
+        self.bboxes = bboxes
+        self.ring_starts = np.asarray(ring_starts, dtype=np.intp)
+        self.ring_polygon = np.asarray(ring_polygon, dtype=np.intp)
+        self.ring_is_hole = np.asarray(ring_is_hole, dtype=bool)
+        if edge_count:
+            self.x1 = np.concatenate(x1)
+            self.y1 = np.concatenate(y1)
+            self.x2 = np.concatenate(x2)
+            self.y2 = np.concatenate(y2)
+        else:
+            self.x1 = self.y1 = self.x2 = self.y2 = np.empty(0)
+
+        # Map each hole ring onto its polygon so hole hits can be summed per polygon
+        outer_rings = np.flatnonzero(~self.ring_is_hole)
+        self.outer_ring_polygon = self.ring_polygon[outer_rings]
+        self.outer_rings = outer_rings
+        self.hole_rings = np.flatnonzero(self.ring_is_hole)
+
+    @property
+    def edge_count(self):
+        return len(self.x1)
+
+    def _ring_parity(self, lng, lat):
+        """Return an (n_points, n_rings) bool array of odd ray crossings."""
+        px = lng[:, None]
+        py = lat[:, None]
+        straddles = (self.y1 > py) != (self.y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = self.x2 + (py - self.y2) * (self.x1 - self.x2) / (self.y1 - self.y2)
+        crossings = straddles & (px < x_cross)
+        counts = np.add.reduceat(crossings.astype(np.int32), self.ring_starts, axis=1)
+        return (counts & 1).astype(bool)
+
+    def contains(self, lng, lat):
+        """Return an (n_points, n_polygons) bool containment matrix."""
+        result = np.zeros((len(lng), self.polygon_count), dtype=bool)
+        if not len(lng) or not self.edge_count:
+            return result
+
+        parity = self._ring_parity(lng, lat)
+        result[:, self.outer_ring_polygon] = parity[:, self.outer_rings]
+        if len(self.hole_rings):
+            hole_polygons = self.ring_polygon[self.hole_rings]
+            in_hole = np.zeros_like(result)
+            for column, polygon_index in enumerate(hole_polygons):
+                in_hole[:, polygon_index] |= parity[:, self.hole_rings[column]]
+            result &= ~in_hole
+
+        # Drop degenerate crossings outside the bounding box
+        with np.errstate(invalid='ignore'):
+            in_bbox = (
+                (lng[:, None] >= self.bboxes[:, 0]) & (lng[:, None] <= self.bboxes[:, 2])
+                & (lat[:, None] >= self.bboxes[:, 1]) & (lat[:, None] <= self.bboxes[:, 3])
+            )
+        return result & in_bbox
+
+
+def containment_matrix(points, polygons):
+    """
+    Test every point against every polygon.
+
+    Args:
+        points: sequence of ``(lat, lng)`` pairs
+        polygons: sequence of polygon coordinate lists as returned by
+            ``Geofence.get_polygon_coordinates()``
+
+    Returns:
+        ``numpy.ndarray`` of shape ``(len(points), len(polygons))`` and dtype bool
+    """
+    packed = PackedPolygons(polygons)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    lat = points[:, 0]
+    lng = points[:, 1]
+
+    chunk = max(1, MAX_CHUNK_ELEMENTS // max(packed.edge_count, 1))
+    if len(points) <= chunk:
+        return packed.contains(lng, lat)
+    return np.vstack([
+        packed.contains(lng[start:start + chunk], lat[start:start + chunk])
+        for start in range(0, len(points), chunk)
+    ])
+
@@ -0,0 +1,172 @@
+"""
+Geohash cell table for SQL-side geofence candidate lookup.
+
+Each geofence polygon is rasterized into geohash cells when it is written:
+boundary cells at ``GEOFENCE_CELL_PRECISION`` and interior cells merged up to
+the coarsest cell that is still fully inside. Interior cells need no further
+work; only boundary cells need the exact polygon test. A point lookup is a
+single indexed query matching the point's cell and its prefixes, which works
+the same in any worker or batch job without holding polygons in memory.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from . import geohash
+from .geometry import extract_polygon_coordinates, point_in_polygon, polygon_bbox, segment_intersects_box
+
+logger = logging.getLogger(__name__)
+
+
+def get_cell_precision():
+    return getattr(settings, 'GEOFENCE_CELL_PRECISION', 7)
+
+
+def _classify(cell, candidate_edges, coordinates, bbox):
+    """
+    Classify a cell against the polygon.
+
+    Returns ``('boundary', crossing_edges)``, ``('interior', None)`` or
+    ``('outside', None)``.
+    """
+    c_min_lat, c_min_lng, c_max_lat, c_max_lng = geohash.decode_bbox(cell)
+    if c_max_lng < bbox[0] or c_min_lng > bbox[2] or c_max_lat < bbox[1] or c_min_lat > bbox[3]:
+        return 'outside', None
+    crossing = [
+        edge for edge in candidate_edges
+        if segment_intersects_box(*edge, c_min_lng, c_min_lat, c_max_lng, c_max_lat)
+    ]
+    if crossing:
+        return 'boundary', crossing
+    # No edge touches the cell, so it lies entirely on one side
+    if point_in_polygon((c_min_lng + c_max_lng) / 2, (c_min_lat + c_max_lat) / 2, coordinates):
+        return 'interior', None
+    return 'outside', None
+
+
+def rasterize_polygon(coordinates, precision=None, max_cells=None):
+    """
+    Return ``[(geohash, is_interior)]`` covering the polygon.
+
+    The covering is refined one geohash level at a time: interior cells are
+    kept at the coarsest level where they are fully inside, and boundary
+    cells are split until they reach ``precision``. If splitting again would
+    exceed ``max_cells`` rows, refinement stops and the coarser boundary
+    cells are stored instead; lookups match any prefix of the point's cell,
+    so they stay correct and just run more exact tests.
+    """
+    precision = precision or get_cell_precision()
+    max_cells = max_cells or getattr(settings, 'GEOFENCE_CELL_MAX_CELLS', 4096)
+    bbox = polygon_bbox(coordinates)
+    if bbox is None:
+        return []
+
+    edges = []
+    for ring in coordinates:
+        if len(ring) < 2:
+            continue
+        previous = ring[-1]
+        for coord in ring:
+            edges.append((previous[0], previous[1], coord[0], coord[1]))
+            previous = coord
+
+    interior = []
+    boundary = [('', edges)]
+    while boundary and len(boundary[0][0]) < precision:
+        next_interior = []
+        next_boundary = []
+        for cell, cell_edges in boundary:
+            for child in geohash.children(cell):
+                kind, crossing = _classify(child, cell_edges, coordinates, bbox)
+                if kind == 'interior':
+                    next_interior.append(child)
+                elif kind == 'boundary':
+                    next_boundary.append((child, crossing))
+        if boundary[0][0] and len(interior) + len(next_interior) + len(next_boundary) > max_cells:
+            logger.warning(f"Geofence covering capped at geohash precision {len(boundary[0][0])}")
+            break
+        interior.extend(next_interior)
+        boundary = next_boundary
+
+    return [(cell, True) for cell in interior] + [(cell, False) for cell, _ in boundary]
+
+
+def rebuild_geofence_cells(geofence, precision=None):
+    """Replace the stored cells for one geofence."""
+    from .models import GeofenceCell
+
+    cells = rasterize_polygon(geofence.get_polygon_coordinates(), precision)
+    with transaction.atomic():
+        GeofenceCell.objects.filter(geofence=geofence).delete()
+        GeofenceCell.objects.bulk_create(
+            [GeofenceCell(geofence=geofence, cell=cell, is_interior=is_interior) for cell, is_interior in cells],
+            batch_size=1000
+        )
+    return len(cells)
+
+
+def bulk_create_geofence_cells(geofences, precision=None):
+    """Write cells for many newly created geofences in one batched insert."""
+    from .models import GeofenceCell
+
+    rows = [
+        GeofenceCell(geofence=geofence, cell=cell, is_interior=is_interior)
+        for geofence in geofences
+        for cell, is_interior in rasterize_polygon(geofence.get_polygon_coordinates(), precision)
+    ]
+    GeofenceCell.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def candidate_geofence_ids(points, precision=None, chunk_size=500):
+    """
+    Return ids of geofences with a cell covering any of the points.
+
+    Only these can contain a point; the rest need no polygon test at all.
+    Unlike a bounding box around all the points, this stays selective when
+    the points are spread out. One indexed query per ``chunk_size`` cells.
+
+    Args:
+        points: sequence of ``(lat, lng)`` pairs
+    """
+    from .models import GeofenceCell
+
+    precision = precision or get_cell_precision()
+    cells = set()
+    for lat, lng in points:
+        cells.update(geohash.prefixes(geohash.encode(lat, lng, precision)))
+    cells = sorted(cells)
+
+    ids = set()
+    for start in range(0, len(cells), chunk_size):
+        ids.update(
+            GeofenceCell.objects.filter(cell__in=cells[start:start + chunk_size])
+            .values_list('geofence_id', flat=True).distinct()
+        )
+    return ids
+
+
+def geofences_containing(lat, lng, organization_id=None, precision=None):
+    """
+    Return ids of active geofences containing the point using the cell table.
+
+    Args:
+        lat: latitude of the point
+        lng: longitude of the point
+        organization_id: restrict results to one organization
+    """
+    from .models import GeofenceCell
+
+    cell = geohash.encode(lat, lng, precision or get_cell_precision())
+    rows = GeofenceCell.objects.filter(cell__in=geohash.prefixes(cell), geofence__active=True)
+    if organization_id is not None:
+        rows = rows.filter(geofence__organization_id=organization_id)
+
+    result = []
+    for geofence_id, is_interior, polygon_json in rows.values_list(
+        'geofence_id', 'is_interior', 'geofence__polygon_json'
+    ):
+        if is_interior or point_in_polygon(lng, lat, extract_polygon_coordinates(polygon_json)):
+            result.append(geofence_id)
+    return result
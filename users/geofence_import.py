@@ -0,0 +1,392 @@
+"""
+Streaming GeoJSON FeatureCollection import for geofences.
+
+The file is read in fixed-size chunks and each feature is decoded on its own
+with ``json.JSONDecoder.raw_decode``, so memory use is bounded by the largest
+single feature rather than the whole collection; a value that grows past
+``GEOFENCE_IMPORT_MAX_FEATURE_CHARS`` (such as an unterminated one) is a
+parse error instead of a read to end of input. Every Polygon feature is
+validated and normalized (closed rings, RFC 7946 winding, no
+self-intersections) and checked for overlaps with the organization's active
+geofences and the ones imported before it, then written with chunked
+``bulk_create`` inside one transaction. Invalid features are skipped and
+reported individually.
+
+``bulk_create`` bypasses ``Geofence.save()`` and the model signals, so the
+import fills the geometry columns in memory before inserting, creates the
+cell rows for all imported fences in one pass, reports each chunk to the KPI
+counters and live boards (``report_bulk_create``) and invalidates the
+spatial index once after commit.
+"""
+import codecs
+import json
+import logging
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .geofence_cells import bulk_create_geofence_cells
+from .geofence_index import geofence_index
+from .geofence_overlap import OrganizationFences
+from .geometry import _ring_signed_area
+from .kpis import report_bulk_create
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+MAX_FEATURE_CHARS = 10 * 1024 * 1024
+
+BOOLEAN_STRINGS = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False}
+
+
+class GeofenceImportError(ValueError):
+    """Raised when the input cannot be parsed or a feature is invalid."""
+
+
+class _StrictImportAborted(Exception):
+    """Rolls back a strict import that hit invalid features."""
+
+
+class _JSONStream:
+    """Incremental reader handing out one JSON value at a time."""
+
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, stream, read_size=READ_SIZE, max_value_chars=None):
+        self.stream = stream
+        self.read_size = read_size
+        self.max_value_chars = max_value_chars or getattr(
+            settings, 'GEOFENCE_IMPORT_MAX_FEATURE_CHARS', MAX_FEATURE_CHARS
+        )
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read the next chunk; returns False at end of input."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.read_size)
+        if isinstance(chunk, bytes):
+            chunk = self.text_decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer only holds the value being decoded
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it, or ''."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise GeofenceImportError(f"Malformed GeoJSON: expected '{char}', found '{found or 'end of input'}'")
+        self.pos += 1
+
+    def _fill_value(self):
+        """Read more of an incomplete value; returns False at end of input."""
+        if len(self.buffer) - self.pos > self.max_value_chars:
+            raise GeofenceImportError(
+                f"Malformed GeoJSON: value is longer than {self.max_value_chars} characters or never ends"
+            )
+        return self._fill()
+
+    def value(self):
+        """Decode the next JSON value, reading more input until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill_value():
+                    continue
+                raise GeofenceImportError(f"Malformed GeoJSON: {e.msg}")
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill_value():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_features(stream, read_size=READ_SIZE, max_feature_chars=None):
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time.
+
+    Args:
+        stream: file-like object opened in text or binary mode
+        read_size: number of characters/bytes read per chunk
+        max_feature_chars: longest single value (feature or member) accepted
+    """
+    reader = _JSONStream(stream, read_size, max_feature_chars)
+    reader.expect('{')
+    found_features = False
+    while reader.peek() != '}':
+        key = reader.value()
+        if not isinstance(key, str):
+            raise GeofenceImportError("Malformed GeoJSON: object keys must be strings")
+        reader.expect(':')
+        if key == 'features':
+            found_features = True
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ',':
+                        reader.pos += 1
+                        continue
+                    reader.expect(']')
+                    break
+        else:
+            value = reader.value()
+            if key == 'type' and value != 'FeatureCollection':
+                raise GeofenceImportError(f"Expected a FeatureCollection, got '{value}'")
+        if reader.peek() == ',':
+            reader.pos += 1
+    reader.expect('}')
+    if not found_features:
+        raise GeofenceImportError("FeatureCollection has no 'features' array")
+
+
+def _normalize_position(position):
+    if not isinstance(position, (list, tuple)) or len(position) < 2:
+        raise GeofenceImportError("Positions must be [longitude, latitude] arrays")
+    lng, lat = position[0], position[1]
+    if isinstance(lng, bool) or isinstance(lat, bool) or not isinstance(lng, (int, float)) \
+            or not isinstance(lat, (int, float)):
+        raise GeofenceImportError("Coordinates must be numbers")
+    if not (math.isfinite(lng) and math.isfinite(lat)):
+        raise GeofenceImportError("Coordinates must be finite")
+    if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+        raise GeofenceImportError(f"Coordinate out of range: [{lng}, {lat}]")
+    return [float(lng), float(lat)]
+
+
+def ring_self_intersects(ring):
+    """
+    Return True if any two non-adjacent edges of a closed ring touch.
+
+    Each edge is tested against all later edges with vectorized orientation
+    tests, which keeps rings with thousands of vertices fast.
+    """
+    points = np.asarray(ring, dtype=np.float64)
+    starts = points[:-1]
+    ends = points[1:]
+    count = len(starts)
+    if count < 4:
+        return False
+
+    def orientation(ax, ay, bx, by, cx, cy):
+        return np.sign((bx - ax) * (cy - ay) - (by - ay) * (cx - ax))
+
+    for i in range(count - 2):
+        # Edges i-1 and i+1 share a vertex with edge i; the closing edge is adjacent to edge 0
+        last = count - 1 if i == 0 else count
+        other_start = starts[i + 2:last]
+        other_end = ends[i + 2:last]
+        if not len(other_start):
+            continue
+        ax, ay = starts[i]
+        bx, by = ends[i]
+        cx, cy = other_start[:, 0], other_start[:, 1]
+        dx, dy = other_end[:, 0], other_end[:, 1]
+        o1 = orientation(ax, ay, bx, by, cx, cy)
+        o2 = orientation(ax, ay, bx, by, dx, dy)
+        o3 = orientation(cx, cy, dx, dy, ax, ay)
+        o4 = orientation(cx, cy, dx, dy, bx, by)
+        crosses = (o1 * o2 <= 0) & (o3 * o4 <= 0)
+        # Collinear edges only touch if their extents overlap
+        collinear = (o1 == 0) & (o2 == 0)
+        overlaps = (
+            (np.minimum(cx, dx) <= max(ax, bx)) & (np.maximum(cx, dx) >= min(ax, bx))
+            & (np.minimum(cy, dy) <= max(ay, by)) & (np.maximum(cy, dy) >= min(ay, by))
+        )
+        if np.any(crosses & (~collinear | overlaps)):
+            return True
+    return False
+
+
+def normalize_ring(ring, exterior):
+    """
+    Validate a ring and return it closed, de-duplicated and correctly wound.
+
+    Exterior rings are counter-clockwise and holes clockwise (RFC 7946).
+    """
+    if not isinstance(ring, (list, tuple)):
+        raise GeofenceImportError("Rings must be arrays of positions")
+    normalized = []
+    for position in ring:
+        point = _normalize_position(position)
+        if not normalized or normalized[-1] != point:
+            normalized.append(point)
+    if normalized and normalized[0] != normalized[-1]:
+        normalized.append(list(normalized[0]))
+    if len(normalized) < 4:
+        raise GeofenceImportError("Rings need at least three distinct positions")
+
+    area = _ring_signed_area(normalized)
+    if area == 0:
+        raise GeofenceImportError("Ring has zero area")
+    if ring_self_intersects(normalized):
+        raise GeofenceImportError("Ring is self-intersecting")
+    if (area > 0) != exterior:
+        normalized.reverse()
+    return normalized
+
+
+def normalize_polygon(geometry):
+    """Validate a GeoJSON Polygon geometry and return normalized rings."""
+    if not isinstance(geometry, dict):
+        raise GeofenceImportError("Feature has no geometry")
+    if geometry.get('type') != 'Polygon':
+        raise GeofenceImportError(f"Unsupported geometry type '{geometry.get('type')}'; only Polygon is supported")
+    coordinates = geometry.get('coordinates')
+    if not isinstance(coordinates, list) or not coordinates:
+        raise GeofenceImportError("Polygon has no rings")
+    return [normalize_ring(ring, exterior=index == 0) for index, ring in enumerate(coordinates)]
+
+
+def _parse_active(value):
+    """Read ``properties.active``: a JSON boolean or one of ``BOOLEAN_STRINGS``."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in BOOLEAN_STRINGS:
+        return BOOLEAN_STRINGS[value.strip().lower()]
+    raise GeofenceImportError(f"properties.active must be true or false, got {json.dumps(value)}")
+
+
+def build_geofence(feature, organization, created_by=None):
+    """Build an unsaved ``Geofence`` with its geometry columns filled in."""
+    from .models import Geofence
+
+    if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+        raise GeofenceImportError("Expected a GeoJSON Feature")
+    properties = feature.get('properties')
+    if properties is None:
+        properties = {}
+    elif not isinstance(properties, dict):
+        raise GeofenceImportError("Feature properties must be an object")
+    name = str(properties.get('name') or '').strip()
+    if not name:
+        raise GeofenceImportError("Feature is missing properties.name")
+    max_length = Geofence._meta.get_field('name').max_length
+    if len(name) > max_length:
+        raise GeofenceImportError(f"Name is longer than {max_length} characters")
+    active = _parse_active(properties['active']) if 'active' in properties else True
+
+    geofence = Geofence(
+        name=name,
+        description=properties.get('description') or None,
+        polygon_json={'type': 'Polygon', 'coordinates': normalize_polygon(feature.get('geometry'))},
+        organization=organization,
+        active=active,
+        created_by=created_by,
+    )
+    geofence.update_geometry()
+    return geofence
+
+
+def _feature_name(feature):
+    properties = feature.get('properties') if isinstance(feature, dict) else None
+    return properties.get('name') if isinstance(properties, dict) else None
+
+
+def import_geofences(stream, organization, created_by=None, chunk_size=None, strict=False, allow_overlap=False):
+    """
+    Import every Polygon feature of a FeatureCollection into one organization.
+
+    Args:
+        stream: file-like object holding the FeatureCollection
+        organization: ``Organization`` the geofences belong to
+        created_by: user recorded as creator
+        chunk_size: rows per ``bulk_create`` call
+        strict: write nothing if any feature is invalid
+        allow_overlap: import active geofences that overlap another active
+            geofence of the organization (existing or imported); otherwise
+            they are reported as invalid, like the create endpoint rejects them
+
+    Returns:
+        dict with ``total``, ``created``, ``failed``, ``geofence_ids`` and
+        ``errors`` (``[{'index', 'name', 'error'}]``)
+
+    Raises:
+        GeofenceImportError: if the input is not a readable FeatureCollection
+    """
+    from .models import Geofence
+
+    chunk_size = chunk_size or getattr(settings, 'GEOFENCE_IMPORT_CHUNK_SIZE', 500)
+    total = 0
+    errors = []
+    created = []
+    pending = []
+
+    def flush():
+        inserted = Geofence.objects.bulk_create(pending, batch_size=chunk_size)
+        # Counters and live boards, which bulk_create's missing signals would skip
+        report_bulk_create(Geofence, inserted)
+        created.extend(inserted)
+        pending.clear()
+
+    try:
+        with transaction.atomic():
+            fences = None if allow_overlap else OrganizationFences(organization.id)
+            for index, feature in enumerate(iter_features(stream)):
+                total += 1
+                try:
+                    geofence = build_geofence(feature, organization, created_by)
+                except GeofenceImportError as e:
+                    errors.append({'index': index, 'name': _feature_name(feature), 'error': str(e)})
+                    continue
+                if fences is not None and geofence.active:
+                    coordinates = geofence.get_polygon_coordinates()
+                    conflicts = fences.overlapping(coordinates)
+                    if conflicts:
+                        error = f"Geofence overlaps {', '.join(conflicts)}. Set allow_overlap to import it anyway."
+                        errors.append({'index': index, 'name': geofence.name, 'error': error})
+                        continue
+                    fences.add(f"{geofence.name} (feature {index})", coordinates)
+                if strict and errors:
+                    # Keep validating to report every error, but stop writing
+                    continue
+                pending.append(geofence)
+                if len(pending) >= chunk_size:
+                    flush()
+
+            if strict and errors:
+                raise _StrictImportAborted()
+            if pending:
+                flush()
+
+            if created:
+                bulk_create_geofence_cells(created)
+                transaction.on_commit(geofence_index.invalidate)
+    except _StrictImportAborted:
+        created = []
+
+    logger.info(
+        f"Imported {len(created)} of {total} geofences for organization {organization.id} "
+        f"({len(errors)} invalid)"
+    )
+    return {
+        'total': total,
+        'created': len(created),
+        'failed': len(errors),
+        'geofence_ids': [geofence.id for geofence in created],
+        'errors': errors,
+    }
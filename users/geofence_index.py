@@ -0,0 +1,145 @@
+"""
+Per-process spatial index for point-in-geofence lookups.
+
+Active geofences are bucketed into a uniform lat/lng grid by their bounding
+box. A lookup only visits the geofences registered in the point's cell, does a
+cheap bbox check and then the exact ray-casting test from ``users.geometry``.
+
+The index is built lazily from the database on first use and invalidated by
+the ``post_save``/``post_delete`` handlers in ``users.signals``. Other worker
+processes pick up changes after ``GEOFENCE_INDEX_TTL_SECONDS``.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from .geometry import extract_polygon_coordinates, point_in_polygon, polygon_bbox
+
+logger = logging.getLogger(__name__)
+
+
+class GeofenceSpatialIndex:
+    """Uniform grid over geofence bounding boxes with exact polygon refinement."""
+
+    def __init__(self, cell_size=None, max_cells_per_geofence=None, ttl_seconds=None):
+        self.cell_size = cell_size or getattr(settings, 'GEOFENCE_INDEX_CELL_SIZE', 0.01)
+        self.max_cells_per_geofence = max_cells_per_geofence or getattr(
+            settings, 'GEOFENCE_INDEX_MAX_CELLS', 4096
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else getattr(
+            settings, 'GEOFENCE_INDEX_TTL_SECONDS', 300
+        )
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._grid = {}
+        self._oversized = []
+        self._built_at = None
+
+    def _cell(self, lng, lat):
+        return math.floor(lng / self.cell_size), math.floor(lat / self.cell_size)
+
+    def _is_stale(self):
+        if self._built_at is None:
+            return True
+        if self.ttl_seconds and time.monotonic() - self._built_at > self.ttl_seconds:
+            return True
+        return False
+
+    def _load_rows(self):
+        from .models import Geofence
+
+        rows = Geofence.objects.filter(active=True).values_list('id', 'organization_id', 'polygon_json')
+        for geofence_id, organization_id, polygon_json in rows.iterator():
+            yield geofence_id, organization_id, extract_polygon_coordinates(polygon_json)
+
+    def build(self, rows):
+        """
+        Replace the index contents.
+
+        Args:
+            rows: iterable of ``(geofence_id, organization_id, coordinates)``
+        """
+        entries = {}
+        grid = {}
+        oversized = []
+
+        for geofence_id, organization_id, coordinates in rows:
+            bbox = polygon_bbox(coordinates)
+            if bbox is None:
+                continue
+            entries[geofence_id] = (organization_id, bbox, coordinates)
+
+            min_x, min_y = self._cell(bbox[0], bbox[1])
+            max_x, max_y = self._cell(bbox[2], bbox[3])
+            if (max_x - min_x + 1) * (max_y - min_y + 1) > self.max_cells_per_geofence:
+                # Huge fences would flood the grid; check them by bbox instead
+                oversized.append(geofence_id)
+                continue
+            for cx in range(min_x, max_x + 1):
+                for cy in range(min_y, max_y + 1):
+                    grid.setdefault((cx, cy), []).append(geofence_id)
+
+        with self._lock:
+            self._entries = entries
+            self._grid = grid
+            self._oversized = oversized
+            self._built_at = time.monotonic()
+
+        logger.info(f"Geofence spatial index built with {len(entries)} geofences in {len(grid)} cells")
+
+    def rebuild(self):
+        """Rebuild the index from active geofences in the database."""
+        self.build(self._load_rows())
+
+    def invalidate(self):
+        """Drop the index so the next lookup rebuilds it."""
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_built(self):
+        if self._is_stale():
+            self.rebuild()
+
+    def containing(self, lat, lng, organization_id=None):
+        """
+        Return ids of active geofences that contain the point.
+
+        Args:
+            lat: latitude of the point
+            lng: longitude of the point
+            organization_id: restrict results to one organization
+        """
+        self._ensure_built()
+        entries = self._entries
+        candidates = list(self._grid.get(self._cell(lng, lat), ()))
+        candidates.extend(self._oversized)
+
+        result = []
+        for geofence_id in candidates:
+            entry = entries.get(geofence_id)
+            if entry is None:
+                continue
+            entry_org, bbox, coordinates = entry
+            if organization_id is not None and entry_org != organization_id:
+                continue
+            if not (bbox[0] <= lng <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+                continue
+            if point_in_polygon(lng, lat, coordinates):
+                result.append(geofence_id)
+        return result
+
+    def polygon(self, geofence_id):
+        """Return the indexed coordinates of an active geofence, or None."""
+        self._ensure_built()
+        entry = self._entries.get(geofence_id)
+        return entry[2] if entry else None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Global spatial index instance
+geofence_index = GeofenceSpatialIndex()
@@ -0,0 +1,363 @@
+"""
+Overlap detection between geofences of the same organization.
+
+Candidate pairs come from a sweep over bounding boxes: fences are sorted by
+their west edge and only fences whose boxes are still "open" on the
+longitude axis are compared on latitude. Only surviving pairs get the exact
+polygon test, so an organization with thousands of mostly disjoint fences
+costs ``O(n log n + k)`` rather than ``O(n^2)`` polygon intersections.
+
+Fences that merely share a boundary are not reported as overlapping; the
+interior of one must reach at least ``GEOFENCE_OVERLAP_TOLERANCE_METERS``
+into the other.
+"""
+import heapq
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .geofence_batch import containment_matrix
+from .geometry import EARTH_RADIUS_M, extract_polygon_coordinates, point_in_polygon, polygon_bbox, polygon_centroid
+
+
+def get_overlap_tolerance():
+    return getattr(settings, 'GEOFENCE_OVERLAP_TOLERANCE_METERS', 1.0)
+
+
+def bboxes_intersect(a, b):
+    """True if two ``(min_lng, min_lat, max_lng, max_lat)`` boxes overlap."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _edges(coordinates, bbox=None):
+    """Edges of every ring as ``(x1, y1, x2, y2)`` rows, limited to those touching ``bbox`` if given."""
+    segments = []
+    for ring in coordinates:
+        if len(ring) < 2:
+            continue
+        points = np.asarray([coord[:2] for coord in ring], dtype=np.float64)
+        segments.append(np.hstack([points[:-1], points[1:]]))
+    if not segments:
+        return np.empty((0, 4))
+    edges = np.vstack(segments)
+    if bbox is None:
+        return edges
+    keep = (
+        (np.minimum(edges[:, 0], edges[:, 2]) <= bbox[2]) & (np.maximum(edges[:, 0], edges[:, 2]) >= bbox[0])
+        & (np.minimum(edges[:, 1], edges[:, 3]) <= bbox[3]) & (np.maximum(edges[:, 1], edges[:, 3]) >= bbox[1])
+    )
+    return edges[keep]
+
+
+def _edges_cross(edges_a, edges_b, chunk_size=2048):
+    """True if any edge of ``edges_a`` properly crosses an edge of ``edges_b``."""
+    if not len(edges_a) or not len(edges_b):
+        return False
+    bx1, by1, bx2, by2 = (edges_b[:, i] for i in range(4))
+    for start in range(0, len(edges_a), chunk_size):
+        chunk = edges_a[start:start + chunk_size]
+        ax1, ay1, ax2, ay2 = (chunk[:, i, None] for i in range(4))
+        o1 = np.sign((ax2 - ax1) * (by1 - ay1) - (ay2 - ay1) * (bx1 - ax1))
+        o2 = np.sign((ax2 - ax1) * (by2 - ay1) - (ay2 - ay1) * (bx2 - ax1))
+        o3 = np.sign((bx2 - bx1) * (ay1 - by1) - (by2 - by1) * (ax1 - bx1))
+        o4 = np.sign((bx2 - bx1) * (ay2 - by1) - (by2 - by1) * (ax2 - bx1))
+        # Strict crossings only; touching and collinear contacts are settled by the probes
+        if np.any((o1 * o2 < 0) & (o3 * o4 < 0)):
+            return True
+    return False
+
+
+def _contact_midpoints(edges, other_edges, chunk_size=2048):
+    """
+    Midpoints of the pieces ``edges`` are cut into wherever ``other_edges``
+    touch, cross or run along them, with the index of the edge each lies on.
+
+    Between two consecutive contacts an edge lies entirely inside, outside
+    or on the boundary of the other polygon, so these midpoints sample every
+    stretch of boundary that could bound a shared area.
+    """
+    if not len(edges):
+        return np.empty((0, 2)), np.empty(0, dtype=np.intp)
+    cuts = {}
+    if len(other_edges):
+        bx1, by1, bx2, by2 = (other_edges[:, i] for i in range(4))
+        sx = bx2 - bx1
+        sy = by2 - by1
+        for start in range(0, len(edges), chunk_size):
+            chunk = edges[start:start + chunk_size]
+            ax1, ay1, ax2, ay2 = (chunk[:, i, None] for i in range(4))
+            rx = ax2 - ax1
+            ry = ay2 - ay1
+            qx = bx1 - ax1
+            qy = by1 - ay1
+            rr = rx * rx + ry * ry
+            denom = rx * sy - ry * sx
+            parallel = np.abs(denom) <= 1e-12 * np.sqrt(rr * (sx * sx + sy * sy))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (qx * sy - qy * sx) / denom
+                u = (qx * ry - qy * rx) / denom
+                # Collinear edges: where the other edge's endpoints fall along this one
+                collinear = parallel & (np.abs(qx * ry - qy * rx) <= 1e-12 * rr)
+                t_start = (qx * rx + qy * ry) / rr
+                t_end = ((bx2 - ax1) * rx + (by2 - ay1) * ry) / rr
+            crossing = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+            for mask, values in ((crossing, t), (collinear, t_start), (collinear, t_end)):
+                rows, columns = np.nonzero(mask & (values > 0) & (values < 1))
+                for row, value in zip(rows, values[rows, columns]):
+                    cuts.setdefault(start + row, set()).add(float(value))
+
+    points = []
+    indexes = []
+    for index, (x1, y1, x2, y2) in enumerate(edges):
+        stops = [0.0] + sorted(cuts.get(index, ())) + [1.0]
+        for t0, t1 in zip(stops, stops[1:]):
+            t = (t0 + t1) / 2
+            points.append((x1 + t * (x2 - x1), y1 + t * (y2 - y1)))
+            indexes.append(index)
+    return np.asarray(points), np.asarray(indexes, dtype=np.intp)
+
+
+def _inward_offsets(points, edges, coordinates, offset_m):
+    """Points ``offset_m`` to either side of their edge that fall inside the polygon."""
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+    scale_x = scale_y * np.cos(np.radians(points[:, 1]))
+    dx = (edges[:, 2] - edges[:, 0]) * scale_x
+    dy = (edges[:, 3] - edges[:, 1]) * scale_y
+    length = np.hypot(dx, dy)
+    valid = length > 0
+    points, dx, dy, length, scale_x = points[valid], dx[valid], dy[valid], length[valid], scale_x[valid]
+    shift = np.column_stack([-dy / length * offset_m / scale_x, dx / length * offset_m / scale_y])
+    candidates = np.vstack([points + shift, points - shift])
+    if not len(candidates):
+        return candidates
+    return candidates[containment_matrix(candidates[:, ::-1], [coordinates])[:, 0]]
+
+
+def _boundary_distance_m(points, edges, chunk_size=2048):
+    """Distance in meters from each ``[lng, lat]`` point to the nearest edge, projected around the point."""
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+    best = np.full(len(points), np.inf)
+    for start in range(0, len(edges), chunk_size):
+        chunk = edges[start:start + chunk_size]
+        scale_x = scale_y * np.cos(np.radians(points[:, 1]))[:, None]
+        x1 = (chunk[:, 0] - points[:, 0, None]) * scale_x
+        y1 = (chunk[:, 1] - points[:, 1, None]) * scale_y
+        dx = (chunk[:, 2] - chunk[:, 0]) * scale_x
+        dy = (chunk[:, 3] - chunk[:, 1]) * scale_y
+        length_sq = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length_sq > 0, -(x1 * dx + y1 * dy) / length_sq, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        best = np.minimum(best, np.hypot(x1 + t * dx, y1 + t * dy).min(axis=1))
+    return best
+
+
+def _any_strictly_inside(points, coordinates, edges, tolerance_m):
+    """True if any ``[lng, lat]`` point is inside the polygon and farther than ``tolerance_m`` from its edges."""
+    if not len(points) or not len(edges):
+        return False
+    inside = points[containment_matrix(points[:, ::-1], [coordinates])[:, 0]]
+    return bool(len(inside)) and bool(np.any(_boundary_distance_m(inside, edges) > tolerance_m))
+
+
+def _reaches_into(inner, outer, shared, tolerance_m):
+    """
+    True if the interior of ``inner`` reaches more than ``tolerance_m`` into ``outer``.
+
+    Probes are the vertices and centroid of ``inner``, the midpoints of its
+    edge pieces between contacts with ``outer`` (see ``_contact_midpoints``),
+    and points just inside ``inner`` next to those midpoints, which catch
+    boundaries that coincide with ``outer``'s.
+    """
+    outer_edges = _edges(outer)
+    probes = [np.asarray([coord[:2] for ring in inner[:1] for coord in ring], dtype=np.float64).reshape(-1, 2)]
+    centroid = polygon_centroid(inner)
+    if centroid and point_in_polygon(centroid[0], centroid[1], inner):
+        probes.append(np.asarray([centroid], dtype=np.float64))
+    if _any_strictly_inside(np.vstack(probes), outer, outer_edges, tolerance_m):
+        return True
+
+    inner_edges = _edges(inner, shared)
+    midpoints, indexes = _contact_midpoints(inner_edges, _edges(outer, shared))
+    if _any_strictly_inside(midpoints, outer, outer_edges, tolerance_m):
+        return True
+    offset_m = max(2 * tolerance_m, 0.1)
+    offsets = _inward_offsets(midpoints, inner_edges[indexes], inner, offset_m) if len(midpoints) else midpoints
+    return _any_strictly_inside(offsets, outer, outer_edges, tolerance_m)
+
+
+def polygons_overlap(a, b, bbox_a=None, bbox_b=None, tolerance_m=None):
+    """
+    Exact test for two polygons sharing interior area.
+
+    Args:
+        a, b: polygon rings in GeoJSON ``[lng, lat]`` order
+        bbox_a, bbox_b: precomputed bounding boxes, if available
+        tolerance_m: how far one interior must reach into the other
+    """
+    bbox_a = bbox_a or polygon_bbox(a)
+    bbox_b = bbox_b or polygon_bbox(b)
+    if bbox_a is None or bbox_b is None or not bboxes_intersect(bbox_a, bbox_b):
+        return False
+    tolerance_m = get_overlap_tolerance() if tolerance_m is None else tolerance_m
+
+    shared = (
+        max(bbox_a[0], bbox_b[0]), max(bbox_a[1], bbox_b[1]),
+        min(bbox_a[2], bbox_b[2]), min(bbox_a[3], bbox_b[3]),
+    )
+    if _edges_cross(_edges(a, shared), _edges(b, shared)):
+        return True
+    return _reaches_into(a, b, shared, tolerance_m) or _reaches_into(b, a, shared, tolerance_m)
+
+
+def candidate_pairs(items):
+    """
+    Yield index pairs whose bounding boxes intersect.
+
+    Args:
+        items: sequence of ``(min_lng, min_lat, max_lng, max_lat)`` boxes
+    """
+    order = sorted(range(len(items)), key=lambda index: items[index][0])
+    # Heap of (max_lng, index) for boxes still open at the sweep position
+    active = []
+    for index in order:
+        bbox = items[index]
+        while active and active[0][0] < bbox[0]:
+            heapq.heappop(active)
+        for _, other in active:
+            other_bbox = items[other]
+            if other_bbox[1] <= bbox[3] and bbox[1] <= other_bbox[3]:
+                yield (other, index) if other < index else (index, other)
+        heapq.heappush(active, (bbox[2], index))
+
+
+def find_overlaps(fences, tolerance_m=None):
+    """
+    Return overlapping pairs among a set of fences.
+
+    Args:
+        fences: iterable of ``(key, coordinates, bbox)``; ``bbox`` may be None
+        tolerance_m: see ``polygons_overlap``
+
+    Returns:
+        sorted list of ``(key_a, key_b)`` pairs
+    """
+    entries = []
+    for key, coordinates, bbox in fences:
+        bbox = bbox or polygon_bbox(coordinates)
+        if bbox is not None:
+            entries.append((key, coordinates, bbox))
+
+    overlaps = []
+    for i, j in candidate_pairs([entry[2] for entry in entries]):
+        key_a, coords_a, bbox_a = entries[i]
+        key_b, coords_b, bbox_b = entries[j]
+        if polygons_overlap(coords_a, coords_b, bbox_a, bbox_b, tolerance_m):
+            overlaps.append((key_a, key_b))
+    overlaps.sort()
+    return overlaps
+
+
+def overlapping_geofences(coordinates, organization_id, exclude_id=None, tolerance_m=None):
+    """
+    Return active geofences of an organization that overlap a polygon.
+
+    Candidates come from the stored bounding box columns; rows that predate
+    them are always tested exactly.
+    """
+    from .models import Geofence
+
+    bbox = polygon_bbox(coordinates)
+    if bbox is None:
+        return []
+    queryset = Geofence.objects.filter(organization_id=organization_id, active=True)
+    queryset = (
+        queryset.intersecting_bbox(bbox[1], bbox[0], bbox[3], bbox[2])
+        | queryset.filter(bbox_min_lat__isnull=True)
+    )
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+
+    queryset = queryset.select_related(None).only('id', 'name', 'polygon_json').order_by('id')
+    return [
+        geofence for geofence in queryset
+        if polygons_overlap(coordinates, geofence.get_polygon_coordinates(), bbox, None, tolerance_m)
+    ]
+
+
+class OrganizationFences:
+    """
+    An organization's active fences, for checking many new fences in turn
+    (an import): loaded with one query, and each accepted fence is added so
+    the ones after it are checked against it as well.
+    """
+
+    def __init__(self, organization_id, tolerance_m=None):
+        from .models import Geofence
+
+        self.tolerance_m = tolerance_m
+        # (label, coordinates, bbox)
+        self._fences = []
+        self._bboxes = None
+        rows = Geofence.objects.filter(organization_id=organization_id, active=True).values_list(
+            'id', 'name', 'polygon_json', 'bbox_min_lng', 'bbox_min_lat', 'bbox_max_lng', 'bbox_max_lat',
+        ).order_by('id')
+        for geofence_id, name, polygon_json, *bbox in rows.iterator():
+            self.add(
+                f"{name} (#{geofence_id})",
+                extract_polygon_coordinates(polygon_json),
+                tuple(bbox) if bbox[0] is not None else None,
+            )
+
+    def add(self, label, coordinates, bbox=None):
+        bbox = bbox or polygon_bbox(coordinates)
+        if bbox is not None:
+            self._fences.append((label, coordinates, bbox))
+            self._bboxes = None
+
+    def overlapping(self, coordinates, bbox=None):
+        """Labels of the fences a polygon overlaps."""
+        bbox = bbox or polygon_bbox(coordinates)
+        if bbox is None or not self._fences:
+            return []
+        if self._bboxes is None:
+            self._bboxes = np.asarray([fence[2] for fence in self._fences], dtype=np.float64)
+        boxes = self._bboxes
+        candidates = np.nonzero(
+            (boxes[:, 0] <= bbox[2]) & (bbox[0] <= boxes[:, 2]) & (boxes[:, 1] <= bbox[3]) & (bbox[1] <= boxes[:, 3])
+        )[0]
+        return [
+            self._fences[index][0] for index in candidates
+            if polygons_overlap(coordinates, self._fences[index][1], bbox, self._fences[index][2], self.tolerance_m)
+        ]
+
+
+def organization_overlap_report(queryset, tolerance_m=None):
+    """
+    Find every overlapping pair in a geofence queryset, per organization.
+
+    Returns:
+        list of ``{'organization', 'geofences': [{'id', 'name'}, {'id', 'name'}]}``
+    """
+    rows = queryset.select_related(None).values_list(
+        'id', 'name', 'organization_id', 'polygon_json',
+        'bbox_min_lng', 'bbox_min_lat', 'bbox_max_lng', 'bbox_max_lat',
+    ).order_by('organization_id', 'id')
+
+    by_organization = {}
+    names = {}
+    for geofence_id, name, organization_id, polygon_json, *bbox in rows.iterator():
+        names[geofence_id] = name
+        by_organization.setdefault(organization_id, []).append(
+            (geofence_id, extract_polygon_coordinates(polygon_json), tuple(bbox) if bbox[0] is not None else None)
+        )
+
+    report = []
+    for organization_id, fences in by_organization.items():
+        for id_a, id_b in find_overlaps(fences, tolerance_m):
+            report.append({
+                'organization': organization_id,
+                'geofences': [{'id': id_a, 'name': names[id_a]}, {'id': id_b, 'name': names[id_b]}],
+            })
+    return report
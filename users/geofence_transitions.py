@@ -0,0 +1,172 @@
+"""
+Streaming geofence enter/exit detection.
+
+Each user's last confirmed containment set is kept in memory and diffed
+against every new location fix. Candidate geofences come from the spatial
+index, so a fix never scans every polygon. Two knobs suppress GPS jitter:
+
+- hysteresis: a fix closer than ``GEOFENCE_TRANSITION_HYSTERESIS_METERS`` to
+  the boundary never starts or confirms a transition
+- dwell: the new side of the boundary must be observed for
+  ``GEOFENCE_TRANSITION_DWELL_SECONDS`` before the transition is confirmed
+
+Confirmed transitions are written as GEOFENCE_ENTER/GEOFENCE_EXIT ``Alert``
+rows with a single ``bulk_create`` per batch of fixes. The first fix seen for
+a user only establishes a baseline so that restarts do not emit a burst of
+spurious ENTER alerts.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .geometry import distance_to_polygon_boundary_m
+from .geofence_index import geofence_index
+from .kpis import report_bulk_create
+
+logger = logging.getLogger(__name__)
+
+
+class UserGeofenceState:
+    """Confirmed containment set and pending transitions for one user."""
+
+    __slots__ = ('inside', 'pending')
+
+    def __init__(self, inside):
+        self.inside = set(inside)
+        # geofence_id -> timestamp the opposite side was first observed
+        self.pending = {}
+
+
+class GeofenceTransitionDetector:
+    """Diffs location fixes against per-user containment state."""
+
+    def __init__(self, index=None, hysteresis_meters=None, dwell_seconds=None, max_users=None):
+        self.index = index or geofence_index
+        self.hysteresis_meters = hysteresis_meters if hysteresis_meters is not None else getattr(
+            settings, 'GEOFENCE_TRANSITION_HYSTERESIS_METERS', 15
+        )
+        self.dwell_seconds = dwell_seconds if dwell_seconds is not None else getattr(
+            settings, 'GEOFENCE_TRANSITION_DWELL_SECONDS', 30
+        )
+        self.max_users = max_users or getattr(settings, 'GEOFENCE_TRANSITION_MAX_USERS', 100000)
+        self._lock = threading.Lock()
+        self._states = OrderedDict()
+
+    def reset(self, user_id=None):
+        """Forget state for one user, or for everyone."""
+        with self._lock:
+            if user_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(user_id, None)
+
+    def current_geofences(self, user_id):
+        """Return the confirmed containment set for a user."""
+        state = self._states.get(user_id)
+        return set(state.inside) if state else set()
+
+    def _detect(self, user_id, organization_id, lat, lng, timestamp):
+        """Update state for one fix and return ``[(geofence_id, alert_type)]``."""
+        observed_inside = set(self.index.containing(lat, lng, organization_id=organization_id))
+
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None:
+                self._states[user_id] = UserGeofenceState(observed_inside)
+                if len(self._states) > self.max_users:
+                    self._states.popitem(last=False)
+                return []
+            self._states.move_to_end(user_id)
+
+            transitions = []
+            for geofence_id in observed_inside | state.inside | set(state.pending):
+                currently_inside = geofence_id in state.inside
+                now_inside = geofence_id in observed_inside
+                if now_inside == currently_inside:
+                    state.pending.pop(geofence_id, None)
+                    continue
+
+                coordinates = self.index.polygon(geofence_id)
+                if coordinates is None:
+                    # Geofence was deactivated or deleted; drop it silently
+                    state.inside.discard(geofence_id)
+                    state.pending.pop(geofence_id, None)
+                    continue
+
+                if self.hysteresis_meters and distance_to_polygon_boundary_m(
+                    lng, lat, coordinates
+                ) < self.hysteresis_meters:
+                    continue
+
+                since = state.pending.setdefault(geofence_id, timestamp)
+                if (timestamp - since).total_seconds() < self.dwell_seconds:
+                    continue
+
+                state.pending.pop(geofence_id)
+                if now_inside:
+                    state.inside.add(geofence_id)
+                    transitions.append((geofence_id, 'GEOFENCE_ENTER'))
+                else:
+                    state.inside.discard(geofence_id)
+                    transitions.append((geofence_id, 'GEOFENCE_EXIT'))
+            return transitions
+
+    def process_fixes(self, fixes):
+        """
+        Feed a batch of location fixes and write alerts for confirmed transitions.
+
+        Args:
+            fixes: iterable of ``(user, lat, lng, timestamp)``; timestamp may be None
+
+        Returns:
+            list of created ``Alert`` instances
+        """
+        from .models import Alert, Geofence
+
+        detected = []
+        for user, lat, lng, timestamp in fixes:
+            timestamp = timestamp or timezone.now()
+            for geofence_id, alert_type in self._detect(
+                user.id, getattr(user, 'organization_id', None), lat, lng, timestamp
+            ):
+                detected.append((user, geofence_id, alert_type, lat, lng, timestamp))
+
+        if not detected:
+            return []
+
+        # The organization lets the KPI counters place the alerts without a query each
+        geofences = Geofence.objects.only('id', 'name', 'organization_id').in_bulk({item[1] for item in detected})
+        alerts = []
+        for user, geofence_id, alert_type, lat, lng, timestamp in detected:
+            geofence = geofences.get(geofence_id)
+            if geofence is None:
+                continue
+            verb = 'entered' if alert_type == 'GEOFENCE_ENTER' else 'exited'
+            alerts.append(Alert(
+                geofence=geofence,
+                user=user,
+                alert_type=alert_type,
+                severity='LOW',
+                title=f"{user.username} {verb} {geofence.name}",
+                metadata={
+                    'latitude': lat,
+                    'longitude': lng,
+                    'observed_at': timestamp.isoformat(),
+                }
+            ))
+
+        created = Alert.objects.bulk_create(alerts)
+        report_bulk_create(Alert, created)
+        logger.info(f"Created {len(created)} geofence transition alerts")
+        return created
+
+    def process_fix(self, user, lat, lng, timestamp=None):
+        """Feed a single location fix; see ``process_fixes``."""
+        return self.process_fixes([(user, lat, lng, timestamp)])
+
+
+# Global transition detector instance
+geofence_transition_detector = GeofenceTransitionDetector()
@@ -0,0 +1,294 @@
+"""
+Planar geometry helpers for geofence polygons.
+
+Coordinates follow GeoJSON order, i.e. ``[longitude, latitude]``. A polygon
+is a list of rings where the first ring is the outer boundary and any
+following rings are holes.
+"""
+import json
+import math
+
+
+def extract_polygon_coordinates(polygon_json):
+    """Extract polygon rings from a GeoJSON Polygon or Feature."""
+    try:
+        if isinstance(polygon_json, dict):
+            if polygon_json.get('type') == 'Polygon':
+                return polygon_json.get('coordinates', [])
+            elif polygon_json.get('type') == 'Feature':
+                geometry = polygon_json.get('geometry', {})
+                if geometry.get('type') == 'Polygon':
+                    return geometry.get('coordinates', [])
+        return []
+    except (json.JSONDecodeError, AttributeError):
+        return []
+
+
+def ring_bbox(ring):
+    """Return ``(min_lng, min_lat, max_lng, max_lat)`` for a ring."""
+    lngs = [coord[0] for coord in ring]
+    lats = [coord[1] for coord in ring]
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+
+def polygon_bbox(coordinates):
+    """Return the bounding box of a polygon, or None if it has no outer ring."""
+    if not coordinates or not coordinates[0]:
+        return None
+    return ring_bbox(coordinates[0])
+
+
+def point_in_ring(lng, lat, ring):
+    """
+    Ray-casting test for a single ring.
+
+    Points exactly on an edge may fall either side; geofences are not
+    precise enough for that to matter.
+    """
+    inside = False
+    count = len(ring)
+    if count < 3:
+        return False
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for coord in ring:
+        x2, y2 = coord[0], coord[1]
+        if (y2 > lat) != (y1 > lat):
+            x_cross = x2 + (lat - y2) * (x1 - x2) / (y1 - y2)
+            if lng < x_cross:
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def point_in_polygon(lng, lat, coordinates):
+    """Return True if the point is inside the outer ring and outside every hole."""
+    if not coordinates or not coordinates[0]:
+        return False
+    if not point_in_ring(lng, lat, coordinates[0]):
+        return False
+    for hole in coordinates[1:]:
+        if point_in_ring(lng, lat, hole):
+            return False
+    return True
+
+
+# Mean Earth radius in meters, matching security.distance.EARTH_RADIUS_KM
+EARTH_RADIUS_M = 6371000.0
+
+
+def _ring_signed_area(ring):
+    """Shoelace signed area in coordinate units (positive for counter-clockwise rings)."""
+    area = 0.0
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for coord in ring:
+        x2, y2 = coord[0], coord[1]
+        area += x1 * y2 - x2 * y1
+        x1, y1 = x2, y2
+    return area / 2.0
+
+
+def ring_vertex_count(ring):
+    """Number of distinct vertices in a ring, ignoring the GeoJSON closing point."""
+    if len(ring) > 1 and list(ring[0][:2]) == list(ring[-1][:2]):
+        return len(ring) - 1
+    return len(ring)
+
+
+def polygon_vertex_count(coordinates):
+    """Total number of vertices across all rings of a polygon."""
+    return sum(ring_vertex_count(ring) for ring in coordinates or [])
+
+
+def polygon_centroid(coordinates):
+    """
+    Area-weighted centroid of the outer ring as ``[lng, lat]``.
+
+    Falls back to the vertex mean for degenerate (zero-area) rings.
+    """
+    if not coordinates or not coordinates[0]:
+        return None
+    ring = coordinates[0]
+    area = _ring_signed_area(ring)
+    if abs(area) < 1e-18:
+        points = ring[:ring_vertex_count(ring)] or ring
+        return [
+            sum(coord[0] for coord in points) / len(points),
+            sum(coord[1] for coord in points) / len(points),
+        ]
+
+    cx = cy = 0.0
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for coord in ring:
+        x2, y2 = coord[0], coord[1]
+        cross = x1 * y2 - x2 * y1
+        cx += (x1 + x2) * cross
+        cy += (y1 + y2) * cross
+        x1, y1 = x2, y2
+    return [cx / (6.0 * area), cy / (6.0 * area)]
+
+
+def polygon_area_sq_m(coordinates):
+    """
+    Approximate polygon area in square meters, holes excluded.
+
+    Uses an equirectangular projection around the polygon's mean latitude,
+    which is accurate to well under 1% for campus- and city-sized fences.
+    """
+    if not coordinates or not coordinates[0]:
+        return 0.0
+    outer = coordinates[0]
+    mean_lat = sum(coord[1] for coord in outer) / len(outer)
+    scale_x = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(mean_lat))
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+
+    area = abs(_ring_signed_area(outer))
+    for hole in coordinates[1:]:
+        if hole:
+            area -= abs(_ring_signed_area(hole))
+    return max(area, 0.0) * scale_x * scale_y
+
+
+def polygon_geometry_summary(coordinates):
+    """
+    Precomputed geometry for a polygon.
+
+    Returns a dict with ``bbox``, ``centroid``, ``area_sq_m`` and
+    ``vertex_count``; ``bbox`` and ``centroid`` are None for empty polygons.
+    """
+    return {
+        'bbox': polygon_bbox(coordinates),
+        'centroid': polygon_centroid(coordinates),
+        'area_sq_m': polygon_area_sq_m(coordinates),
+        'vertex_count': polygon_vertex_count(coordinates),
+    }
+
+
+def distance_to_polygon_boundary_m(lng, lat, coordinates):
+    """
+    Shortest distance in meters from a point to any ring edge of a polygon.
+
+    Uses a local equirectangular projection centered on the point, which is
+    accurate for the short distances that matter near a geofence boundary.
+    """
+    scale_x = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(lat))
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+    best = math.inf
+    for ring in coordinates or []:
+        if len(ring) < 2:
+            continue
+        x1 = (ring[-1][0] - lng) * scale_x
+        y1 = (ring[-1][1] - lat) * scale_y
+        for coord in ring:
+            x2 = (coord[0] - lng) * scale_x
+            y2 = (coord[1] - lat) * scale_y
+            dx = x2 - x1
+            dy = y2 - y1
+            length_sq = dx * dx + dy * dy
+            if length_sq == 0:
+                t = 0.0
+            else:
+                t = max(0.0, min(1.0, -(x1 * dx + y1 * dy) / length_sq))
+            best = min(best, math.hypot(x1 + t * dx, y1 + t * dy))
+            x1, y1 = x2, y2
+    return best
+
+
+def segment_intersects_box(x1, y1, x2, y2, min_x, min_y, max_x, max_y):
+    """Liang-Barsky test: does the segment touch the axis-aligned box?"""
+    t0, t1 = 0.0, 1.0
+    dx = x2 - x1
+    dy = y2 - y1
+    for p, q in ((-dx, x1 - min_x), (dx, max_x - x1), (-dy, y1 - min_y), (dy, max_y - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return False
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return False
+            t1 = min(t1, t)
+    return t0 <= t1
+
+
+def simplify_ring(ring, tolerance_m):
+    """
+    Douglas-Peucker simplification of a closed ring.
+
+    Distances are measured in meters on a local equirectangular projection.
+    Returns the original ring if simplifying would leave fewer than three
+    distinct vertices.
+    """
+    if len(ring) < 5 or tolerance_m <= 0:
+        return [list(coord[:2]) for coord in ring]
+    lat0 = sum(coord[1] for coord in ring) / len(ring)
+    scale_x = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(lat0))
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+    points = [(coord[0] * scale_x, coord[1] * scale_y) for coord in ring]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        ax, ay = points[start]
+        bx, by = points[end]
+        dx = bx - ax
+        dy = by - ay
+        length_sq = dx * dx + dy * dy
+        farthest = start
+        max_distance = -1.0
+        for index in range(start + 1, end):
+            px, py = points[index]
+            if length_sq == 0:
+                distance = math.hypot(px - ax, py - ay)
+            else:
+                distance = abs(dy * px - dx * py + bx * ay - by * ax) / math.sqrt(length_sq)
+            if distance > max_distance:
+                farthest = index
+                max_distance = distance
+        if max_distance > tolerance_m:
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+
+    simplified = [list(ring[index][:2]) for index in range(len(ring)) if keep[index]]
+    if len(simplified) < 4:
+        return [list(coord[:2]) for coord in ring]
+    return simplified
+
+
+def quantize_ring(ring, decimals):
+    """Round coordinates and drop consecutive duplicates created by rounding."""
+    quantized = []
+    for coord in ring:
+        point = [round(coord[0], decimals), round(coord[1], decimals)]
+        if not quantized or quantized[-1] != point:
+            quantized.append(point)
+    if quantized and quantized[0] != quantized[-1]:
+        quantized.append(list(quantized[0]))
+    return quantized
+
+
+def simplify_polygon(coordinates, tolerance_m, decimals):
+    """
+    Simplified, coordinate-quantized copy of a polygon.
+
+    Holes that collapse below three distinct vertices are dropped; the outer
+    ring falls back to its quantized original if it would collapse.
+    """
+    result = []
+    for index, ring in enumerate(coordinates or []):
+        simplified = quantize_ring(simplify_ring(ring, tolerance_m), decimals)
+        if len(simplified) < 4:
+            if index > 0:
+                continue
+            simplified = quantize_ring(ring, decimals)
+        result.append(simplified)
+    return result
@@ -0,0 +1,331 @@
+"""
+KPI queries for the admin and sub-admin dashboards and reports.
+
+Every group of KPIs over one table is a single statement of conditional
+aggregates (``COUNT(*) FILTER (WHERE ...)``, or ``CASE`` where the database
+has no ``FILTER``) instead of one ``count()`` per KPI. "Today" is a
+``created_at`` range over the local day rather than ``created_at__date``,
+which would wrap the column in a date conversion and keep the database from
+using its index.
+
+``track_changes`` turns saves and deletes into per-organization KPI changes,
+for the live board and the ``OrgCounters`` running totals.
+"""
+from datetime import datetime, time as dt_time, timedelta
+
+from django.apps import apps
+from django.db.models import Count, Q, Subquery, Value
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+
+def today_range(today=None):
+    """Start and end of the local day, for index-friendly ``created_at`` ranges."""
+    today = today or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, dt_time.min))
+    return start, start + timedelta(days=1)
+
+
+def created_today(today=None):
+    start, end = today_range(today)
+    return Q(created_at__gte=start, created_at__lt=end)
+
+
+def created_on(created_at, today):
+    return created_at is not None and timezone.localdate(created_at) == today
+
+
+def conditional_counts(queryset, **conditions):
+    """
+    Count the rows of ``queryset`` matching each condition with one statement.
+    ``conditions`` map result names to ``Q`` objects, or None to count every row.
+    """
+    return queryset.aggregate(**{name: Count('pk', filter=condition) for name, condition in conditions.items()})
+
+
+def grouped_counts(queryset, group_by, **conditions):
+    """
+    ``conditional_counts`` for every value of ``group_by`` with one statement:
+    ``{group: {name: count}}``; groups without rows are missing.
+    """
+    rows = queryset.order_by().values(group_by).annotate(
+        **{name: Count('pk', filter=condition) for name, condition in conditions.items()}
+    )
+    return {row.pop(group_by): row for row in rows}
+
+
+def single_row(queryset):
+    """
+    ``queryset`` with all of its rows in one group, so aggregates over it
+    form exactly one row, also when it has no rows.
+    """
+    return queryset.order_by().annotate(_row=Value(1)).values('_row')
+
+
+def count_subquery(queryset, condition=None):
+    """Scalar subquery counting the rows of ``queryset`` matching ``condition`` (all rows if None)."""
+    return Subquery(single_row(queryset).annotate(count=Count('pk', filter=condition)).values('count'))
+
+
+def _model(name):
+    return apps.get_model('users', name)
+
+
+def dashboard_kpis(organization_id=None, today=None):
+    """
+    Admin dashboard KPIs, for one organization or all of them, in one
+    statement: the geofence counts with the alert and user counts as scalar
+    subqueries. ``alerts_today`` counts the local day, like every other
+    "today" KPI, not the UTC date.
+    """
+    geofences = _model('Geofence').objects.all()
+    alerts = _model('Alert').objects.all()
+    users = _model('User').objects.all()
+    if organization_id is not None:
+        geofences = geofences.filter(organization_id=organization_id)
+        alerts = alerts.for_organization(organization_id)
+        users = users.filter(organization_id=organization_id)
+
+    kpis = single_row(geofences).annotate(
+        active_geofences=Count('pk', filter=Q(active=True)),
+        alerts_today=count_subquery(alerts, created_today(today)),
+        critical_alerts=count_subquery(alerts, Q(severity='CRITICAL', is_resolved=False)),
+        active_sub_admins=count_subquery(users, Q(role='SUB_ADMIN', is_active=True)),
+        total_users=count_subquery(users),
+    ).get()
+    del kpis['_row']
+    return kpis
+
+
+def subadmin_kpis(organization_id, today=None):
+    """Sub-admin dashboard KPIs of an organization; one statement per table."""
+    kpis = {}
+    kpis.update(conditional_counts(
+        _model('Geofence').objects.filter(organization_id=organization_id),
+        active_geofences=Q(active=True),
+    ))
+    kpis.update(conditional_counts(
+        _model('SecurityOfficer').objects.filter(organization_id=organization_id),
+        total_officers=None,
+        active_officers=Q(is_active=True),
+    ))
+    kpis.update(conditional_counts(
+        _model('Incident').objects.filter(geofence__organization_id=organization_id),
+        incidents_today=created_today(today),
+        unresolved_incidents=Q(is_resolved=False),
+        critical_incidents=Q(is_resolved=False, severity='CRITICAL'),
+    ))
+    kpis.update(conditional_counts(
+        _model('Notification').objects.filter(organization_id=organization_id, is_sent=True),
+        notifications_sent_today=created_today(today),
+    ))
+    return kpis
+
+
+def geofence_analytics(date_range_start, date_range_end):
+    counts = conditional_counts(_model('Geofence').objects.all(), active_geofences=Q(active=True), total_geofences=None)
+    counts['geofence_alerts'] = _model('Alert').objects.filter(
+        created_at__gte=date_range_start,
+        created_at__lte=date_range_end,
+        geofence__isnull=False
+    ).count()
+    return counts
+
+
+def user_activity():
+    return conditional_counts(
+        _model('User').objects.all(),
+        super_admins=Q(role='SUPER_ADMIN'),
+        sub_admins=Q(role='SUB_ADMIN'),
+        regular_users=Q(role='USER'),
+        active_users=Q(is_active=True),
+    )
+
+
+def alert_summary():
+    return conditional_counts(
+        _model('Alert').objects.all(),
+        critical_alerts=Q(severity='CRITICAL'),
+        high_alerts=Q(severity='HIGH'),
+        medium_alerts=Q(severity='MEDIUM'),
+        low_alerts=Q(severity='LOW'),
+        resolved_alerts=Q(is_resolved=True),
+        unresolved_alerts=Q(is_resolved=False),
+    )
+
+
+class Tracked:
+    """How one model's rows count towards the KPIs of their organization."""
+
+    def __init__(self, fields, kpis, organization_field=None, organization=None):
+        self.fields = fields
+        self.kpis = kpis
+        # Either a field holding the organization id, or a lookup for models that only reach it through relations
+        self.organization_field = organization_field
+        self.organization = organization
+
+    @property
+    def field_names(self):
+        return self.fields + ((self.organization_field,) if self.organization_field else ())
+
+    def values(self, loaded):
+        """Tracked field values from ``loaded`` (field values by name), or None if any is missing."""
+        values = {}
+        for field in self.field_names:
+            if field not in loaded:
+                return None
+            values[field] = loaded[field]
+        return values
+
+
+def _geofence_kpis(values, today):
+    return {'active_geofences': int(values['active'])}
+
+
+def _officer_kpis(values, today):
+    return {'total_officers': 1, 'active_officers': int(values['is_active'])}
+
+
+def _incident_kpis(values, today):
+    unresolved = not values['is_resolved']
+    return {
+        'incidents_today': int(created_on(values['created_at'], today)),
+        'unresolved_incidents': int(unresolved),
+        'critical_incidents': int(unresolved and values['severity'] == 'CRITICAL'),
+    }
+
+
+def _notification_kpis(values, today):
+    return {'notifications_sent_today': int(values['is_sent'] and created_on(values['created_at'], today))}
+
+
+def _incident_organization(incident):
+    return _model('Geofence').objects.filter(
+        pk=incident.geofence_id
+    ).values_list('organization_id', flat=True).first()
+
+
+# How the rows behind the sub-admin KPIs count towards their organization
+GEOFENCE_KPIS = Tracked(('active',), _geofence_kpis, organization_field='organization_id')
+OFFICER_KPIS = Tracked(('is_active',), _officer_kpis, organization_field='organization_id')
+INCIDENT_KPIS = Tracked(('is_resolved', 'severity', 'created_at'), _incident_kpis, organization=_incident_organization)
+NOTIFICATION_KPIS = Tracked(('is_sent', 'created_at'), _notification_kpis, organization_field='organization_id')
+
+
+def changes_between(tracked, old_values, new_values, organization_id, today=None):
+    """KPI changes per organization when a row goes from ``old_values`` to ``new_values``; None means absent."""
+    today = today or timezone.localdate()
+    changes = {}
+    for values, sign in ((old_values, -1), (new_values, 1)):
+        if values is None:
+            continue
+        organization = values[tracked.organization_field] if tracked.organization_field else organization_id
+        if organization is None:
+            continue
+        for kpi, amount in tracked.kpis(values, today).items():
+            if amount:
+                per_organization = changes.setdefault(organization, {})
+                per_organization[kpi] = per_organization.get(kpi, 0) + sign * amount
+    return {
+        organization: {kpi: amount for kpi, amount in kpis.items() if amount}
+        for organization, kpis in changes.items()
+        if any(kpis.values())
+    }
+
+
+# Model label -> {consumer name: (Tracked, on_changes)}
+_consumers = {}
+# Model label -> fields any consumer needs remembered when an instance is loaded
+_snapshot_fields = {}
+
+
+def _snapshot(sender, instance):
+    loaded = instance.__dict__
+    return {field: loaded[field] for field in _snapshot_fields[sender._meta.label] if field in loaded}
+
+
+def _changes(tracked, instance, old_values, new_values):
+    # Placeholder organization, so the lookup only runs when a KPI actually changed
+    changes = changes_between(tracked, old_values, new_values, organization_id=0)
+    if changes and tracked.organization is not None:
+        organization_id = tracked.organization(instance)
+        changes = {organization_id: changes[0]} if organization_id else {}
+    return changes
+
+
+def _remember(sender, instance, **kwargs):
+    instance._kpi_snapshot = _snapshot(sender, instance)
+
+
+def _saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_kpi_snapshot', None)
+    new = _snapshot(sender, instance)
+    instance._kpi_snapshot = new
+    for tracked, on_changes in _consumers[sender._meta.label].values():
+        old_values = tracked.values(old) if old is not None else None
+        new_values = tracked.values(new)
+        if new_values is None or (old_values is None and not created) or old_values == new_values:
+            continue
+        changes = _changes(tracked, instance, old_values, new_values)
+        if changes:
+            on_changes(sender, changes, False)
+
+
+def _deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_kpi_snapshot', None)
+    if old is None:
+        return
+    for tracked, on_changes in _consumers[sender._meta.label].values():
+        old_values = tracked.values(old)
+        if old_values is None:
+            continue
+        changes = _changes(tracked, instance, old_values, None)
+        if changes:
+            on_changes(sender, changes, True)
+
+
+def track_changes(name, tracked_models, on_changes):
+    """
+    Call ``on_changes(sender, {organization_id: {kpi: change}}, deleted)`` when
+    a save or delete of one of ``tracked_models`` (``{model label: Tracked}``)
+    moves its KPIs.
+
+    Previous values are remembered on each instance when it is loaded, once
+    for all consumers, so this needs no extra query, except to look up the
+    organization of models without an organization field, and only when a
+    KPI actually changed. Partially loaded instances are skipped. Rows
+    inserted with ``bulk_create`` are reported with ``report_bulk_create``.
+    """
+    for label, tracked in tracked_models.items():
+        _consumers.setdefault(label, {})[name] = (tracked, on_changes)
+        _snapshot_fields[label] = tuple(dict.fromkeys(
+            field for consumer, _ in _consumers[label].values() for field in consumer.field_names
+        ))
+        post_init.connect(_remember, sender=label, weak=False, dispatch_uid=f'kpis_init_{label}')
+        post_save.connect(_saved, sender=label, weak=False, dispatch_uid=f'kpis_save_{label}')
+        post_delete.connect(_deleted, sender=label, weak=False, dispatch_uid=f'kpis_delete_{label}')
+
+
+def report_bulk_create(sender, instances):
+    """
+    Report rows inserted with ``bulk_create``, which sends no signals, to the
+    ``track_changes`` consumers of ``sender``: one change per organization
+    for the whole batch. Call it in the transaction that inserted them.
+    """
+    consumers = _consumers.get(sender._meta.label)
+    if not consumers:
+        return
+    for tracked, on_changes in consumers.values():
+        changes = {}
+        for instance in instances:
+            new_values = tracked.values(instance.__dict__)
+            if new_values is None:
+                continue
+            for organization_id, kpis in _changes(tracked, instance, None, new_values).items():
+                per_organization = changes.setdefault(organization_id, {})
+                for kpi, amount in kpis.items():
+                    per_organization[kpi] = per_organization.get(kpi, 0) + amount
+        if changes:
+            on_changes(sender, changes, False)
+    for instance in instances:
+        instance._kpi_snapshot = _snapshot(sender, instance)
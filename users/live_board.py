@@ -0,0 +1,226 @@
+"""
+Live operations board for sub-admin dashboards.
+
+Instead of every open dashboard re-running the KPI counts on each poll, each
+worker keeps the KPIs of an organization in memory, counted once when the
+first dashboard of that organization connects. Saves and deletes of the
+models behind the KPIs publish ``kpi_delta`` events (on commit) on the
+organization's ``board:organization:<id>`` channel; every worker applies them
+to its copy as they arrive from the event broker, and the dashboards
+connected to ``subadmin/live-board/`` receive the same small deltas.
+
+A dashboard starts with a ``snapshot`` event and adds up the ``changes`` of
+every ``kpi_delta`` after it. The counts are redone for a newly connecting
+dashboard after ``LIVE_BOARD_RESYNC_SECONDS``, which repairs anything the
+deltas missed (``.update()`` calls, raw SQL); a corrected snapshot is then
+sent to the dashboards already connected.
+
+Deltas come from ``users.kpis.track_changes``, which needs no extra query
+except to find the organization of incidents, SOS alerts and cases.
+"""
+import logging
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.events import Event, event_broker
+from .kpis import (
+    GEOFENCE_KPIS, INCIDENT_KPIS, NOTIFICATION_KPIS, OFFICER_KPIS, Tracked,
+    conditional_counts, created_on, created_today, subadmin_kpis, track_changes,
+)
+
+logger = logging.getLogger(__name__)
+
+KPIS = (
+    'active_geofences',
+    'total_officers',
+    'active_officers',
+    'incidents_today',
+    'unresolved_incidents',
+    'critical_incidents',
+    'notifications_sent_today',
+    'sos_alerts_today',
+    'open_sos_alerts',
+    'active_cases',
+)
+
+# KPIs counting only rows created today; they restart at zero each day
+DAILY_KPIS = ('incidents_today', 'notifications_sent_today', 'sos_alerts_today')
+
+CHANNEL_PREFIX = 'board:organization:'
+
+
+def board_channel(organization_id):
+    return f'{CHANNEL_PREFIX}{organization_id}'
+
+
+def _sos_alert_kpis(values, today):
+    if values['is_deleted']:
+        return {}
+    return {
+        'sos_alerts_today': int(created_on(values['created_at'], today)),
+        'open_sos_alerts': int(values['status'] in ('pending', 'accepted')),
+    }
+
+
+def _case_kpis(values, today):
+    return {'active_cases': int(values['status'] == 'accepted')}
+
+
+def _sos_alert_organization(alert):
+    return apps.get_model('users', 'User').objects.filter(
+        pk=alert.user_id
+    ).values_list('organization_id', flat=True).first()
+
+
+def _case_organization(case):
+    return apps.get_model('security_app', 'SOSAlert').objects.filter(
+        pk=case.sos_alert_id
+    ).values_list('user__organization_id', flat=True).first()
+
+
+TRACKED = {
+    'users.Geofence': GEOFENCE_KPIS,
+    'users.SecurityOfficer': OFFICER_KPIS,
+    'users.Incident': INCIDENT_KPIS,
+    'users.Notification': NOTIFICATION_KPIS,
+    'security_app.SOSAlert': Tracked(
+        ('status', 'is_deleted', 'created_at'), _sos_alert_kpis, organization=_sos_alert_organization
+    ),
+    'security_app.Case': Tracked(('status',), _case_kpis, organization=_case_organization),
+}
+
+
+def count_kpis(organization_id, today=None):
+    """The KPIs of an organization counted from the database; one query per table."""
+    kpis = subadmin_kpis(organization_id, today)
+    kpis.update(conditional_counts(
+        apps.get_model('security_app', 'SOSAlert').objects.filter(
+            user__organization_id=organization_id, is_deleted=False
+        ),
+        sos_alerts_today=created_today(today),
+        open_sos_alerts=Q(status__in=['pending', 'accepted']),
+    ))
+    kpis.update(conditional_counts(
+        apps.get_model('security_app', 'Case').objects.filter(sos_alert__user__organization_id=organization_id),
+        active_cases=Q(status='accepted'),
+    ))
+    return kpis
+
+
+class LiveBoard:
+    """Per-organization KPIs of this worker, kept current by ``kpi_delta`` events."""
+
+    def __init__(self, broker=None, resync_seconds=None):
+        self.broker = broker or event_broker
+        self.resync_seconds = resync_seconds if resync_seconds is not None else getattr(
+            settings, 'LIVE_BOARD_RESYNC_SECONDS', 300
+        )
+        self._lock = threading.Lock()
+        # organization_id -> {'kpis': {...}, 'day': date, 'loaded_at': monotonic seconds}
+        self._boards = {}
+        # Newest kpi_delta event this worker applied
+        self._last_event_id = 0
+        self.broker.add_listener(self.apply)
+
+    def _roll_day(self, board):
+        """Restart the daily KPIs when the day changed; returns whether it did."""
+        today = timezone.localdate()
+        if board['day'] == today:
+            return False
+        board['day'] = today
+        for kpi in DAILY_KPIS:
+            board['kpis'][kpi] = 0
+        return True
+
+    def _snapshot_data(self, organization_id, board):
+        return {
+            'organization': organization_id,
+            'organization_name': board['organization_name'],
+            'day': board['day'].isoformat(),
+            'kpis': dict(board['kpis']),
+        }
+
+    def _notify(self, organization_id, board):
+        """Send connected dashboards a corrected snapshot; it stays in this worker."""
+        self.broker.deliver(Event(
+            None, board_channel(organization_id), 'snapshot', self._snapshot_data(organization_id, board)
+        ))
+
+    def apply(self, event):
+        """Broker listener adding a ``kpi_delta`` event to the organization's KPIs."""
+        if event.type != 'kpi_delta' or not event.channel.startswith(CHANNEL_PREFIX):
+            return
+        organization_id = int(event.channel[len(CHANNEL_PREFIX):])
+        with self._lock:
+            self._last_event_id = max(self._last_event_id, event.id or 0)
+            board = self._boards.get(organization_id)
+            if board is None:
+                return
+            rolled = self._roll_day(board)
+            for kpi, amount in event.data['changes'].items():
+                board['kpis'][kpi] = board['kpis'].get(kpi, 0) + amount
+            if rolled:
+                board = dict(board, kpis=dict(board['kpis']))
+        if rolled:
+            self._notify(organization_id, board)
+
+    def ensure_loaded(self, organization_id):
+        """Count an organization's KPIs if this worker has none or they are due a resync."""
+        with self._lock:
+            board = self._boards.get(organization_id)
+            if board is not None and time.monotonic() - board['loaded_at'] < self.resync_seconds:
+                return
+        organization_name = apps.get_model('users', 'Organization').objects.filter(
+            pk=organization_id
+        ).values_list('name', flat=True).first()
+        kpis = count_kpis(organization_id)
+        with self._lock:
+            previous = self._boards.get(organization_id)
+            board = {
+                'kpis': kpis,
+                'day': timezone.localdate(),
+                'loaded_at': time.monotonic(),
+                'organization_name': organization_name,
+            }
+            self._boards[organization_id] = board
+        if previous is not None and previous['kpis'] != kpis:
+            logger.info(f"Live board of organization {organization_id} resynced")
+            self._notify(organization_id, board)
+
+    def snapshot(self, organization_id):
+        """``snapshot`` event with the organization's KPIs; ``ensure_loaded`` first."""
+        with self._lock:
+            board = self._boards[organization_id]
+            rolled = self._roll_day(board)
+            data = self._snapshot_data(organization_id, board)
+            event_id = self._last_event_id
+        if rolled:
+            self._notify(organization_id, board)
+        return Event(event_id, board_channel(organization_id), 'snapshot', data)
+
+    def reset(self):
+        """Forget all KPIs; used by tests."""
+        with self._lock:
+            self._boards = {}
+            self._last_event_id = 0
+
+
+def _publish_changes(sender, changes, deleted):
+    for organization_id, kpi_changes in changes.items():
+        event_broker.publish_on_commit(board_channel(organization_id), 'kpi_delta', {
+            'changes': kpi_changes,
+            'cause': f'{sender._meta.model_name}_{"deleted" if deleted else "saved"}',
+        })
+
+
+def connect_signals():
+    track_changes('live_board', TRACKED, _publish_changes)
+
+
+# Global live board instance
+live_board = LiveBoard()
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import Geofence
+
+
+class Command(BaseCommand):
+    help = 'Compute stored bbox, centroid, area and vertex count for existing geofences'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of geofences to update per query'
+        )
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='Only update geofences that have no stored geometry yet'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Geofence.objects.only('id', 'polygon_json').order_by('id')
+        if options['only_missing']:
+            queryset = queryset.filter(bbox_min_lat__isnull=True)
+
+        updated = 0
+        batch = []
+        for geofence in queryset.iterator(chunk_size=batch_size):
+            geofence.update_geometry()
+            batch.append(geofence)
+            if len(batch) >= batch_size:
+                updated += self.flush(batch, batch_size)
+                batch = []
+        if batch:
+            updated += self.flush(batch, batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated geometry for {updated} geofences')
+        )
+
+    def flush(self, batch, batch_size):
+        """Write one batch of recomputed geometry"""
+        with transaction.atomic():
+            Geofence.objects.bulk_update(batch, Geofence.GEOMETRY_FIELDS, batch_size=batch_size)
+        return len(batch)
@@ -0,0 +1,82 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import Organization, User
+from users.geofence_import import GeofenceImportError, import_geofences
+
+
+class Command(BaseCommand):
+    help = 'Import geofences from a GeoJSON FeatureCollection file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="GeoJSON file to import, or '-' for stdin")
+        parser.add_argument(
+            '--organization',
+            type=int,
+            required=True,
+            help='ID of the organization the geofences belong to'
+        )
+        parser.add_argument(
+            '--created-by',
+            help='Username recorded as the creator of the geofences'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Number of geofences written per query'
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Write nothing if any feature is invalid'
+        )
+        parser.add_argument(
+            '--allow-overlap',
+            action='store_true',
+            help='Import active geofences that overlap other active geofences of the organization'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            organization = Organization.objects.get(pk=options['organization'])
+        except Organization.DoesNotExist:
+            raise CommandError(f"Organization {options['organization']} does not exist")
+
+        created_by = None
+        if options['created_by']:
+            try:
+                created_by = User.objects.get(username=options['created_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['created_by']} does not exist")
+
+        try:
+            if options['path'] == '-':
+                report = self.run_import(sys.stdin.buffer, organization, created_by, options)
+            else:
+                with open(options['path'], 'rb') as stream:
+                    report = self.run_import(stream, organization, created_by, options)
+        except (GeofenceImportError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stdout.write(
+                self.style.WARNING(f"Feature {error['index']} ({error['name'] or 'unnamed'}): {error['error']}")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report['created']} of {report['total']} geofences "
+                f"({report['failed']} invalid)"
+            )
+        )
+
+    def run_import(self, stream, organization, created_by, options):
+        return import_geofences(
+            stream,
+            organization,
+            created_by=created_by,
+            chunk_size=options['chunk_size'],
+            strict=options['strict'],
+            allow_overlap=options['allow_overlap']
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Geofence
+from users.geofence_cells import rebuild_geofence_cells
+
+
+class Command(BaseCommand):
+    help = 'Rasterize geofence polygons into the geohash cell lookup table'
+
+    def handle(self, *args, **options):
+        geofences = 0
+        cells = 0
+        for geofence in Geofence.objects.only('id', 'polygon_json').order_by('id').iterator():
+            cells += rebuild_geofence_cells(geofence)
+            geofences += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored {cells} cells for {geofences} geofences')
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from users.org_counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-organization KPI counters and repair those that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=int,
+            action='append',
+            dest='organizations',
+            help='Only reconcile this organization id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        repaired = reconcile_counters(options['organizations'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Repaired {repaired} organization counters')
+        )
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_delete_subadminprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geofence',
+            name='area_sq_m',
+            field=models.FloatField(blank=True, help_text='Approximate area in square meters', null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='bbox_max_lat',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='bbox_max_lng',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='bbox_min_lat',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='bbox_min_lng',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='centroid_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='centroid_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='vertex_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_geofence_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeofenceCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(db_index=True, help_text='Geohash of the cell', max_length=12)),
+                ('is_interior', models.BooleanField(default=False, help_text='Whether the cell lies entirely inside the polygon')),
+                ('geofence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='users.geofence')),
+            ],
+            options={
+                'verbose_name': 'Geofence Cell',
+                'verbose_name_plural': 'Geofence Cells',
+                'unique_together': {('geofence', 'cell')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_geofencecell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geofence',
+            name='simplified_polygons',
+            field=models.JSONField(blank=True, default=dict, help_text='Simplified GeoJSON polygons keyed by detail level'),
+        ),
+    ]
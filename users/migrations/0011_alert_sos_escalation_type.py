@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_geofence_simplified_polygons'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alert',
+            name='alert_type',
+            field=models.CharField(choices=[('GEOFENCE_ENTER', 'Geofence Enter'), ('GEOFENCE_EXIT', 'Geofence Exit'), ('GEOFENCE_VIOLATION', 'Geofence Violation'), ('SYSTEM_ERROR', 'System Error'), ('SECURITY_BREACH', 'Security Breach'), ('MAINTENANCE', 'Maintenance'), ('SOS_ESCALATION', 'SOS Escalation')], default='GEOFENCE_ENTER', max_length=20),
+        ),
+    ]
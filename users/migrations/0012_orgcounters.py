@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-17 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_alert_sos_escalation_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrgCounters',
+            fields=[
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='users.organization')),
+                ('active_geofences', models.PositiveIntegerField(default=0)),
+                ('total_officers', models.PositiveIntegerField(default=0)),
+                ('active_officers', models.PositiveIntegerField(default=0)),
+                ('unresolved_incidents', models.PositiveIntegerField(default=0)),
+                ('critical_incidents', models.PositiveIntegerField(default=0)),
+                ('unresolved_alerts', models.PositiveIntegerField(default=0)),
+                ('critical_alerts', models.PositiveIntegerField(default=0)),
+                ('total_users', models.PositiveIntegerField(default=0)),
+                ('active_sub_admins', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField(help_text='Day the daily counters belong to')),
+                ('alerts_today', models.PositiveIntegerField(default=0)),
+                ('incidents_today', models.PositiveIntegerField(default=0)),
+                ('notifications_sent_today', models.PositiveIntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Organization Counters',
+                'verbose_name_plural': 'Organization Counters',
+            },
+        ),
+    ]
@@ -2,7 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-import json
+
+from .geometry import extract_polygon_coordinates, polygon_geometry_summary, simplify_polygon
 
 
 class Organization(models.Model):
@@ -45,6 +46,21 @@ class User(AbstractUser):
         return f"{self.username} ({self.role})"
 
 
+class GeofenceQuerySet(models.QuerySet):
+    def intersecting_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """Geofences whose stored bounding box overlaps the given box"""
+        return self.filter(
+            bbox_min_lat__lte=max_lat,
+            bbox_max_lat__gte=min_lat,
+            bbox_min_lng__lte=max_lng,
+            bbox_max_lng__gte=min_lng,
+        )
+    
+    def covering_point(self, lat, lng):
+        """Geofences whose stored bounding box contains the point"""
+        return self.intersecting_bbox(lat, lng, lat, lng)
+
+
 class Geofence(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
@@ -62,9 +78,38 @@ class Geofence(models.Model):
         blank=True,
         related_name='created_geofences'
     )
+    # Geometry derived from polygon_json, computed on save
+    bbox_min_lat = models.FloatField(null=True, blank=True, db_index=True)
+    bbox_min_lng = models.FloatField(null=True, blank=True, db_index=True)
+    bbox_max_lat = models.FloatField(null=True, blank=True, db_index=True)
+    bbox_max_lng = models.FloatField(null=True, blank=True, db_index=True)
+    centroid_lat = models.FloatField(null=True, blank=True)
+    centroid_lng = models.FloatField(null=True, blank=True)
+    area_sq_m = models.FloatField(null=True, blank=True, help_text="Approximate area in square meters")
+    vertex_count = models.PositiveIntegerField(default=0)
+    simplified_polygons = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Simplified GeoJSON polygons keyed by detail level"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    GEOMETRY_FIELDS = (
+        'bbox_min_lat', 'bbox_min_lng', 'bbox_max_lat', 'bbox_max_lng',
+        'centroid_lat', 'centroid_lng', 'area_sq_m', 'vertex_count',
+        'simplified_polygons',
+    )
+    
+    # Douglas-Peucker tolerance (meters) and coordinate decimals per detail level
+    DETAIL_LEVELS = {
+        'low': {'tolerance_m': 50.0, 'decimals': 4},
+        'medium': {'tolerance_m': 10.0, 'decimals': 5},
+        'high': {'tolerance_m': 2.0, 'decimals': 6},
+    }
+    
+    objects = GeofenceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Geofence'
         verbose_name_plural = 'Geofences'
@@ -73,19 +118,59 @@ class Geofence(models.Model):
     def __str__(self):
         return f"{self.name} ({self.organization.name})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Polygon as loaded, so saves that leave it alone skip the geometry
+        instance._saved_polygon_json = instance.__dict__.get('polygon_json')
+        return instance
+    
+    def polygon_changed(self, update_fields=None):
+        """Whether saving writes a polygon other than the stored one (assign a new polygon rather than mutate it)"""
+        if update_fields is not None:
+            return 'polygon_json' in update_fields
+        if self._state.adding or 'polygon_json' not in self.__dict__:
+            return True
+        saved = getattr(self, '_saved_polygon_json', None)
+        return saved is None or saved != self.polygon_json
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.polygon_changed(update_fields):
+            self.update_geometry()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.GEOMETRY_FIELDS)
+        super().save(*args, **kwargs)
+        if 'polygon_json' in self.__dict__:
+            self._saved_polygon_json = self.polygon_json
+    
+    def update_geometry(self):
+        """Recompute the stored bbox, centroid, area and vertex count from polygon_json"""
+        summary = polygon_geometry_summary(self.get_polygon_coordinates())
+        bbox = summary['bbox']
+        centroid = summary['centroid']
+        self.bbox_min_lng, self.bbox_min_lat, self.bbox_max_lng, self.bbox_max_lat = bbox or (None, None, None, None)
+        self.centroid_lng, self.centroid_lat = centroid or (None, None)
+        self.area_sq_m = summary['area_sq_m'] if bbox else None
+        self.vertex_count = summary['vertex_count']
+        self.simplified_polygons = self.build_simplified_polygons()
+    
+    def build_simplified_polygons(self):
+        """Precompute simplified geometry for every detail level"""
+        coordinates = self.get_polygon_coordinates()
+        if not coordinates or not coordinates[0]:
+            return {}
+        return {
+            level: {
+                'type': 'Polygon',
+                'coordinates': simplify_polygon(coordinates, options['tolerance_m'], options['decimals'])
+            }
+            for level, options in self.DETAIL_LEVELS.items()
+        }
+    
     def get_polygon_coordinates(self):
         """Extract coordinates from GeoJSON polygon"""
-        try:
-            if isinstance(self.polygon_json, dict):
-                if self.polygon_json.get('type') == 'Polygon':
-                    return self.polygon_json.get('coordinates', [])
-                elif self.polygon_json.get('type') == 'Feature':
-                    geometry = self.polygon_json.get('geometry', {})
-                    if geometry.get('type') == 'Polygon':
-                        return geometry.get('coordinates', [])
-            return []
-        except (json.JSONDecodeError, AttributeError):
-            return []
+        return extract_polygon_coordinates(self.polygon_json)
     
     def get_center_point(self):
         """Calculate center point of the polygon"""
@@ -108,6 +193,37 @@ class Geofence(models.Model):
         return [center_lon, center_lat]
 
 
+class GeofenceCell(models.Model):
+    """Geohash cell covered by a geofence polygon, for indexed point lookups"""
+    geofence = models.ForeignKey(
+        Geofence,
+        on_delete=models.CASCADE,
+        related_name='cells'
+    )
+    cell = models.CharField(max_length=12, db_index=True, help_text="Geohash of the cell")
+    is_interior = models.BooleanField(
+        default=False,
+        help_text="Whether the cell lies entirely inside the polygon"
+    )
+    
+    class Meta:
+        verbose_name = 'Geofence Cell'
+        verbose_name_plural = 'Geofence Cells'
+        unique_together = ['geofence', 'cell']
+    
+    def __str__(self):
+        return f"{self.cell} ({'interior' if self.is_interior else 'boundary'})"
+
+
+class AlertQuerySet(models.QuerySet):
+    def for_organization(self, organization_id):
+        """Alerts of an organization: those of its geofences, and those without a geofence raised by its users"""
+        return self.filter(
+            models.Q(geofence__organization_id=organization_id)
+            | models.Q(geofence__isnull=True, user__organization_id=organization_id)
+        )
+
+
 class Alert(models.Model):
     ALERT_TYPES = [
         ('GEOFENCE_ENTER', 'Geofence Enter'),
@@ -116,6 +232,7 @@ class Alert(models.Model):
         ('SYSTEM_ERROR', 'System Error'),
         ('SECURITY_BREACH', 'Security Breach'),
         ('MAINTENANCE', 'Maintenance'),
+        ('SOS_ESCALATION', 'SOS Escalation'),
     ]
     
     SEVERITY_CHOICES = [
@@ -164,6 +281,8 @@ class Alert(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = AlertQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Alert'
         verbose_name_plural = 'Alerts'
@@ -504,4 +623,53 @@ class UserDetails(models.Model):
         ordering = ['-date']
     
     def __str__(self):
-        return f"{self.username} - {self.status} (${self.price})"
\ No newline at end of file
+        return f"{self.username} - {self.status} (${self.price})"
+
+class OrgCounters(models.Model):
+    """
+    Running KPI totals of an organization, kept in step by users.org_counters
+    so the dashboards read one row instead of counting.
+    """
+    # Counters reset when the day changes
+    DAILY_COUNTERS = ('alerts_today', 'incidents_today', 'notifications_sent_today')
+    
+    organization = models.OneToOneField(
+        Organization,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    active_geofences = models.PositiveIntegerField(default=0)
+    total_officers = models.PositiveIntegerField(default=0)
+    active_officers = models.PositiveIntegerField(default=0)
+    unresolved_incidents = models.PositiveIntegerField(default=0)
+    critical_incidents = models.PositiveIntegerField(default=0)
+    unresolved_alerts = models.PositiveIntegerField(default=0)
+    critical_alerts = models.PositiveIntegerField(default=0)
+    total_users = models.PositiveIntegerField(default=0)
+    active_sub_admins = models.PositiveIntegerField(default=0)
+    day = models.DateField(help_text="Day the daily counters belong to")
+    alerts_today = models.PositiveIntegerField(default=0)
+    incidents_today = models.PositiveIntegerField(default=0)
+    notifications_sent_today = models.PositiveIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Organization Counters'
+        verbose_name_plural = 'Organization Counters'
+    
+    def __str__(self):
+        return f"Counters for organization {self.organization_id}"
+    
+    def kpis(self, today=None):
+        """Counter values, with the daily ones zero if nothing happened yet today"""
+        today = today or timezone.localdate()
+        values = {
+            field.name: getattr(self, field.name)
+            for field in self._meta.concrete_fields
+            if isinstance(field, models.PositiveIntegerField)
+        }
+        if self.day != today:
+            for name in self.DAILY_COUNTERS:
+                values[name] = 0
+        return values
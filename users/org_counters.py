@@ -0,0 +1,199 @@
+"""
+Running per-organization KPI totals (``OrgCounters``).
+
+The admin and sub-admin dashboards read an organization's KPIs from its
+``OrgCounters`` row instead of counting alerts, incidents, officers and
+notifications. The row is kept in step by ``track_changes``: every save,
+resolve or delete that moves a KPI applies the change with one ``F()``
+``UPDATE`` in the same transaction, so concurrent changes are never lost and
+a rolled back change never counts.
+
+Daily counters belong to the row's ``day``; the first change of a new day
+restarts them, and reads treat a row from an earlier day as zero for them.
+
+Bulk inserts are applied through ``report_bulk_create``. Paths that skip
+signals entirely (``.update()``, raw SQL) make the row drift until
+``reconcile_counters`` recounts it; run it nightly with
+``manage.py reconcile_org_counters``. A missing row is counted on first read.
+"""
+import logging
+
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .kpis import (
+    GEOFENCE_KPIS, INCIDENT_KPIS, NOTIFICATION_KPIS, OFFICER_KPIS, Tracked,
+    created_on, created_today, grouped_counts, track_changes,
+)
+from .models import Alert, Geofence, Incident, Notification, Organization, OrgCounters, SecurityOfficer, User
+
+logger = logging.getLogger(__name__)
+
+
+def _alert_kpis(values, today):
+    unresolved = not values['is_resolved']
+    return {
+        'alerts_today': int(created_on(values['created_at'], today)),
+        'unresolved_alerts': int(unresolved),
+        'critical_alerts': int(unresolved and values['severity'] == 'CRITICAL'),
+    }
+
+
+def _alert_organization(alert):
+    if alert.geofence_id is None:
+        # Alerts without a geofence belong to the organization of their user
+        if alert.user_id is None:
+            return None
+        return User.objects.filter(pk=alert.user_id).values_list('organization_id', flat=True).first()
+    geofence = alert.geofence if Alert.geofence.is_cached(alert) else None
+    if geofence is not None and 'organization_id' in geofence.__dict__:
+        # Already loaded, e.g. for alerts created in bulk
+        return geofence.organization_id
+    return Geofence.objects.filter(pk=alert.geofence_id).values_list('organization_id', flat=True).first()
+
+
+def _user_kpis(values, today):
+    return {'total_users': 1, 'active_sub_admins': int(values['role'] == 'SUB_ADMIN' and values['is_active'])}
+
+
+COUNTED = {
+    'users.Geofence': GEOFENCE_KPIS,
+    'users.SecurityOfficer': OFFICER_KPIS,
+    'users.Incident': INCIDENT_KPIS,
+    'users.Notification': NOTIFICATION_KPIS,
+    'users.Alert': Tracked(('is_resolved', 'severity', 'created_at'), _alert_kpis, organization=_alert_organization),
+    'users.User': Tracked(('role', 'is_active'), _user_kpis, organization_field='organization_id'),
+}
+
+
+def apply_changes(sender, changes, deleted):
+    """Add ``{organization_id: {counter: change}}`` to the counter rows, one UPDATE per organization."""
+    today = timezone.localdate()
+    for organization_id, counter_changes in changes.items():
+        same_day = Q(day=today)
+        updates = {'day': Value(today)}
+        for name in OrgCounters.DAILY_COUNTERS:
+            amount = counter_changes.get(name, 0)
+            # A new day starts the daily counters over
+            updates[name] = Case(
+                When(same_day, then=Greatest(F(name) + amount, 0)),
+                default=Value(max(amount, 0)),
+            )
+        for name, amount in counter_changes.items():
+            if name not in OrgCounters.DAILY_COUNTERS:
+                updates[name] = Greatest(F(name) + amount, 0)
+        # Without a row there is nothing to keep in step; the first read counts it
+        OrgCounters.objects.filter(organization_id=organization_id).update(**updates)
+
+
+def count_counters(organization_ids=None, today=None):
+    """``{organization_id: counters}`` counted from the database; one query per table."""
+    def scoped(queryset, organization_field):
+        if organization_ids is None:
+            return queryset
+        return queryset.filter(**{f'{organization_field}__in': organization_ids})
+
+    groups = [
+        grouped_counts(
+            scoped(Geofence.objects.all(), 'organization_id'), 'organization_id',
+            active_geofences=Q(active=True),
+        ),
+        grouped_counts(
+            scoped(SecurityOfficer.objects.all(), 'organization_id'), 'organization_id',
+            total_officers=None,
+            active_officers=Q(is_active=True),
+        ),
+        grouped_counts(
+            scoped(Incident.objects.all(), 'geofence__organization_id'), 'geofence__organization_id',
+            incidents_today=created_today(today),
+            unresolved_incidents=Q(is_resolved=False),
+            critical_incidents=Q(is_resolved=False, severity='CRITICAL'),
+        ),
+        grouped_counts(
+            scoped(
+                Alert.objects.annotate(alert_organization=Coalesce('geofence__organization_id', 'user__organization_id')),
+                'alert_organization',
+            ),
+            'alert_organization',
+            alerts_today=created_today(today),
+            unresolved_alerts=Q(is_resolved=False),
+            critical_alerts=Q(is_resolved=False, severity='CRITICAL'),
+        ),
+        grouped_counts(
+            scoped(Notification.objects.filter(is_sent=True), 'organization_id'), 'organization_id',
+            notifications_sent_today=created_today(today),
+        ),
+        grouped_counts(
+            scoped(User.objects.filter(organization__isnull=False), 'organization_id'), 'organization_id',
+            total_users=None,
+            active_sub_admins=Q(role='SUB_ADMIN', is_active=True),
+        ),
+    ]
+
+    if organization_ids is None:
+        organization_ids = Organization.objects.values_list('id', flat=True)
+    zero = {name: 0 for name in _counter_names()}
+    counters = {organization_id: dict(zero) for organization_id in organization_ids}
+    for group in groups:
+        for organization_id, counts in group.items():
+            if organization_id in counters:
+                counters[organization_id].update(counts)
+    return counters
+
+
+def _counter_names():
+    return [field.name for field in OrgCounters._meta.concrete_fields if isinstance(field, PositiveIntegerField)]
+
+
+def reconcile_counters(organization_ids=None):
+    """
+    Recount counter rows and repair those that drifted, creating missing ones.
+
+    Each repair only applies if the row still holds the values it was
+    compared with, so a change racing with the reconciler is not lost; that
+    organization is checked again on the next run.
+
+    Returns the number of rows created or repaired.
+    """
+    today = timezone.localdate()
+    now = timezone.now()
+    expected = count_counters(organization_ids, today)
+    names = _counter_names()
+    stored = {
+        row['organization_id']: row
+        for row in OrgCounters.objects.filter(organization_id__in=list(expected)).values(
+            'organization_id', 'day', *names
+        )
+    }
+
+    missing = [
+        OrgCounters(organization_id=organization_id, day=today, reconciled_at=now, **counts)
+        for organization_id, counts in expected.items()
+        if organization_id not in stored
+    ]
+    repaired = len(OrgCounters.objects.bulk_create(missing, ignore_conflicts=True))
+    for organization_id, row in stored.items():
+        current = {name: row[name] for name in names}
+        if row['day'] != today:
+            current.update((name, 0) for name in OrgCounters.DAILY_COUNTERS)
+        if current != expected[organization_id]:
+            repaired += OrgCounters.objects.filter(**row).update(
+                day=today, reconciled_at=now, **expected[organization_id]
+            )
+    if repaired:
+        logger.warning(f"Repaired {repaired} organization counter rows")
+    return repaired
+
+
+def read_counters(organization_id):
+    """The organization's counter row with its organization, counted first if missing."""
+    counters = OrgCounters.objects.select_related('organization').filter(organization_id=organization_id).first()
+    if counters is None:
+        reconcile_counters([organization_id])
+        counters = OrgCounters.objects.select_related('organization').get(organization_id=organization_id)
+    return counters
+
+
+def connect_signals():
+    track_changes('org_counters', COUNTED, apply_changes)
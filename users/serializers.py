@@ -63,34 +63,146 @@ class OrganizationSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
-class GeofenceSerializer(serializers.ModelSerializer):
+class GeofenceOverlapValidationMixin:
+    """
+    Rejects active geofences that overlap another active geofence of the same
+    organization unless ``allow_overlap`` is set. Updates are only checked
+    when they change the polygon, the active flag or the organization, so a
+    fence that already overlapped can still be renamed.
+    """
+    
+    def validate(self, attrs):
+        from .geofence_overlap import overlapping_geofences
+        
+        attrs = super().validate(attrs)
+        allow_overlap = attrs.pop('allow_overlap', False)
+        instance = getattr(self, 'instance', None)
+        if instance is not None and not {'polygon_json', 'active', 'organization'} & set(attrs):
+            return attrs
+        
+        active = attrs.get('active', instance.active if instance else True)
+        polygon_json = attrs.get('polygon_json', instance.polygon_json if instance else None)
+        organization = attrs.get('organization', instance.organization if instance else None)
+        # SUB_ADMIN geofences are always saved into their own organization
+        request = self.context.get('request')
+        if request and getattr(request.user, 'role', None) == 'SUB_ADMIN' and request.user.organization:
+            organization = request.user.organization
+        
+        if allow_overlap or not active or organization is None or polygon_json is None:
+            return attrs
+        
+        conflicts = overlapping_geofences(
+            Geofence(polygon_json=polygon_json).get_polygon_coordinates(),
+            organization.id,
+            exclude_id=instance.id if instance else None
+        )
+        if conflicts:
+            raise serializers.ValidationError({
+                'polygon_json': [
+                    "Geofence overlaps existing geofences: "
+                    + ', '.join(f"{geofence.name} (#{geofence.id})" for geofence in conflicts)
+                    + ". Set allow_overlap to save it anyway."
+                ]
+            })
+        return attrs
+
+
+class GeofencePolygonField(serializers.JSONField):
+    """
+    polygon_json, served as the precomputed simplified polygon when the
+    context asks for a detail level, without reading the full polygon.
+    Rows not yet simplified (see backfill_geofence_geometry) serve None
+    when the list deferred polygon_json, instead of loading it row by row.
+    """
+    
+    def get_attribute(self, instance):
+        detail = self.context.get('detail')
+        if detail and detail != 'full':
+            simplified = (instance.simplified_polygons or {}).get(detail)
+            if simplified:
+                return simplified
+            if 'polygon_json' in instance.get_deferred_fields():
+                return None
+        return super().get_attribute(instance)
+
+
+class GeofenceSerializer(GeofenceOverlapValidationMixin, serializers.ModelSerializer):
+    polygon_json = GeofencePolygonField(help_text="GeoJSON polygon coordinates")
     organization_name = serializers.CharField(source='organization.name', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     center_point = serializers.SerializerMethodField()
+    bbox = serializers.SerializerMethodField()
+    allow_overlap = serializers.BooleanField(write_only=True, required=False, default=False)
     
     class Meta:
         model = Geofence
         fields = (
             'id', 'name', 'description', 'polygon_json', 'organization', 
             'organization_name', 'active', 'created_by_username', 
-            'created_at', 'updated_at', 'center_point'
+            'created_at', 'updated_at', 'center_point', 'bbox',
+            'area_sq_m', 'vertex_count', 'allow_overlap'
+        )
+        read_only_fields = (
+            'id', 'created_by_username', 'created_at', 'updated_at', 'center_point',
+            'bbox', 'area_sq_m', 'vertex_count'
         )
-        read_only_fields = ('id', 'created_by_username', 'created_at', 'updated_at', 'center_point')
     
     def get_center_point(self, obj):
+        # The area centroid stored on save; it replaced the vertex mean, which
+        # drifts toward densely digitized edges. Only rows that predate it use the mean
+        if obj.centroid_lat is not None and obj.centroid_lng is not None:
+            return [obj.centroid_lng, obj.centroid_lat]
+        if 'polygon_json' in obj.get_deferred_fields():
+            # Loading the deferred polygon here would cost one query per row
+            return None
         return obj.get_center_point()
+    
+    def get_bbox(self, obj):
+        if obj.bbox_min_lat is None:
+            return None
+        return [obj.bbox_min_lng, obj.bbox_min_lat, obj.bbox_max_lng, obj.bbox_max_lat]
 
 
-class GeofenceCreateSerializer(serializers.ModelSerializer):
+class GeofenceCreateSerializer(GeofenceOverlapValidationMixin, serializers.ModelSerializer):
+    allow_overlap = serializers.BooleanField(write_only=True, required=False, default=False)
+    
     class Meta:
         model = Geofence
-        fields = ('name', 'description', 'polygon_json', 'organization', 'active')
+        fields = ('name', 'description', 'polygon_json', 'organization', 'active', 'allow_overlap')
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
 
 
+class GeofenceBatchPointSerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class GeofenceBatchContainsSerializer(serializers.Serializer):
+    """Serializer for batch point-in-geofence checks"""
+    points = GeofenceBatchPointSerializer(many=True, allow_empty=False, max_length=50000)
+    geofence_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False
+    )
+    include_inactive = serializers.BooleanField(default=False)
+    matrix = serializers.BooleanField(default=False)
+
+
+class GeofenceImportSerializer(serializers.Serializer):
+    """Serializer for GeoJSON FeatureCollection geofence imports"""
+    file = serializers.FileField()
+    organization = serializers.PrimaryKeyRelatedField(
+        queryset=Organization.objects.all(),
+        required=False
+    )
+    strict = serializers.BooleanField(default=False)
+    allow_overlap = serializers.BooleanField(default=False)
+
+
 class UserListSerializer(serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', read_only=True)
     
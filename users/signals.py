@@ -0,0 +1,40 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Geofence
+from .geofence_index import geofence_index
+from .geofence_cells import rebuild_geofence_cells
+from .live_board import connect_signals as connect_live_board_signals
+from .org_counters import connect_signals as connect_org_counter_signals
+
+
+@receiver(post_save, sender=Geofence)
+def invalidate_geofence_index_on_save(sender, instance, **kwargs):
+    """
+    Drop the in-process spatial index when a geofence is created or edited
+    """
+    geofence_index.invalidate()
+
+
+@receiver(post_delete, sender=Geofence)
+def invalidate_geofence_index_on_delete(sender, instance, **kwargs):
+    """
+    Drop the in-process spatial index when a geofence is deleted
+    """
+    geofence_index.invalidate()
+
+
+@receiver(post_save, sender=Geofence)
+def rasterize_geofence_cells_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Rebuild the geohash cell rows when a geofence polygon is written
+    """
+    if not created and not instance.polygon_changed(update_fields):
+        return
+    rebuild_geofence_cells(instance)
+
+
+# Saves and deletes behind the sub-admin live board KPIs, including security_app's SOS alerts and cases
+connect_live_board_signals()
+
+# Saves and deletes behind the OrgCounters running totals
+connect_org_counter_signals()
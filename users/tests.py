@@ -1,6 +1,8 @@
 import pytest
 import json
 from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
@@ -10,6 +12,7 @@ from factory import Faker, SubFactory, LazyAttribute
 from factory.django import DjangoModelFactory
 from unittest.mock import patch, MagicMock
 import tempfile
+import io
 import os
 
 from users.models import User, Organization, Geofence, Alert, GlobalReport
@@ -18,6 +21,9 @@ from users.utils import sanitize_string, validate_email, validate_username, vali
 
 User = get_user_model()
 
+# Wall-clock assertions depend on the machine; run them with RUN_BENCHMARKS=1
+benchmark = pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run timing benchmarks')
+
 
 # Factory Classes
 class OrganizationFactory(DjangoModelFactory):
@@ -440,6 +446,8 @@ class ReportAPITest(APITestCase):
 
 class DashboardKPITest(APITestCase):
     def setUp(self):
+        from core.cache import view_cache
+        view_cache.clear()
         self.organization = OrganizationFactory()
         self.super_admin = SuperAdminFactory()
         self.sub_admin = SubAdminFactory(organization=self.organization)
@@ -473,6 +481,295 @@ class DashboardKPITest(APITestCase):
         self.assertGreaterEqual(kpis['active_geofences'], 1)  # At least their geofence
 
 
+class DashboardKPIQueryTest(APITestCase):
+    def setUp(self):
+        from users.models import Incident, SecurityOfficer
+        from core.cache import view_cache
+        
+        view_cache.clear()
+        self.organization = Organization.objects.create(name='North Campus')
+        self.other_organization = Organization.objects.create(name='South Campus')
+        self.super_admin = User.objects.create_user(
+            username='root', email='root@example.com', password='pass12345', role='SUPER_ADMIN'
+        )
+        self.sub_admin = User.objects.create_user(
+            username='subadmin', email='subadmin@example.com', password='pass12345',
+            role='SUB_ADMIN', organization=self.organization
+        )
+        self.geofence = Geofence.objects.create(
+            name='Campus', polygon_json=square_polygon(73.85, 18.52, 0.01), organization=self.organization
+        )
+        other_geofence = Geofence.objects.create(
+            name='Other', polygon_json=square_polygon(73.85, 18.52, 0.01), organization=self.other_organization
+        )
+        for geofence, severity in ((self.geofence, 'CRITICAL'), (self.geofence, 'LOW'), (other_geofence, 'CRITICAL')):
+            Alert.objects.create(
+                geofence=geofence, user=self.sub_admin, alert_type='GEOFENCE_ENTER', severity=severity, title='Entry'
+            )
+        # Yesterday's alert is not counted as today's
+        from datetime import timedelta
+        from django.utils import timezone
+        yesterday = Alert.objects.create(
+            geofence=self.geofence, user=self.sub_admin, alert_type='GEOFENCE_EXIT', severity='HIGH',
+            title='Exit', is_resolved=True
+        )
+        Alert.objects.filter(pk=yesterday.pk).update(created_at=timezone.now() - timedelta(days=1))
+        SecurityOfficer.objects.create(
+            name='Asha', contact='9999999999', email='asha@example.com', organization=self.organization
+        )
+        Incident.objects.create(geofence=self.geofence, title='Fence cut', details='North side', severity='CRITICAL')
+        from users.org_counters import reconcile_counters
+        reconcile_counters()
+    
+    def get_with_queries(self, user, url_name):
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, queries.captured_queries
+    
+    def test_super_admin_kpis_are_one_query(self):
+        kpis, queries = self.get_with_queries(self.super_admin, 'dashboard_kpis')
+        
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(kpis['alerts_today'], 3)
+        self.assertEqual(kpis['critical_alerts'], 2)
+        self.assertEqual(kpis['active_geofences'], 2)
+        self.assertEqual(kpis['total_users'], 2)
+        self.assertEqual(kpis['system_health'], 'Warning')
+    
+    def test_alerts_today_counts_the_local_day(self):
+        from datetime import timedelta
+        from users import kpis as kpi_queries
+        from users.kpis import today_range
+        
+        with self.settings(TIME_ZONE='Asia/Kolkata'):
+            start, _ = today_range()
+            # Both fall on the same UTC date; only the first is on the local day
+            after_midnight = Alert.objects.create(
+                geofence=self.geofence, user=self.sub_admin, alert_type='GEOFENCE_ENTER', title='Late'
+            )
+            before_midnight = Alert.objects.create(
+                geofence=self.geofence, user=self.sub_admin, alert_type='GEOFENCE_ENTER', title='Earlier'
+            )
+            Alert.objects.filter(pk=after_midnight.pk).update(created_at=start + timedelta(minutes=1))
+            Alert.objects.filter(pk=before_midnight.pk).update(created_at=start - timedelta(hours=1))
+            
+            kpis = kpi_queries.dashboard_kpis()
+        
+        self.assertEqual(kpis['alerts_today'], 4)
+    
+    def test_sub_admin_kpis_are_organization_scoped(self):
+        kpis, queries = self.get_with_queries(self.sub_admin, 'dashboard_kpis')
+        
+        # The organization's counters row
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(kpis['alerts_today'], 2)
+        self.assertEqual(kpis['critical_alerts'], 1)
+        self.assertEqual(kpis['active_geofences'], 1)
+        self.assertEqual(kpis['active_sub_admins'], 1)
+        self.assertEqual(kpis['total_users'], 1)
+    
+    def test_subadmin_dashboard_kpis(self):
+        kpis, queries = self.get_with_queries(self.sub_admin, 'subadmin_dashboard_kpis')
+        
+        # The organization's counters row, with the organization
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(kpis['total_officers'], 1)
+        self.assertEqual(kpis['incidents_today'], 1)
+        self.assertEqual(kpis['critical_incidents'], 1)
+        self.assertEqual(kpis['organization_name'], 'North Campus')
+    
+    def test_repeated_requests_are_cached_per_organization(self):
+        self.get_with_queries(self.sub_admin, 'dashboard_kpis')
+        kpis, queries = self.get_with_queries(self.sub_admin, 'dashboard_kpis')
+        
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(kpis['alerts_today'], 2)
+        
+        # The super admin's view of all organizations is cached separately
+        kpis, queries = self.get_with_queries(self.super_admin, 'dashboard_kpis')
+        self.assertEqual(kpis['alerts_today'], 3)
+    
+    def test_alert_summary_report_is_one_query(self):
+        self.client.force_authenticate(user=self.super_admin)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('generate_report'), {
+                'report_type': 'ALERT_SUMMARY',
+                'date_range_start': '2024-01-01T00:00:00Z',
+                'date_range_end': '2024-01-31T23:59:59Z',
+            }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        alert_queries = [query for query in queries.captured_queries if '"users_alert"' in query['sql']]
+        self.assertEqual(len(alert_queries), 1)
+        self.assertEqual(response.data['metrics']['critical_alerts'], 2)
+        self.assertEqual(response.data['metrics']['resolved_alerts'], 1)
+        self.assertEqual(response.data['metrics']['total_alerts'], 4)
+
+
+class OrgCountersTest(TestCase):
+    def setUp(self):
+        from users.org_counters import reconcile_counters
+        
+        self.organization = Organization.objects.create(name='North Campus')
+        self.other_organization = Organization.objects.create(name='South Campus')
+        self.sub_admin = User.objects.create_user(
+            username='subadmin', email='subadmin@example.com', password='pass12345',
+            role='SUB_ADMIN', organization=self.organization
+        )
+        self.geofence = Geofence.objects.create(
+            name='Campus', polygon_json=square_polygon(73.85, 18.52, 0.01), organization=self.organization
+        )
+        reconcile_counters()
+    
+    def counters(self, organization=None):
+        from users.models import OrgCounters
+        return OrgCounters.objects.get(organization=organization or self.organization).kpis()
+    
+    def create_alert(self, severity='CRITICAL', geofence=None):
+        return Alert.objects.create(
+            geofence=geofence or self.geofence, user=self.sub_admin, alert_type='GEOFENCE_ENTER',
+            severity=severity, title='Entry'
+        )
+    
+    def test_reconcile_creates_rows(self):
+        counters = self.counters()
+        self.assertEqual(counters['active_geofences'], 1)
+        self.assertEqual(counters['total_users'], 1)
+        self.assertEqual(counters['active_sub_admins'], 1)
+        self.assertEqual(self.counters(self.other_organization)['total_users'], 0)
+    
+    def test_alert_saves_and_deletes_move_counters(self):
+        alert = self.create_alert()
+        self.create_alert(severity='LOW')
+        counters = self.counters()
+        self.assertEqual(counters['alerts_today'], 2)
+        self.assertEqual(counters['unresolved_alerts'], 2)
+        self.assertEqual(counters['critical_alerts'], 1)
+        
+        alert.is_resolved = True
+        alert.save()
+        counters = self.counters()
+        self.assertEqual(counters['unresolved_alerts'], 1)
+        self.assertEqual(counters['critical_alerts'], 0)
+        self.assertEqual(counters['alerts_today'], 2)
+        
+        alert.delete()
+        self.assertEqual(self.counters()['alerts_today'], 1)
+    
+    def test_officers_users_and_geofences_move_counters(self):
+        from users.models import SecurityOfficer
+        
+        officer = SecurityOfficer.objects.create(
+            name='Asha', contact='9999999999', email='asha@example.com', organization=self.organization
+        )
+        officer.is_active = False
+        officer.save()
+        self.sub_admin.is_active = False
+        self.sub_admin.save()
+        self.geofence.organization = self.other_organization
+        self.geofence.save()
+        
+        counters = self.counters()
+        self.assertEqual(counters['total_officers'], 1)
+        self.assertEqual(counters['active_officers'], 0)
+        self.assertEqual(counters['active_sub_admins'], 0)
+        self.assertEqual(counters['total_users'], 1)
+        self.assertEqual(counters['active_geofences'], 0)
+        self.assertEqual(self.counters(self.other_organization)['active_geofences'], 1)
+    
+    def test_daily_counters_restart_on_a_new_day(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from users.models import OrgCounters
+        
+        self.create_alert()
+        OrgCounters.objects.filter(organization=self.organization).update(
+            day=timezone.localdate() - timedelta(days=1)
+        )
+        self.assertEqual(self.counters()['alerts_today'], 0)
+        
+        self.create_alert(severity='LOW')
+        counters = self.counters()
+        self.assertEqual(counters['alerts_today'], 1)
+        self.assertEqual(counters['unresolved_alerts'], 2)
+    
+    def test_rolled_back_changes_do_not_count(self):
+        from django.db import transaction
+        
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_alert()
+                raise RuntimeError
+        self.assertEqual(self.counters()['alerts_today'], 0)
+    
+    def test_bulk_created_rows_move_counters(self):
+        from users.geofence_import import import_geofences
+        from users.geofence_transitions import GeofenceTransitionDetector
+        
+        detector = GeofenceTransitionDetector(hysteresis_meters=0, dwell_seconds=0)
+        detector.process_fix(self.sub_admin, 18.60, 73.90)
+        detector.process_fix(self.sub_admin, 18.525, 73.855)
+        collection = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'properties': {'name': f'Gate {i}'},
+             'geometry': square_polygon(73.95 + i * 0.02, 18.6, 0.01)}
+            for i in range(2)
+        ]}
+        import_geofences(io.StringIO(json.dumps(collection)), self.organization)
+        
+        counters = self.counters()
+        self.assertEqual(counters['alerts_today'], 1)
+        self.assertEqual(counters['unresolved_alerts'], 1)
+        self.assertEqual(counters['active_geofences'], 3)
+        self.assertEqual(self.counters(self.other_organization)['active_geofences'], 0)
+    
+    def test_one_snapshot_receiver_per_model(self):
+        from django.db.models.signals import post_init
+        from users import kpis
+        
+        sync_receivers, _ = post_init._live_receivers(Geofence)
+        self.assertEqual(sync_receivers.count(kpis._remember), 1)
+        self.assertEqual(len(sync_receivers), len(set(sync_receivers)))
+        self.assertEqual(set(kpis._consumers['users.Geofence']), {'live_board', 'org_counters'})
+    
+    def test_reconcile_repairs_drift(self):
+        from users.org_counters import reconcile_counters
+        
+        self.create_alert()
+        # Bulk updates skip the signals
+        Alert.objects.update(is_resolved=True)
+        self.assertEqual(self.counters()['unresolved_alerts'], 1)
+        
+        self.assertEqual(reconcile_counters(), 1)
+        self.assertEqual(self.counters()['unresolved_alerts'], 0)
+        self.assertEqual(reconcile_counters(), 0)
+    
+    def test_missing_row_is_counted_on_read(self):
+        from users.models import OrgCounters
+        from users.org_counters import read_counters
+        
+        self.create_alert()
+        OrgCounters.objects.all().delete()
+        
+        counters = read_counters(self.organization.id)
+        self.assertEqual(counters.alerts_today, 1)
+        self.assertEqual(counters.organization.name, 'North Campus')
+    
+    def test_reconcile_command(self):
+        from django.core.management import call_command
+        
+        Alert.objects.bulk_create([
+            Alert(geofence=self.geofence, user=self.sub_admin, alert_type='GEOFENCE_ENTER', severity='HIGH', title='Entry')
+        ])
+        out = io.StringIO()
+        call_command('reconcile_org_counters', '--organization', str(self.organization.id), stdout=out)
+        
+        self.assertIn('Repaired 1 organization counters', out.getvalue())
+        self.assertEqual(self.counters()['unresolved_alerts'], 1)
+
+
 class PermissionTest(APITestCase):
     def setUp(self):
         self.organization = OrganizationFactory()
@@ -655,3 +952,991 @@ class PerformanceTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should complete within reasonable time
         self.assertLess(execution_time, 2.0)  # 2 seconds for listing
+
+
+def square_polygon(min_lng, min_lat, size):
+    """Build a closed square GeoJSON polygon"""
+    return {
+        'type': 'Polygon',
+        'coordinates': [[
+            [min_lng, min_lat],
+            [min_lng + size, min_lat],
+            [min_lng + size, min_lat + size],
+            [min_lng, min_lat + size],
+            [min_lng, min_lat],
+        ]]
+    }
+
+
+class GeofenceSpatialIndexTest(TestCase):
+    def setUp(self):
+        from users.geofence_index import geofence_index
+        self.index = geofence_index
+        self.organization = OrganizationFactory()
+        self.other_organization = OrganizationFactory()
+        self.campus = Geofence.objects.create(
+            name='Campus',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=self.organization
+        )
+        self.other = Geofence.objects.create(
+            name='Other',
+            polygon_json=square_polygon(73.85, 18.52, 0.02),
+            organization=self.other_organization
+        )
+    
+    def test_containing_point(self):
+        result = self.index.containing(18.525, 73.855)
+        self.assertCountEqual(result, [self.campus.id, self.other.id])
+    
+    def test_containing_filters_by_organization(self):
+        result = self.index.containing(18.525, 73.855, organization_id=self.organization.id)
+        self.assertEqual(result, [self.campus.id])
+    
+    def test_point_outside_polygon(self):
+        self.assertEqual(self.index.containing(18.535, 73.865, organization_id=self.organization.id), [])
+    
+    def test_polygon_hole_excluded(self):
+        polygon = square_polygon(10.0, 10.0, 1.0)
+        polygon['coordinates'].append(square_polygon(10.4, 10.4, 0.2)['coordinates'][0])
+        donut = Geofence.objects.create(name='Donut', polygon_json=polygon, organization=self.organization)
+        self.assertEqual(self.index.containing(10.1, 10.1), [donut.id])
+        self.assertEqual(self.index.containing(10.5, 10.5), [])
+    
+    def test_index_invalidated_on_save_and_delete(self):
+        self.assertIn(self.campus.id, self.index.containing(18.525, 73.855))
+        self.campus.active = False
+        self.campus.save()
+        self.assertNotIn(self.campus.id, self.index.containing(18.525, 73.855))
+        self.other.delete()
+        self.assertEqual(self.index.containing(18.525, 73.855), [])
+    
+    @pytest.mark.performance
+    @benchmark
+    def test_lookup_performance_with_many_geofences(self):
+        from users.geofence_index import GeofenceSpatialIndex
+        import time
+        
+        index = GeofenceSpatialIndex(cell_size=0.01, ttl_seconds=0)
+        rows = []
+        for i in range(10000):
+            min_lng = 70.0 + (i % 100) * 0.02
+            min_lat = 15.0 + (i // 100) * 0.02
+            rows.append((i, 1, square_polygon(min_lng, min_lat, 0.015)['coordinates']))
+        index.build(rows)
+        
+        start_time = time.perf_counter()
+        for i in range(1000):
+            index.containing(15.0 + (i % 100) * 0.02 + 0.005, 70.0 + (i % 100) * 0.02 + 0.005)
+        per_lookup = (time.perf_counter() - start_time) / 1000
+        
+        self.assertEqual(index.containing(15.005, 70.005), [0])
+        self.assertLess(per_lookup, 0.001)
+
+
+class GeofenceBatchContainsTest(APITestCase):
+    def setUp(self):
+        self.organization = OrganizationFactory()
+        self.sub_admin = SubAdminFactory(organization=self.organization)
+        self.campus = Geofence.objects.create(
+            name='Campus',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=self.organization
+        )
+        self.annex = Geofence.objects.create(
+            name='Annex',
+            polygon_json=square_polygon(73.855, 18.525, 0.01),
+            organization=self.organization
+        )
+        self.foreign = Geofence.objects.create(
+            name='Foreign',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=OrganizationFactory()
+        )
+    
+    def test_containment_matrix_matches_scalar_test(self):
+        import random
+        from users.geofence_batch import containment_matrix
+        from users.geometry import point_in_polygon
+        
+        polygon = square_polygon(0.0, 0.0, 1.0)
+        polygon['coordinates'].append(square_polygon(0.25, 0.25, 0.5)['coordinates'][0])
+        triangle = {'type': 'Polygon', 'coordinates': [[[0, 0], [2, 0], [1, 2], [0, 0]]]}
+        polygons = [polygon['coordinates'], triangle['coordinates'], []]
+        
+        rng = random.Random(7)
+        points = [(rng.uniform(-0.5, 2.5), rng.uniform(-0.5, 2.5)) for _ in range(500)]
+        matrix = containment_matrix(points, polygons)
+        
+        self.assertEqual(matrix.shape, (500, 3))
+        for row, (lat, lng) in enumerate(points):
+            for column, coordinates in enumerate(polygons):
+                self.assertEqual(bool(matrix[row, column]), point_in_polygon(lng, lat, coordinates))
+    
+    def test_batch_contains_endpoint(self):
+        self.client.force_authenticate(user=self.sub_admin)
+        data = {
+            'points': [
+                {'lat': 18.522, 'lng': 73.852},
+                {'lat': 18.527, 'lng': 73.857},
+                {'lat': 10.0, 'lng': 10.0},
+            ]
+        }
+        response = self.client.post(reverse('geofence-batch-contains'), data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.foreign.id, response.data['geofence_ids'])
+        self.assertEqual(response.data['results'][0], [self.campus.id])
+        self.assertCountEqual(response.data['results'][1], [self.campus.id, self.annex.id])
+        self.assertEqual(response.data['results'][2], [])
+    
+    def test_batch_contains_prefilters_by_cells(self):
+        from users.models import GeofenceCell
+        
+        # Between the two fences: inside the bbox of all points, but under no cell of the annex
+        self.client.force_authenticate(user=self.sub_admin)
+        data = {'points': [{'lat': 18.522, 'lng': 73.852}, {'lat': 10.0, 'lng': 10.0}]}
+        response = self.client.post(reverse('geofence-batch-contains'), data, format='json')
+        self.assertEqual(response.data['geofence_ids'], [self.campus.id])
+        
+        # Fences without cells yet are always checked
+        GeofenceCell.objects.filter(geofence=self.annex).delete()
+        response = self.client.post(reverse('geofence-batch-contains'), data, format='json')
+        self.assertCountEqual(response.data['geofence_ids'], [self.campus.id, self.annex.id])
+        self.assertEqual(response.data['results'], [[self.campus.id], []])
+    
+    def test_cells_not_rebuilt_when_polygon_unchanged(self):
+        geofence = Geofence.objects.get(id=self.campus.id)
+        with patch('users.signals.rebuild_geofence_cells') as rebuild:
+            geofence.name = 'Renamed'
+            geofence.save()
+            geofence.active = False
+            geofence.save(update_fields=['active'])
+            self.assertFalse(rebuild.called)
+            
+            geofence.polygon_json = square_polygon(73.86, 18.52, 0.01)
+            geofence.save()
+            self.assertEqual(rebuild.call_count, 1)
+    
+    def test_batch_contains_matrix_output(self):
+        self.client.force_authenticate(user=self.sub_admin)
+        data = {
+            'points': [{'lat': 18.522, 'lng': 73.852}],
+            'geofence_ids': [self.annex.id],
+            'matrix': True
+        }
+        response = self.client.post(reverse('geofence-batch-contains'), data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['geofence_ids'], [self.annex.id])
+        self.assertEqual(response.data['matrix'], [[0]])
+
+
+class GeofenceGeometryTest(TestCase):
+    def setUp(self):
+        self.organization = OrganizationFactory()
+        self.geofence = Geofence.objects.create(
+            name='Campus',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=self.organization
+        )
+    
+    def test_geometry_computed_on_save(self):
+        self.assertAlmostEqual(self.geofence.bbox_min_lng, 73.85)
+        self.assertAlmostEqual(self.geofence.bbox_max_lat, 18.53)
+        self.assertAlmostEqual(self.geofence.centroid_lng, 73.855)
+        self.assertAlmostEqual(self.geofence.centroid_lat, 18.525)
+        self.assertEqual(self.geofence.vertex_count, 4)
+        # ~1.11 km x ~1.05 km at this latitude
+        self.assertAlmostEqual(self.geofence.area_sq_m / 1e6, 1.17, places=1)
+    
+    def test_geometry_updated_with_update_fields(self):
+        self.geofence.polygon_json = square_polygon(10.0, 20.0, 1.0)
+        self.geofence.save(update_fields=['polygon_json'])
+        self.geofence.refresh_from_db()
+        self.assertAlmostEqual(self.geofence.centroid_lat, 20.5)
+        self.assertAlmostEqual(self.geofence.bbox_max_lng, 11.0)
+    
+    def test_geometry_not_recomputed_when_polygon_unchanged(self):
+        geofence = Geofence.objects.get(id=self.geofence.id)
+        with patch.object(Geofence, 'update_geometry') as update_geometry:
+            geofence.name = 'Renamed'
+            geofence.save(update_fields=['name'])
+            geofence.active = False
+            geofence.save()
+            self.assertFalse(update_geometry.called)
+            
+            geofence.polygon_json = square_polygon(10.0, 20.0, 1.0)
+            geofence.save()
+            self.assertEqual(update_geometry.call_count, 1)
+    
+    def test_covering_point_queryset(self):
+        self.assertEqual(list(Geofence.objects.covering_point(18.525, 73.855)), [self.geofence])
+        self.assertFalse(Geofence.objects.covering_point(18.6, 73.855).exists())
+    
+    def test_serializer_uses_stored_centroid(self):
+        from users.serializers import GeofenceSerializer
+        
+        data = GeofenceSerializer(self.geofence).data
+        self.assertEqual(data['center_point'], [self.geofence.centroid_lng, self.geofence.centroid_lat])
+        self.assertEqual(data['vertex_count'], 4)
+        self.assertEqual(len(data['bbox']), 4)
+    
+    def test_center_point_is_area_centroid(self):
+        from users.serializers import GeofenceSerializer
+        
+        # Extra vertices along the bottom edge pull the vertex mean down, not the area centroid
+        ring = [[0.0, 0.0], [0.25, 0.0], [0.5, 0.0], [0.75, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]
+        geofence = Geofence.objects.create(
+            name='Dense edge', polygon_json={'type': 'Polygon', 'coordinates': [ring]}, organization=self.organization
+        )
+        
+        center_lng, center_lat = GeofenceSerializer(geofence).data['center_point']
+        self.assertAlmostEqual(center_lat, 0.5, places=3)
+        self.assertLess(geofence.get_center_point()[1], 0.3)
+    
+    def test_backfill_command(self):
+        from django.core.management import call_command
+        
+        Geofence.objects.filter(id=self.geofence.id).update(
+            bbox_min_lat=None, centroid_lat=None, centroid_lng=None, vertex_count=0
+        )
+        call_command('backfill_geofence_geometry', '--only-missing', stdout=io.StringIO())
+        self.geofence.refresh_from_db()
+        self.assertAlmostEqual(self.geofence.bbox_min_lat, 18.52)
+        self.assertAlmostEqual(self.geofence.centroid_lat, 18.525)
+        self.assertEqual(self.geofence.vertex_count, 4)
+
+
+class GeofenceTransitionDetectorTest(TestCase):
+    def setUp(self):
+        from users.geofence_transitions import GeofenceTransitionDetector
+        from django.utils import timezone
+        
+        self.organization = OrganizationFactory()
+        self.user = UserFactory(organization=self.organization)
+        self.geofence = Geofence.objects.create(
+            name='Campus',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=self.organization
+        )
+        self.start = timezone.now()
+        self.detector = GeofenceTransitionDetector(hysteresis_meters=0, dwell_seconds=0)
+    
+    def at(self, seconds):
+        from datetime import timedelta
+        return self.start + timedelta(seconds=seconds)
+    
+    def test_first_fix_is_baseline(self):
+        alerts = self.detector.process_fix(self.user, 18.525, 73.855, self.at(0))
+        self.assertEqual(alerts, [])
+        self.assertEqual(self.detector.current_geofences(self.user.id), {self.geofence.id})
+    
+    def test_enter_and_exit_create_alerts(self):
+        self.detector.process_fix(self.user, 18.60, 73.90, self.at(0))
+        entered = self.detector.process_fix(self.user, 18.525, 73.855, self.at(10))
+        exited = self.detector.process_fix(self.user, 18.60, 73.90, self.at(20))
+        
+        self.assertEqual([alert.alert_type for alert in entered], ['GEOFENCE_ENTER'])
+        self.assertEqual([alert.alert_type for alert in exited], ['GEOFENCE_EXIT'])
+        self.assertEqual(Alert.objects.filter(user=self.user, geofence=self.geofence).count(), 2)
+    
+    def test_hysteresis_ignores_fixes_near_boundary(self):
+        from users.geofence_transitions import GeofenceTransitionDetector
+        
+        detector = GeofenceTransitionDetector(hysteresis_meters=50, dwell_seconds=0)
+        detector.process_fix(self.user, 18.525, 73.84, self.at(0))
+        # ~10 m inside the western edge
+        self.assertEqual(detector.process_fix(self.user, 18.525, 73.8501, self.at(10)), [])
+        alerts = detector.process_fix(self.user, 18.525, 73.852, self.at(20))
+        self.assertEqual([alert.alert_type for alert in alerts], ['GEOFENCE_ENTER'])
+    
+    def test_dwell_time_suppresses_jitter(self):
+        from users.geofence_transitions import GeofenceTransitionDetector
+        
+        detector = GeofenceTransitionDetector(hysteresis_meters=0, dwell_seconds=30)
+        detector.process_fix(self.user, 18.60, 73.90, self.at(0))
+        self.assertEqual(detector.process_fix(self.user, 18.525, 73.855, self.at(10)), [])
+        # Jumped back out before the dwell elapsed: pending entry is discarded
+        self.assertEqual(detector.process_fix(self.user, 18.60, 73.90, self.at(20)), [])
+        self.assertEqual(detector.process_fix(self.user, 18.525, 73.855, self.at(30)), [])
+        alerts = detector.process_fix(self.user, 18.525, 73.855, self.at(61))
+        self.assertEqual([alert.alert_type for alert in alerts], ['GEOFENCE_ENTER'])
+    
+    def test_batch_of_fixes_uses_single_insert(self):
+        other_user = UserFactory(organization=self.organization)
+        self.detector.process_fixes([
+            (self.user, 18.60, 73.90, self.at(0)),
+            (other_user, 18.60, 73.90, self.at(0)),
+        ])
+        # The geofences, the insert and the organization's counters
+        with self.assertNumQueries(3):
+            alerts = self.detector.process_fixes([
+                (self.user, 18.525, 73.855, self.at(10)),
+                (other_user, 18.525, 73.855, self.at(10)),
+            ])
+        self.assertEqual(len(alerts), 2)
+
+
+class GeofenceCellTest(TestCase):
+    def setUp(self):
+        self.organization = OrganizationFactory()
+        polygon = square_polygon(73.85, 18.52, 0.01)
+        polygon['coordinates'].append(square_polygon(73.853, 18.523, 0.004)['coordinates'][0])
+        self.geofence = Geofence.objects.create(
+            name='Campus',
+            polygon_json=polygon,
+            organization=self.organization
+        )
+    
+    def test_geohash_encode(self):
+        from users import geohash
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+    
+    def test_cells_written_on_save(self):
+        cells = self.geofence.cells.all()
+        self.assertTrue(cells.filter(is_interior=True).exists())
+        self.assertTrue(cells.filter(is_interior=False).exists())
+    
+    def test_cell_lookup_matches_exact_test(self):
+        import random
+        from users.geofence_cells import geofences_containing
+        from users.geometry import point_in_polygon
+        
+        coordinates = self.geofence.get_polygon_coordinates()
+        rng = random.Random(3)
+        for _ in range(200):
+            lat = rng.uniform(18.515, 18.535)
+            lng = rng.uniform(73.845, 73.865)
+            expected = [self.geofence.id] if point_in_polygon(lng, lat, coordinates) else []
+            self.assertEqual(geofences_containing(lat, lng), expected)
+    
+    def test_cell_lookup_is_single_query(self):
+        from users.geofence_cells import geofences_containing
+        
+        with self.assertNumQueries(1):
+            result = geofences_containing(18.5215, 73.8515, organization_id=self.organization.id)
+        self.assertEqual(result, [self.geofence.id])
+    
+    def test_cells_not_rebuilt_for_unrelated_update(self):
+        cell_ids = set(self.geofence.cells.values_list('id', flat=True))
+        self.geofence.name = 'Renamed'
+        self.geofence.save(update_fields=['name'])
+        self.assertEqual(set(self.geofence.cells.values_list('id', flat=True)), cell_ids)
+    
+    def test_large_geofence_covering_is_capped(self):
+        from users.geofence_cells import rasterize_polygon
+        
+        cells = rasterize_polygon(square_polygon(10.0, 10.0, 1.0)['coordinates'], precision=7, max_cells=2000)
+        self.assertLessEqual(len(cells), 2000)
+        self.assertTrue(any(is_interior for _, is_interior in cells))
+
+
+class GeofenceLevelOfDetailTest(APITestCase):
+    def setUp(self):
+        import math
+        
+        self.organization = OrganizationFactory()
+        self.sub_admin = SubAdminFactory(organization=self.organization)
+        # ~1 km radius circle with 2000 vertices
+        ring = [
+            [73.85 + 0.01 * math.cos(2 * math.pi * i / 2000), 18.52 + 0.01 * math.sin(2 * math.pi * i / 2000)]
+            for i in range(2000)
+        ]
+        ring.append(ring[0])
+        self.geofence = Geofence.objects.create(
+            name='Circle',
+            polygon_json={'type': 'Polygon', 'coordinates': [ring]},
+            organization=self.organization
+        )
+        self.client.force_authenticate(user=self.sub_admin)
+    
+    def test_simplified_levels_precomputed_on_save(self):
+        from users.geometry import polygon_vertex_count
+        
+        levels = self.geofence.simplified_polygons
+        self.assertEqual(set(levels), set(Geofence.DETAIL_LEVELS))
+        counts = {level: polygon_vertex_count(levels[level]['coordinates']) for level in levels}
+        self.assertLess(counts['low'], counts['medium'])
+        self.assertLess(counts['medium'], counts['high'])
+        self.assertLess(counts['high'], 2000)
+        for level in levels:
+            ring = levels[level]['coordinates'][0]
+            self.assertEqual(ring[0], ring[-1])
+            self.assertGreaterEqual(len(ring), 4)
+    
+    def test_simplified_ring_stays_within_tolerance(self):
+        from users.geometry import distance_to_polygon_boundary_m
+        
+        simplified = self.geofence.simplified_polygons['low']['coordinates']
+        for lng, lat in self.geofence.get_polygon_coordinates()[0][::50]:
+            self.assertLess(distance_to_polygon_boundary_m(lng, lat, simplified), 60)
+    
+    def test_list_serves_requested_detail(self):
+        url = reverse('geofence-list')
+        response = self.client.get(url, {'detail': 'low'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        polygon = response.data['results'][0]['polygon_json']
+        self.assertEqual(polygon, self.geofence.simplified_polygons['low'])
+        
+        response = self.client.get(url, {'zoom': 16})
+        polygon = response.data['results'][0]['polygon_json']
+        self.assertEqual(polygon, self.geofence.simplified_polygons['high'])
+    
+    def test_list_defaults_to_full_polygon(self):
+        response = self.client.get(reverse('geofence-list'))
+        self.assertEqual(len(response.data['results'][0]['polygon_json']['coordinates'][0]), 2001)
+    
+    def test_list_loads_only_the_served_polygon_column(self):
+        for detail, skipped in (('low', '"polygon_json"'), ('full', '"simplified_polygons"')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('geofence-list'), {'detail': detail})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(any(skipped in query['sql'] for query in queries.captured_queries), detail)
+    
+    def test_unbackfilled_rows_do_not_load_the_deferred_polygon(self):
+        def list_queries(count):
+            Geofence.objects.filter(organization=self.organization).update(
+                simplified_polygons={}, centroid_lat=None, centroid_lng=None
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('geofence-list'), {'detail': 'low'})
+            self.assertEqual(len(response.data['results']), count)
+            return response, len(queries)
+        
+        response, one_row = list_queries(1)
+        self.assertIsNone(response.data['results'][0]['polygon_json'])
+        self.assertIsNone(response.data['results'][0]['center_point'])
+        for i in range(4):
+            Geofence.objects.create(
+                name=f'Square {i}', polygon_json=square_polygon(74.0 + i * 0.02, 18.52, 0.01),
+                organization=self.organization
+            )
+        _, five_rows = list_queries(5)
+        self.assertEqual(one_row, five_rows)
+    
+    def test_retrieve_always_returns_full_polygon(self):
+        url = reverse('geofence-detail', args=[self.geofence.id])
+        response = self.client.get(url, {'detail': 'low'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['polygon_json']['coordinates'][0]), 2001)
+    
+    def test_invalid_detail_rejected(self):
+        response = self.client.get(reverse('geofence-list'), {'detail': 'tiny'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GeofenceImportTest(APITestCase):
+    def setUp(self):
+        self.organization = OrganizationFactory()
+        self.sub_admin = SubAdminFactory(organization=self.organization)
+    
+    def feature_collection(self, count=3, extra=None):
+        features = [
+            {
+                'type': 'Feature',
+                'properties': {'name': f'Zone {i}'},
+                'geometry': square_polygon(73.85 + i * 0.02, 18.52, 0.01),
+            }
+            for i in range(count)
+        ]
+        features.extend(extra or [])
+        return json.dumps({'type': 'FeatureCollection', 'name': 'campus', 'features': features})
+    
+    def test_streaming_parser_handles_chunk_boundaries(self):
+        from users.geofence_import import iter_features
+        
+        payload = self.feature_collection(count=5)
+        features = list(iter_features(io.BytesIO(payload.encode()), read_size=7))
+        self.assertEqual([f['properties']['name'] for f in features], [f'Zone {i}' for i in range(5)])
+    
+    def test_parser_rejects_non_feature_collection(self):
+        from users.geofence_import import GeofenceImportError, iter_features
+        
+        with self.assertRaises(GeofenceImportError):
+            list(iter_features(io.StringIO('{"type": "Feature", "features": []}')))
+        with self.assertRaises(GeofenceImportError):
+            list(iter_features(io.StringIO('{"type": "FeatureCollection", "features": [{"type": ')))
+    
+    def test_parser_bounds_unterminated_values(self):
+        from users.geofence_import import GeofenceImportError, iter_features
+        
+        class EndlessString:
+            """A feature whose string value never ends."""
+            reads = 0
+            
+            def read(self, size):
+                self.reads += 1
+                return '{"features": ["' if self.reads == 1 else 'x' * size
+        
+        stream = EndlessString()
+        with self.assertRaises(GeofenceImportError):
+            list(iter_features(stream, read_size=64, max_feature_chars=1000))
+        self.assertLess(stream.reads, 20)
+    
+    def test_active_property_is_parsed_strictly(self):
+        from users.geofence_import import import_geofences
+        
+        def feature(i, active):
+            return {
+                'type': 'Feature',
+                'properties': {'name': f'Flag {i}', 'active': active},
+                'geometry': square_polygon(74.5 + i * 0.02, 18.52, 0.01),
+            }
+        
+        values = [False, 'false', '0', 'No', True, 'yes', 'maybe', 0, None]
+        payload = self.feature_collection(count=0, extra=[feature(i, v) for i, v in enumerate(values)])
+        report = import_geofences(io.StringIO(payload), self.organization)
+        
+        self.assertEqual([error['index'] for error in report['errors']], [6, 7, 8])
+        self.assertIn('properties.active', report['errors'][0]['error'])
+        active = dict(Geofence.objects.filter(organization=self.organization).values_list('name', 'active'))
+        self.assertEqual(active, {
+            'Flag 0': False, 'Flag 1': False, 'Flag 2': False, 'Flag 3': False, 'Flag 4': True, 'Flag 5': True,
+        })
+    
+    def test_rings_are_closed_and_wound(self):
+        from users.geofence_import import normalize_polygon
+        from users.geometry import _ring_signed_area
+        
+        # Clockwise exterior without a closing position
+        rings = normalize_polygon({
+            'type': 'Polygon',
+            'coordinates': [
+                [[0, 0], [0, 1], [1, 1], [1, 0]],
+                [[0.2, 0.2], [0.8, 0.2], [0.8, 0.8], [0.2, 0.8], [0.2, 0.2]],
+            ]
+        })
+        self.assertEqual(rings[0][0], rings[0][-1])
+        self.assertGreater(_ring_signed_area(rings[0]), 0)
+        self.assertLess(_ring_signed_area(rings[1]), 0)
+    
+    def test_self_intersecting_ring_rejected(self):
+        from users.geofence_import import GeofenceImportError, normalize_polygon
+        
+        bowtie = {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]}
+        with self.assertRaises(GeofenceImportError):
+            normalize_polygon(bowtie)
+    
+    def test_import_reports_per_feature_errors(self):
+        from users.geofence_import import import_geofences
+        
+        invalid = [
+            {'type': 'Feature', 'properties': {'name': 'Line'}, 'geometry': {'type': 'LineString', 'coordinates': []}},
+            {'type': 'Feature', 'properties': {}, 'geometry': square_polygon(0, 0, 1)},
+        ]
+        payload = self.feature_collection(count=5, extra=invalid)
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_geofences(io.StringIO(payload), self.organization, chunk_size=2)
+        
+        self.assertEqual(report['total'], 7)
+        self.assertEqual(report['created'], 5)
+        self.assertEqual([error['index'] for error in report['errors']], [5, 6])
+        geofence = Geofence.objects.get(name='Zone 0')
+        self.assertIsNotNone(geofence.bbox_min_lat)
+        self.assertTrue(geofence.cells.exists())
+        self.assertTrue(geofence.simplified_polygons)
+    
+    def test_malformed_features_are_reported_not_raised(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        
+        malformed = [
+            {'type': 'Feature', 'properties': 'Gate', 'geometry': square_polygon(0, 0, 1)},
+            {'type': 'Feature', 'properties': ['Gate'], 'geometry': square_polygon(0, 0, 1)},
+            ['Feature'],
+        ]
+        self.client.force_authenticate(user=self.sub_admin)
+        upload = SimpleUploadedFile('zones.geojson', self.feature_collection(count=1, extra=malformed).encode())
+        response = self.client.post(reverse('geofence-import-geojson'), {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(response.data['errors'][0]['error'], 'Feature properties must be an object')
+        self.assertIsNone(response.data['errors'][0]['name'])
+    
+    def test_overlapping_features_are_reported(self):
+        from users.geofence_import import import_geofences
+        
+        existing = Geofence.objects.create(
+            name='Campus', polygon_json=square_polygon(73.85, 18.52, 0.01), organization=self.organization
+        )
+        overlapping = [
+            {'type': 'Feature', 'properties': {'name': 'Annex'}, 'geometry': square_polygon(73.855, 18.52, 0.01)},
+            {'type': 'Feature', 'properties': {'name': 'Annex copy'}, 'geometry': square_polygon(73.915, 18.52, 0.01)},
+            {'type': 'Feature', 'properties': {'name': 'Inactive', 'active': False},
+             'geometry': square_polygon(73.85, 18.52, 0.01)},
+        ]
+        # Zone 0 and the annex overlap the campus, the copy overlaps zone 3
+        payload = self.feature_collection(count=4, extra=overlapping)
+        report = import_geofences(io.StringIO(payload), self.organization)
+        
+        self.assertEqual(report['created'], 4)
+        self.assertEqual([error['index'] for error in report['errors']], [0, 4, 5])
+        self.assertIn(f'Campus (#{existing.id})', report['errors'][0]['error'])
+        self.assertIn('Zone 3 (feature 3)', report['errors'][2]['error'])
+        
+        Geofence.objects.exclude(pk=existing.pk).delete()
+        report = import_geofences(io.StringIO(payload), self.organization, allow_overlap=True)
+        self.assertEqual(report['created'], 7)
+    
+    def test_import_query_count_does_not_grow_per_row(self):
+        from users.geofence_import import import_geofences
+        
+        def geofence_inserts(count):
+            with CaptureQueriesContext(connection) as queries:
+                import_geofences(io.StringIO(self.feature_collection(count=count)), self.organization, chunk_size=100)
+            return [q for q in queries if q['sql'].startswith('INSERT INTO "users_geofence"')]
+        
+        self.assertEqual(len(geofence_inserts(2)), len(geofence_inserts(40)))
+    
+    def test_strict_import_writes_nothing_on_error(self):
+        from users.geofence_import import import_geofences
+        
+        payload = self.feature_collection(count=3, extra=[{'type': 'Feature', 'properties': {}, 'geometry': None}])
+        report = import_geofences(io.StringIO(payload), self.organization, strict=True)
+        self.assertEqual(report['created'], 0)
+        self.assertEqual(report['failed'], 1)
+        self.assertFalse(Geofence.objects.filter(organization=self.organization).exists())
+    
+    def test_import_endpoint_uses_sub_admin_organization(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        
+        self.client.force_authenticate(user=self.sub_admin)
+        upload = SimpleUploadedFile('zones.geojson', self.feature_collection(count=2).encode())
+        response = self.client.post(
+            reverse('geofence-import-geojson'),
+            {'file': upload, 'organization': OrganizationFactory().id},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Geofence.objects.filter(organization=self.organization).count(), 2)
+    
+    def test_import_command(self):
+        from django.core.management import call_command
+        
+        with tempfile.NamedTemporaryFile('w', suffix='.geojson', delete=False) as handle:
+            handle.write(self.feature_collection(count=3))
+        out = io.StringIO()
+        call_command('import_geofences', handle.name, organization=self.organization.id, stdout=out)
+        self.assertIn('Imported 3 of 3 geofences', out.getvalue())
+
+
+class GeofenceOverlapTest(APITestCase):
+    def setUp(self):
+        self.organization = OrganizationFactory()
+        self.sub_admin = SubAdminFactory(organization=self.organization)
+        self.campus = Geofence.objects.create(
+            name='Campus',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=self.organization
+        )
+        self.client.force_authenticate(user=self.sub_admin)
+    
+    def test_polygons_overlap_cases(self):
+        from users.geofence_overlap import polygons_overlap
+        
+        base = square_polygon(0.0, 0.0, 1.0)['coordinates']
+        self.assertTrue(polygons_overlap(base, square_polygon(0.5, 0.5, 1.0)['coordinates']))
+        self.assertTrue(polygons_overlap(base, square_polygon(0.25, 0.25, 0.5)['coordinates']))
+        self.assertTrue(polygons_overlap(base, square_polygon(0.0, 0.0, 1.0)['coordinates']))
+        # Sharing an edge or sitting inside a hole is not an overlap
+        self.assertFalse(polygons_overlap(base, square_polygon(1.0, 0.0, 1.0)['coordinates']))
+        self.assertFalse(polygons_overlap(base, square_polygon(2.0, 2.0, 1.0)['coordinates']))
+        holed = base + [square_polygon(0.2, 0.2, 0.6)['coordinates'][0]]
+        self.assertFalse(polygons_overlap(holed, square_polygon(0.3, 0.3, 0.2)['coordinates']))
+        # A cross shape overlaps without either containing a vertex of the other
+        tall = [[[0.4, -1.0], [0.6, -1.0], [0.6, 2.0], [0.4, 2.0], [0.4, -1.0]]]
+        self.assertTrue(polygons_overlap(base, tall))
+    
+    def test_overlaps_with_only_touching_or_collinear_contacts(self):
+        from users.geofence_overlap import polygons_overlap
+        
+        def rectangle(min_lng, min_lat, max_lng, max_lat):
+            return [[[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]]]
+        
+        west = rectangle(73.0, 18.0, 73.02, 18.02)
+        # Half the area shared; every contact is collinear or at a vertex and each centroid is on the other's edge
+        self.assertTrue(polygons_overlap(west, rectangle(73.01, 18.0, 73.03, 18.02)))
+        self.assertTrue(polygons_overlap(rectangle(73.01, 18.0, 73.03, 18.02), west))
+        # Shared edge, in full or in part
+        self.assertFalse(polygons_overlap(west, rectangle(73.02, 18.0, 73.04, 18.02)))
+        self.assertFalse(polygons_overlap(west, rectangle(73.02, 18.01, 73.04, 18.03)))
+        # Identical polygons, also concave ones whose centroid lies outside
+        self.assertTrue(polygons_overlap(west, rectangle(73.0, 18.0, 73.02, 18.02)))
+        u_shape = [[
+            [73.0, 18.0], [73.03, 18.0], [73.03, 18.03], [73.02, 18.03], [73.02, 18.005],
+            [73.01, 18.005], [73.01, 18.03], [73.0, 18.03], [73.0, 18.0],
+        ]]
+        self.assertTrue(polygons_overlap(u_shape, [list(map(list, u_shape[0]))]))
+        # Filling the notch of the U only shares edges
+        self.assertFalse(polygons_overlap(u_shape, rectangle(73.01, 18.005, 73.02, 18.03)))
+    
+    def test_sweep_matches_brute_force(self):
+        import random
+        from itertools import combinations
+        from users.geofence_overlap import find_overlaps, polygons_overlap
+        
+        rng = random.Random(11)
+        fences = [
+            (i, square_polygon(rng.uniform(0, 1), rng.uniform(0, 1), rng.uniform(0.01, 0.1))['coordinates'], None)
+            for i in range(150)
+        ]
+        expected = sorted(
+            (a[0], b[0]) for a, b in combinations(fences, 2) if polygons_overlap(a[1], b[1])
+        )
+        self.assertTrue(expected)
+        self.assertEqual(find_overlaps(fences), expected)
+    
+    def test_candidate_pairs_scale_with_output(self):
+        from users.geofence_overlap import candidate_pairs
+        
+        # 10k disjoint cells on a 100x100 grid produce no candidate pairs
+        boxes = [(x, y, x + 0.5, y + 0.5) for x in range(100) for y in range(100)]
+        self.assertEqual(list(candidate_pairs(boxes)), [])
+    
+    def test_create_rejects_overlap(self):
+        url = reverse('geofence-list')
+        payload = {
+            'name': 'Annex',
+            'polygon_json': square_polygon(73.855, 18.525, 0.01),
+            'organization': self.organization.id,
+        }
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Campus', str(response.data['polygon_json']))
+        
+        payload['allow_overlap'] = True
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_create_allows_adjacent_and_other_organization(self):
+        url = reverse('geofence-list')
+        response = self.client.post(url, {
+            'name': 'Next door',
+            'polygon_json': square_polygon(73.86, 18.52, 0.01),
+            'organization': self.organization.id,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        other = Geofence.objects.create(
+            name='Other org',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=OrganizationFactory()
+        )
+        self.assertTrue(other.pk)
+    
+    def test_update_ignores_itself(self):
+        url = reverse('geofence-detail', args=[self.campus.id])
+        response = self.client.patch(url, {'polygon_json': square_polygon(73.85, 18.52, 0.012)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_renaming_an_overlapping_fence_is_allowed(self):
+        # Overlapped before the rule existed
+        annex = Geofence.objects.create(
+            name='Annex',
+            polygon_json=square_polygon(73.855, 18.525, 0.01),
+            organization=self.organization
+        )
+        url = reverse('geofence-detail', args=[annex.id])
+        
+        response = self.client.patch(url, {'name': 'East annex', 'description': 'Library side'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        annex.refresh_from_db()
+        self.assertEqual(annex.name, 'East annex')
+        
+        response = self.client.patch(url, {'polygon_json': square_polygon(73.856, 18.525, 0.01)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_overlap_audit_endpoint(self):
+        annex = Geofence.objects.create(
+            name='Annex',
+            polygon_json=square_polygon(73.855, 18.525, 0.01),
+            organization=self.organization
+        )
+        Geofence.objects.create(
+            name='Foreign',
+            polygon_json=square_polygon(73.85, 18.52, 0.01),
+            organization=OrganizationFactory()
+        )
+        response = self.client.get(reverse('geofence-overlaps'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            [geofence['id'] for geofence in response.data['overlaps'][0]['geofences']],
+            [self.campus.id, annex.id]
+        )
+
+
+class LiveBoardTest(TestCase):
+    def setUp(self):
+        from core.events import event_broker
+        from users.live_board import live_board
+        from users.models import SecurityOfficer
+        
+        self.broker = event_broker
+        self.board = live_board
+        self.broker.reset()
+        self.board.reset()
+        self.addCleanup(self.broker.reset)
+        self.addCleanup(self.board.reset)
+        self.organization = OrganizationFactory()
+        self.other_organization = OrganizationFactory()
+        self.sub_admin = User.objects.create_user(
+            username='subadmin', email='subadmin@example.com', password='pass12345',
+            role='SUB_ADMIN', organization=self.organization
+        )
+        self.caller = User.objects.create_user(
+            username='caller', email='caller@example.com', password='pass12345',
+            role='USER', organization=self.organization
+        )
+        self.geofence = Geofence.objects.create(
+            name='Campus', polygon_json=square_polygon(73.85, 18.52, 0.01), organization=self.organization
+        )
+        self.officer = SecurityOfficer.objects.create(
+            name='Asha', contact='9999999999', email='asha@example.com', organization=self.organization
+        )
+        self.board.ensure_loaded(self.organization.id)
+    
+    def kpis(self):
+        return self.board.snapshot(self.organization.id).data['kpis']
+    
+    def assert_matches_database(self):
+        from users.live_board import count_kpis
+        self.assertEqual(self.kpis(), count_kpis(self.organization.id))
+    
+    def test_snapshot_counts_organization(self):
+        kpis = self.kpis()
+        
+        self.assertEqual(kpis['active_geofences'], 1)
+        self.assertEqual(kpis['total_officers'], 1)
+        self.assertEqual(kpis['active_officers'], 1)
+        self.assertEqual(kpis['unresolved_incidents'], 0)
+        self.assertEqual(self.board.snapshot(self.organization.id).data['organization_name'], self.organization.name)
+    
+    def test_incident_lifecycle_updates_kpis(self):
+        from users.models import Incident
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            incident = Incident.objects.create(
+                geofence=self.geofence, title='Fence cut', details='North side', severity='CRITICAL'
+            )
+        self.assertEqual(self.kpis()['incidents_today'], 1)
+        self.assertEqual(self.kpis()['critical_incidents'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            incident.resolve(self.sub_admin)
+        self.assertEqual(self.kpis()['unresolved_incidents'], 0)
+        self.assertEqual(self.kpis()['critical_incidents'], 0)
+        self.assert_matches_database()
+    
+    def test_officers_geofences_and_notifications(self):
+        from users.models import Notification
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.officer.is_active = False
+            self.officer.save()
+            self.geofence.active = False
+            self.geofence.save()
+            notification = Notification.objects.create(
+                title='Drill', message='Fire drill at noon', organization=self.organization, created_by=self.sub_admin
+            )
+            notification.mark_as_sent()
+            # Another organization's rows leave this board alone
+            Geofence.objects.create(
+                name='Other', polygon_json=square_polygon(73.85, 18.52, 0.01), organization=self.other_organization
+            )
+        
+        kpis = self.kpis()
+        self.assertEqual(kpis['active_officers'], 0)
+        self.assertEqual(kpis['active_geofences'], 0)
+        self.assertEqual(kpis['notifications_sent_today'], 1)
+        self.assert_matches_database()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.officer.delete()
+        self.assertEqual(self.kpis()['total_officers'], 0)
+    
+    def test_sos_alerts_and_cases(self):
+        from security_app.models import Case, SOSAlert
+        
+        with self.settings(DISPATCH_AUTO_ASSIGN=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                alert = SOSAlert.objects.create(user=self.caller, location_lat=18.5, location_long=73.8)
+                case = Case.objects.create(sos_alert=alert, officer=self.officer, status='open')
+            self.assertEqual(self.kpis()['open_sos_alerts'], 1)
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                case.status = 'accepted'
+                case.save()
+            self.assertEqual(self.kpis()['active_cases'], 1)
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                case.status = 'resolved'
+                case.save()
+        
+        kpis = self.kpis()
+        self.assertEqual(kpis['active_cases'], 0)
+        self.assertEqual(kpis['open_sos_alerts'], 0)
+        self.assertEqual(kpis['sos_alerts_today'], 1)
+        self.assert_matches_database()
+    
+    def test_loaded_board_is_not_recounted(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.board.ensure_loaded(self.organization.id)
+            self.board.snapshot(self.organization.id)
+        
+        self.assertEqual(len(queries.captured_queries), 0)
+    
+    def test_resync_repairs_drift(self):
+        from users.models import SecurityOfficer
+        
+        # Bypasses the signals
+        SecurityOfficer.objects.filter(pk=self.officer.pk).update(is_active=False)
+        self.board.resync_seconds = 0
+        
+        self.board.ensure_loaded(self.organization.id)
+        
+        self.assertEqual(self.kpis()['active_officers'], 0)
+    
+    async def test_stream_sends_snapshot_then_deltas(self):
+        import asyncio
+        from asgiref.sync import sync_to_async
+        from rest_framework_simplejwt.tokens import AccessToken
+        from users.models import Incident
+        
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.sub_admin)))()
+        response = await self.async_client.get(
+            reverse('subadmin_live_board'), headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        snapshot = (await anext(stream)).decode()
+        self.assertIn('event: snapshot', snapshot)
+        self.assertIn('"active_geofences": 1', snapshot)
+        
+        def log_incident():
+            with self.captureOnCommitCallbacks(execute=True):
+                Incident.objects.create(geofence=self.geofence, title='Gate open', details='East gate')
+        
+        await sync_to_async(log_incident)()
+        delta = (await asyncio.wait_for(anext(stream), 1)).decode()
+        
+        self.assertIn('event: kpi_delta', delta)
+        self.assertIn('"changes": {"incidents_today": 1, "unresolved_incidents": 1}', delta)
+        await stream.aclose()
+    
+    async def test_stream_requires_sub_admin(self):
+        from asgiref.sync import sync_to_async
+        from rest_framework_simplejwt.tokens import AccessToken
+        
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.caller)))()
+        
+        response = await self.async_client.get(
+            reverse('subadmin_live_board'), headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = await self.async_client.get(reverse('subadmin_live_board'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -43,4 +43,5 @@ urlpatterns = [
     # Sub-Admin Panel specific endpoints
     path('subadmin/notifications/send/', views.send_notification, name='send_notification'),
     path('subadmin/dashboard-kpis/', views.subadmin_dashboard_kpis, name='subadmin_dashboard_kpis'),
+    path('subadmin/live-board/', views.SubAdminLiveBoardView.as_view(), name='subadmin_live_board'),
 ]
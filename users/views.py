@@ -1,18 +1,24 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
+from django.http import JsonResponse
+from django.views import View
+from asgiref.sync import sync_to_async
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
     OrganizationSerializer, GeofenceSerializer, GeofenceCreateSerializer,
+    GeofenceBatchContainsSerializer, GeofenceImportSerializer,
     UserListSerializer, AlertSerializer, AlertCreateSerializer,
     GlobalReportSerializer, GlobalReportCreateSerializer,
     SecurityOfficerSerializer, SecurityOfficerCreateSerializer,
@@ -22,8 +28,13 @@ from .serializers import (
     DiscountEmailSerializer, DiscountEmailCreateSerializer,
     UserReplySerializer, UserDetailsSerializer
 )
-from .models import User, Organization, Geofence, Alert, GlobalReport, SecurityOfficer, Incident, Notification, PromoCode, DiscountEmail, UserReply, UserDetails
+from .models import User, Organization, Geofence, GeofenceCell, Alert, GlobalReport, SecurityOfficer, Incident, Notification, PromoCode, DiscountEmail, UserReply, UserDetails
 from .permissions import IsSuperAdmin, IsSuperAdminOrSubAdmin, OrganizationIsolationMixin
+from .live_board import board_channel, live_board
+from . import kpis as kpi_queries
+from .org_counters import read_counters
+from core.cache import view_cache
+from core.events import authenticate_stream, event_broker, release_connection, stream_response
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -120,11 +131,51 @@ class GeofenceViewSet(OrganizationIsolationMixin, ModelViewSet):
     ordering_fields = ['name', 'created_at', 'updated_at']
     ordering = ['-created_at']
     
+    # Map zoom levels (slippy-map convention) to the coarsest detail that still renders cleanly
+    ZOOM_DETAIL_LEVELS = ((12, 'low'), (15, 'medium'), (17, 'high'))
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return GeofenceCreateSerializer
         return GeofenceSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Load only the polygon column the requested detail level serializes
+            if self.get_detail_level() == 'full':
+                queryset = queryset.defer('simplified_polygons')
+            else:
+                queryset = queryset.defer('polygon_json')
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Only list responses are simplified; retrieve always returns the full polygon
+        if self.action == 'list':
+            context['detail'] = self.get_detail_level()
+        return context
+    
+    def get_detail_level(self):
+        """Resolve ?detail= or ?zoom= to a detail level; defaults to the full polygon"""
+        detail = self.request.query_params.get('detail')
+        if detail:
+            if detail != 'full' and detail not in Geofence.DETAIL_LEVELS:
+                raise ValidationError({
+                    'detail': f"Must be one of: full, {', '.join(Geofence.DETAIL_LEVELS)}"
+                })
+            return detail
+        zoom = self.request.query_params.get('zoom')
+        if zoom:
+            try:
+                zoom = float(zoom)
+            except ValueError:
+                raise ValidationError({'zoom': 'Must be a number'})
+            for max_zoom, level in self.ZOOM_DETAIL_LEVELS:
+                if zoom <= max_zoom:
+                    return level
+        return 'full'
+    
     def perform_create(self, serializer):
         # For SUB_ADMIN, automatically set organization to their organization
         if self.request.user.role == 'SUB_ADMIN' and self.request.user.organization:
@@ -134,6 +185,100 @@ class GeofenceViewSet(OrganizationIsolationMixin, ModelViewSet):
             )
         else:
             serializer.save(created_by=self.request.user)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_geojson(self, request):
+        """
+        Import geofences from an uploaded GeoJSON FeatureCollection.
+        Invalid features, including active ones overlapping another active
+        geofence unless allow_overlap=true, are skipped and reported; with
+        strict=true nothing is written.
+        """
+        from .geofence_import import GeofenceImportError, import_geofences
+        
+        serializer = GeofenceImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        # SUB_ADMIN can only import into their own organization
+        if request.user.role == 'SUB_ADMIN':
+            organization = request.user.organization
+        else:
+            organization = data.get('organization')
+        if organization is None:
+            return Response({'error': 'organization is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            report = import_geofences(
+                data['file'],
+                organization,
+                created_by=request.user,
+                strict=data['strict'],
+                allow_overlap=data['allow_overlap']
+            )
+        except GeofenceImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response_status = status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
+    
+    @action(detail=False, methods=['get'], url_path='overlaps')
+    def overlaps(self, request):
+        """
+        Audit the visible geofences for overlapping pairs within each organization.
+        Inactive geofences are skipped unless include_inactive=true.
+        """
+        from .geofence_overlap import organization_overlap_report
+        
+        geofences = self.filter_queryset(self.get_queryset())
+        if request.query_params.get('include_inactive', '').lower() not in ('1', 'true', 'yes'):
+            geofences = geofences.filter(active=True)
+        report = organization_overlap_report(geofences)
+        return Response({'count': len(report), 'overlaps': report})
+    
+    @action(detail=False, methods=['post'], url_path='batch-contains')
+    def batch_contains(self, request):
+        """
+        Check many points against the visible geofences in one vectorized pass.
+        Returns the containing geofence ids per point, or the full matrix.
+        """
+        from .geofence_batch import containment_matrix
+        from .geofence_cells import candidate_geofence_ids
+        
+        serializer = GeofenceBatchContainsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        points = [(point['lat'], point['lng']) for point in data['points']]
+        
+        geofences = self.filter_queryset(self.get_queryset())
+        if not data['include_inactive']:
+            geofences = geofences.filter(active=True)
+        if data.get('geofence_ids'):
+            geofences = geofences.filter(id__in=data['geofence_ids'])
+        else:
+            # Only fences with a geohash cell under one of the points can contain it;
+            # rows not yet rasterized have no cells and are always checked
+            has_cells = GeofenceCell.objects.filter(geofence=OuterRef('pk'))
+            geofences = geofences.filter(Q(id__in=candidate_geofence_ids(points)) | ~Exists(has_cells))
+        geofences = list(geofences.select_related(None).only('id', 'polygon_json'))
+        
+        matrix = containment_matrix(points, [geofence.get_polygon_coordinates() for geofence in geofences])
+        geofence_ids = [geofence.id for geofence in geofences]
+        
+        if data['matrix']:
+            return Response({
+                'geofence_ids': geofence_ids,
+                'matrix': matrix.astype(int).tolist()
+            })
+        
+        return Response({
+            'geofence_ids': geofence_ids,
+            'results': [
+                [geofence_ids[column] for column in row.nonzero()[0]]
+                for row in matrix
+            ]
+        })
 
 
 class UserListViewSet(OrganizationIsolationMixin, ModelViewSet):
@@ -187,16 +332,17 @@ class AlertViewSet(OrganizationIsolationMixin, ModelViewSet):
         return AlertSerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Alerts have no organization column; they are scoped below instead of by the mixin
+        queryset = super(OrganizationIsolationMixin, self).get_queryset()
         user = self.request.user
         
         # SUPER_ADMIN can see all alerts
         if user.role == 'SUPER_ADMIN':
             return queryset
         
-        # SUB_ADMIN can only see alerts from their organization's geofences
+        # SUB_ADMIN can only see alerts from their organization's geofences or, without a geofence, users
         if user.role == 'SUB_ADMIN' and user.organization:
-            return queryset.filter(geofence__organization=user.organization)
+            return queryset.for_organization(user.organization_id)
         
         # Regular users see no data
         return queryset.none()
@@ -247,61 +393,26 @@ def generate_report(request):
     metrics = {}
     
     if report_type == 'GEOFENCE_ANALYTICS':
-        # Count active geofences
-        active_geofences = Geofence.objects.filter(active=True).count()
-        total_geofences = Geofence.objects.count()
-        
-        # Count geofence alerts in date range
-        alerts_count = Alert.objects.filter(
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end,
-            geofence__isnull=False
-        ).count()
+        counts = kpi_queries.geofence_analytics(date_range_start, date_range_end)
+        active_geofences = counts['active_geofences']
+        total_geofences = counts['total_geofences']
         
         metrics = {
             'active_geofences': active_geofences,
             'total_geofences': total_geofences,
-            'geofence_alerts': alerts_count,
+            'geofence_alerts': counts['geofence_alerts'],
             'utilization_rate': (active_geofences / total_geofences * 100) if total_geofences > 0 else 0
         }
     
     elif report_type == 'USER_ACTIVITY':
-        # Count users by role
-        super_admins = User.objects.filter(role='SUPER_ADMIN').count()
-        sub_admins = User.objects.filter(role='SUB_ADMIN').count()
-        regular_users = User.objects.filter(role='USER').count()
-        
-        # Count active users
-        active_users = User.objects.filter(is_active=True).count()
-        
-        metrics = {
-            'super_admins': super_admins,
-            'sub_admins': sub_admins,
-            'regular_users': regular_users,
-            'active_users': active_users,
-            'total_users': super_admins + sub_admins + regular_users
-        }
+        # Users by role and active users, counted in one query
+        metrics = kpi_queries.user_activity()
+        metrics['total_users'] = metrics['super_admins'] + metrics['sub_admins'] + metrics['regular_users']
     
     elif report_type == 'ALERT_SUMMARY':
-        # Count alerts by severity
-        critical_alerts = Alert.objects.filter(severity='CRITICAL').count()
-        high_alerts = Alert.objects.filter(severity='HIGH').count()
-        medium_alerts = Alert.objects.filter(severity='MEDIUM').count()
-        low_alerts = Alert.objects.filter(severity='LOW').count()
-        
-        # Count resolved vs unresolved
-        resolved_alerts = Alert.objects.filter(is_resolved=True).count()
-        unresolved_alerts = Alert.objects.filter(is_resolved=False).count()
-        
-        metrics = {
-            'critical_alerts': critical_alerts,
-            'high_alerts': high_alerts,
-            'medium_alerts': medium_alerts,
-            'low_alerts': low_alerts,
-            'resolved_alerts': resolved_alerts,
-            'unresolved_alerts': unresolved_alerts,
-            'total_alerts': resolved_alerts + unresolved_alerts
-        }
+        # Alerts by severity and resolution, counted in one query
+        metrics = kpi_queries.alert_summary()
+        metrics['total_alerts'] = metrics['resolved_alerts'] + metrics['unresolved_alerts']
     
     elif report_type == 'SYSTEM_HEALTH':
         # System health metrics
@@ -374,56 +485,41 @@ def download_report(request, report_id):
     return response
 
 
+def _dashboard_scope(request):
+    """Cache scope of dashboard_kpis: the sub-admin's organization, or all of them"""
+    if request.user.role == 'SUB_ADMIN' and request.user.organization_id:
+        return f'organization:{request.user.organization_id}'
+    return 'all'
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsSuperAdminOrSubAdmin])
+@view_cache.cached('dashboard_kpis', scope=_dashboard_scope)
 def dashboard_kpis(request):
     """
     Get KPIs for dashboard.
     """
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    today = timezone.now().date()
-    
-    # Calculate KPIs
-    active_geofences = Geofence.objects.filter(active=True).count()
-    alerts_today = Alert.objects.filter(created_at__date=today).count()
-    active_sub_admins = User.objects.filter(role='SUB_ADMIN', is_active=True).count()
-    total_users = User.objects.count()
-    critical_alerts = Alert.objects.filter(severity='CRITICAL', is_resolved=False).count()
-    
     # Organization-specific filtering for SUB_ADMIN
-    if request.user.role == 'SUB_ADMIN' and request.user.organization:
-        active_geofences = Geofence.objects.filter(
-            active=True, 
-            organization=request.user.organization
-        ).count()
-        alerts_today = Alert.objects.filter(
-            created_at__date=today,
-            geofence__organization=request.user.organization
-        ).count()
-        active_sub_admins = User.objects.filter(
-            role='SUB_ADMIN', 
-            is_active=True,
-            organization=request.user.organization
-        ).count()
-        total_users = User.objects.filter(organization=request.user.organization).count()
-        critical_alerts = Alert.objects.filter(
-            severity='CRITICAL', 
-            is_resolved=False,
-            geofence__organization=request.user.organization
-        ).count()
-    
-    kpis = {
-        'active_geofences': active_geofences,
-        'alerts_today': alerts_today,
-        'active_sub_admins': active_sub_admins,
-        'total_users': total_users,
+    organization_id = None
+    if request.user.role == 'SUB_ADMIN' and request.user.organization_id:
+        organization_id = request.user.organization_id
+    
+    if organization_id is not None:
+        # Running totals of the organization, one row
+        counts = read_counters(organization_id).kpis()
+    else:
+        # Across all organizations, including rows without one
+        counts = kpi_queries.dashboard_kpis()
+    critical_alerts = counts['critical_alerts']
+    
+    return Response({
+        'active_geofences': counts['active_geofences'],
+        'alerts_today': counts['alerts_today'],
+        'active_sub_admins': counts['active_sub_admins'],
+        'total_users': counts['total_users'],
         'critical_alerts': critical_alerts,
         'system_health': 'Good' if critical_alerts == 0 else 'Warning'
-    }
-    
-    return Response(kpis)
+    })
 
 
 # Sub-Admin Panel Views
@@ -619,74 +715,81 @@ def send_notification(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+SUBADMIN_KPIS = (
+    'active_geofences',
+    'total_officers',
+    'active_officers',
+    'incidents_today',
+    'unresolved_incidents',
+    'critical_incidents',
+    'notifications_sent_today',
+)
+
+
+def _subadmin_dashboard_scope(request):
+    """Cache scope of subadmin_dashboard_kpis; others are denied uncached"""
+    if request.user.role == 'SUB_ADMIN' and request.user.organization_id:
+        return f'organization:{request.user.organization_id}'
+    return None
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsSuperAdminOrSubAdmin])
+@view_cache.cached('subadmin_dashboard_kpis', scope=_subadmin_dashboard_scope)
 def subadmin_dashboard_kpis(request):
     """
     Get KPIs for sub-admin dashboard.
     """
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    today = timezone.now().date()
     user = request.user
     
-    if user.role != 'SUB_ADMIN' or not user.organization:
+    if user.role != 'SUB_ADMIN' or not user.organization_id:
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    organization = user.organization
-    
-    # Calculate KPIs for the sub-admin's organization
-    active_geofences = Geofence.objects.filter(
-        active=True, 
-        organization=organization
-    ).count()
-    
-    total_officers = SecurityOfficer.objects.filter(
-        organization=organization
-    ).count()
-    
-    active_officers = SecurityOfficer.objects.filter(
-        organization=organization,
-        is_active=True
-    ).count()
-    
-    incidents_today = Incident.objects.filter(
-        created_at__date=today,
-        geofence__organization=organization
-    ).count()
-    
-    unresolved_incidents = Incident.objects.filter(
-        is_resolved=False,
-        geofence__organization=organization
-    ).count()
-    
-    critical_incidents = Incident.objects.filter(
-        severity='CRITICAL',
-        is_resolved=False,
-        geofence__organization=organization
-    ).count()
-    
-    notifications_sent_today = Notification.objects.filter(
-        created_at__date=today,
-        organization=organization,
-        is_sent=True
-    ).count()
-    
-    kpis = {
-        'active_geofences': active_geofences,
-        'total_officers': total_officers,
-        'active_officers': active_officers,
-        'incidents_today': incidents_today,
-        'unresolved_incidents': unresolved_incidents,
-        'critical_incidents': critical_incidents,
-        'notifications_sent_today': notifications_sent_today,
-        'organization_name': organization.name
-    }
+    # Running totals of the sub-admin's organization, one row with the organization
+    counters = read_counters(user.organization_id)
+    counts = counters.kpis()
+    kpis = {name: counts[name] for name in SUBADMIN_KPIS}
+    kpis['organization_name'] = counters.organization.name
     
     return Response(kpis)
 
 
+def _authenticate_board_organization(request):
+    """(status, organization id) for a live board request authenticated with a JWT"""
+    try:
+        user = authenticate_stream(request)
+        if user is None:
+            return status.HTTP_401_UNAUTHORIZED, None
+        if user.role != 'SUB_ADMIN' or not user.organization_id:
+            return status.HTTP_403_FORBIDDEN, None
+        # Counted once per worker and organization, not per dashboard
+        live_board.ensure_loaded(user.organization_id)
+        return status.HTTP_200_OK, user.organization_id
+    finally:
+        release_connection()
+
+
+class SubAdminLiveBoardView(View):
+    """
+    Live version of the sub-admin dashboard KPIs as server-sent events: a
+    snapshot of the organization's KPIs, then a kpi_delta event with the
+    changes whenever one of them moves. See users.live_board.
+    """
+    STATUS_DETAILS = {
+        status.HTTP_401_UNAUTHORIZED: 'Authentication credentials were not provided or are invalid.',
+        status.HTTP_403_FORBIDDEN: 'Access denied',
+    }
+
+    async def get(self, request):
+        status_code, organization_id = await sync_to_async(_authenticate_board_organization)(request)
+        if organization_id is None:
+            return JsonResponse({'error': self.STATUS_DETAILS[status_code]}, status=status_code)
+        return stream_response(event_broker.stream(
+            [board_channel(organization_id)],
+            snapshot=lambda: live_board.snapshot(organization_id)
+        ))
+
+
 class PromoCodeViewSet(ModelViewSet):
     """
     ViewSet for managing Promo Codes.
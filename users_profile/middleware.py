@@ -5,13 +5,18 @@ Frontend can send headers on any request:
   - X-User-Lat: latitude (float)
   - X-User-Lng: longitude (float)
 
-When both are present and valid, the user's location is updated.
+When both are present and valid, the user's location is updated and the
+fix is fed to the geofence enter/exit transition detector. The request is
+marked with ``location_fix_processed`` so a view receiving the same fix in
+its body (the location update endpoint) does not feed it a second time.
 """
 
 from typing import Optional
 
 from django.utils.deprecation import MiddlewareMixin
 
+from users.geofence_transitions import geofence_transition_detector
+
 
 class HeaderLocationMiddleware(MiddlewareMixin):
     """Extracts X-User-Lat/X-User-Lng and updates user location if authenticated."""
@@ -41,9 +46,16 @@ class HeaderLocationMiddleware(MiddlewareMixin):
             # users.models.User implements set_location(longitude, latitude)
             user.set_location(longitude, latitude)
         except Exception:
-            # Never block the request due to location update issues
+            # Never block the request due to location update issues; a fix
+            # that was not saved is not fed to the detector either
             return None
 
+        try:
+            geofence_transition_detector.process_fix(user, latitude, longitude)
+            request.location_fix_processed = True
+        except Exception:
+            pass
+
         return None
 
 
@@ -4,9 +4,10 @@ Use this file if you're having trouble with GDAL installation.
 """
 import logging
 from django.conf import settings
-import requests
 import json
 
+from core.http import http_clients
+
 logger = logging.getLogger(__name__)
 
 
@@ -93,7 +94,7 @@ class SMSService:
                 'Body': message
             }
             
-            response = requests.post(
+            response = http_clients.get('exotel').post(
                 url,
                 data=data,
                 auth=(self.exotel_sid, self.exotel_token),
@@ -124,25 +125,29 @@ class GeofenceService:
         """
         Check if user is within authorized geofence zones and send alerts.
         """
-        # This is a simplified implementation
-        # In a real application, you would have a GeofenceZone model
-        # and check against authorized zones for the user
+        from users.geofence_index import geofence_index
+        
+        lat, lng = self._get_lat_lng(location)
+        geofence_ids = []
+        if lat is not None and lng is not None:
+            geofence_ids = geofence_index.containing(
+                lat, lng, organization_id=getattr(user, 'organization_id', None)
+            )
         
-        # For now, we'll just log the geofence check
-        logger.info(f"Geofence check for user {user.email} at location {location}")
+        logger.info(f"Geofence check for user {user.email} at location {location}: inside geofences {geofence_ids}")
         
         # Update SOS event status
         sos_event.status = 'geofence_alerted'
         sos_event.save()
         
-        # In a real implementation, you would:
-        # 1. Query GeofenceZone model for user's authorized zones
-        # 2. Check if current location is within any authorized zone
-        # 3. Send alerts to community members if within authorized zone
-        # 4. Send alerts to security officers if outside authorized zone
-        
         return True
     
+    def _get_lat_lng(self, location):
+        """Read (lat, lng) from a location dict or a Point-like object."""
+        if isinstance(location, dict):
+            return location.get('latitude'), location.get('longitude')
+        return getattr(location, 'y', None), getattr(location, 'x', None)
+    
     def is_within_geofence(self, location, geofence_center, radius_meters=None):
         """
         Check if a location is within a geofence using simple distance calculation.
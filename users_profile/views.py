@@ -22,6 +22,7 @@ from .serializers import (
     SOSEventSerializer, SOSTriggerSerializer, UserLocationUpdateSerializer
 )
 from .services import SMSService, GeofenceService
+from users.geofence_transitions import geofence_transition_detector
 
 logger = logging.getLogger(__name__)
 
@@ -165,6 +166,13 @@ class UserLocationUpdateView(APIView):
             request.user.set_location(longitude, latitude)
             logger.info(f"User location updated: {request.user.email}")
             
+            # HeaderLocationMiddleware already fed this request's fix to the detector
+            if not getattr(request, 'location_fix_processed', False):
+                try:
+                    geofence_transition_detector.process_fix(request.user, latitude, longitude)
+                except Exception as e:
+                    logger.error(f"Geofence transition check failed for user {request.user.email}: {str(e)}")
+            
             return Response({
                 'message': 'Location updated successfully',
                 'location': request.user.get_location_dict()